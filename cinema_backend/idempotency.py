@@ -0,0 +1,120 @@
+"""
+Idempotency-Key support for write endpoints.
+
+A client that may retry a POST sends a unique Idempotency-Key header with
+it. The first request with a key runs the view and its response is kept
+for IDEMPOTENCY_KEY_TTL seconds; a retry with the same key gets that
+response back (with Idempotent-Replayed: true) instead of running the
+write again. Keys are per user and per endpoint.
+
+Keys live in the users.IdempotencyKey table rather than the cache, so a
+retry finds its first attempt whichever worker it reaches and however
+busy the cache has been. Claiming a key is an INSERT against a unique
+(user, path, key) constraint, so two concurrent retries can't both run
+the view; the loser gets a 409 until the winner finishes. Expired rows
+are replaced when their key comes back, and purge_idempotency_keys
+deletes the rest.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from users.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def _fingerprint(request):
+    """Short hash of the request body, to catch a key reused for another request"""
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()[:16]
+
+
+def _expiry(seconds):
+    return timezone.now() + timedelta(seconds=seconds)
+
+
+def _claim(request, key, fingerprint):
+    """
+    Insert a pending row for this key. Returns (row, None) if this request
+    now owns the key, or (None, row) with the row already there.
+    """
+    lookup = {'user': request.user, 'path': request.path[:255], 'key': key}
+    existing = IdempotencyKey.objects.filter(**lookup).first()
+    if existing is not None:
+        if existing.expires_at > timezone.now():
+            return None, existing
+        IdempotencyKey.objects.filter(pk=existing.pk, expires_at=existing.expires_at).delete()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                **lookup, fingerprint=fingerprint, expires_at=_expiry(settings.IDEMPOTENCY_PENDING_TTL),
+            ), None
+    except IntegrityError:
+        # A concurrent retry claimed it first
+        return None, IdempotencyKey.objects.filter(**lookup).first()
+
+
+def idempotent(view):
+    """
+    Wrap a function-based API view (under @api_view) so requests carrying
+    an Idempotency-Key run at most once. Responses with a 5xx status are
+    not kept, so the client can retry those.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}, status=400)
+
+        fingerprint = _fingerprint(request)
+        claimed, existing = _claim(request, key, fingerprint)
+        if claimed is None:
+            return _replay(existing, fingerprint)
+
+        try:
+            response = view(request, *args, **kwargs)
+        except BaseException:
+            claimed.delete()
+            raise
+
+        if response.status_code >= 500 or getattr(response, 'data', None) is None:
+            claimed.delete()
+        else:
+            IdempotencyKey.objects.filter(pk=claimed.pk).update(
+                status_code=response.status_code,
+                body=JSONRenderer().render(response.data).decode(),
+                expires_at=_expiry(settings.IDEMPOTENCY_KEY_TTL),
+            )
+        return response
+
+    return wrapper
+
+
+def _replay(stored, fingerprint):
+    if stored is None or stored.status_code is None:
+        # Still running (or finished with a 5xx a moment ago, so retry)
+        return Response({'error': 'A request with this Idempotency-Key is still being processed'}, status=409)
+    if stored.fingerprint != fingerprint:
+        return Response({'error': f'{HEADER} was already used for a different request'}, status=422)
+    return Response(json.loads(stored.body), status=stored.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def purge_expired(batch_size=1000):
+    """Delete expired keys in batches; returns how many went"""
+    deleted = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,212 @@
+"""
+In-process request metrics: wall time, SQL query count/time and
+serializer time per request, aggregated into per-route histograms.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Histogram bucket upper bounds in milliseconds: 0.1ms to ~2 minutes,
+# each 25% wider than the last, so percentiles are within ~12%
+BUCKET_BOUNDS = [0.1 * 1.25 ** i for i in range(64)]
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class Histogram:
+    """Fixed-size log-bucketed histogram, constant memory whatever the traffic"""
+
+    def __init__(self, integer=False):
+        # Integer samples (query counts) report whole-number percentiles
+        self.integer = integer
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        if not self.total:
+            return None
+        rank = math.ceil(self.total * p / 100)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                bound = min(BUCKET_BOUNDS[index], self.max) if index < len(BUCKET_BOUNDS) else self.max
+                return math.floor(bound) if self.integer else round(bound, 3)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.total,
+            'mean': round(self.sum / self.total, 3) if self.total else None,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': round(self.max, 3),
+        }
+
+
+class RouteStats:
+    def __init__(self):
+        self.wall_ms = Histogram()
+        self.db_ms = Histogram()
+        self.serialize_ms = Histogram()
+        self.queries = Histogram(integer=True)
+
+    def summary(self):
+        return {
+            'wall_ms': self.wall_ms.summary(),
+            'db_ms': self.db_ms.summary(),
+            'serialize_ms': self.serialize_ms.summary(),
+            'queries': self.queries.summary(),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, sample):
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = RouteStats()
+            stats.wall_ms.add(sample.wall_ms)
+            stats.db_ms.add(sample.db_ms)
+            stats.serialize_ms.add(sample.serialize_ms)
+            stats.queries.add(sample.queries)
+
+    def snapshot(self):
+        with self._lock:
+            return {route: stats.summary() for route, stats in sorted(self._routes.items())}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+registry = MetricsRegistry()
+
+
+class RequestSample:
+    __slots__ = ('queries', 'db_ms', 'serialize_ms', 'wall_ms')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.serialize_ms = 0.0
+        self.wall_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - start) * 1000
+            self.queries += 1
+
+
+def _record_query(execute, sql, params, many, context):
+    # Installed once on every connection; the ContextVar finds the current
+    # request's sample, including from the thread an async view's ORM
+    # calls run in (sync_to_async copies the context)
+    sample = _current.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    return sample(execute, sql, params, many, context)
+
+
+def install_query_hook(sender=None, connection=None, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+@contextmanager
+def _timed_serialize(sample):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        sample.serialize_ms += (time.perf_counter() - start) * 1000
+
+
+def timed_serialize():
+    """Context manager charging the enclosed block to the request's serializer time"""
+    sample = _current.get()
+    return _timed_serialize(sample) if sample is not None else nullcontext()
+
+
+class RequestMetricsMiddleware:
+    """
+    Records wall, DB and serializer time per request, adds a Server-Timing
+    header and feeds the per-route histograms. Removed from the stack
+    entirely when REQUEST_METRICS_ENABLED is off. Works under WSGI and
+    ASGI without forcing async views onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+        connection_created.connect(install_query_hook, dispatch_uid='request_metrics')
+        for connection in connections.all(initialized_only=True):
+            install_query_hook(connection=connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sample = RequestSample()
+        token = _current.set(sample)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, sample, start)
+
+    async def __acall__(self, request):
+        sample = RequestSample()
+        token = _current.set(sample)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, sample, start)
+
+    def finish(self, request, response, sample, start):
+        sample.wall_ms = (time.perf_counter() - start) * 1000
+
+        match = request.resolver_match
+        route = f'{request.method} /{match.route}' if match else f'{request.method} <unresolved>'
+        registry.record(route, sample)
+
+        response['Server-Timing'] = (
+            f'app;dur={sample.wall_ms:.1f}, '
+            f'db;dur={sample.db_ms:.1f};desc="{sample.queries} queries", '
+            f'ser;dur={sample.serialize_ms:.1f}'
+        )
+        return response
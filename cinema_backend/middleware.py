@@ -0,0 +1,78 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .routers import SAFE_METHODS, client_key, pin_cache, replica_aliases, use_replicas
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, made async-capable. WhiteNoiseMiddleware is sync-only, and
+    one sync middleware is enough to push every async view under ASGI onto
+    a worker thread. API requests only cost a dict lookup here; serving
+    an actual static file still happens in a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    def static_file(self, request):
+        if self.autorefresh:
+            return self.find_file(request.path_info)
+        return self.files.get(request.path_info)
+
+    async def __acall__(self, request):
+        static_file = self.static_file(request)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Sends the ORM reads of safe-method requests to the read replicas,
+    unless the same client wrote within the last REPLICA_PIN_SECONDS
+    (read-your-writes). Unsafe methods use the primary throughout, and
+    a successful write starts the client's pin window. Not installed
+    when no replicas are configured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key = client_key(request)
+        safe = request.method in SAFE_METHODS
+        with use_replicas(safe and not pin_cache().get(key)):
+            response = self.get_response(request)
+        if not safe and response.status_code < 400:
+            pin_cache().set(key, True, self.pin_seconds)
+        return response
+
+    async def __acall__(self, request):
+        key = client_key(request)
+        safe = request.method in SAFE_METHODS
+        with use_replicas(safe and not await pin_cache().aget(key)):
+            response = await self.get_response(request)
+        if not safe and response.status_code < 400:
+            await pin_cache().aset(key, True, self.pin_seconds)
+        return response
@@ -0,0 +1,64 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import SAFE_METHODS
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination for the router-registered viewsets. Views pick their
+    own indexed ordering with a `cursor_ordering` attribute.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering:
+            return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+        return super().get_ordering(request, queryset, view)
+
+
+def requested_fields(request):
+    """The set of field names asked for with ?fields=a,b,c, or None"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    # DRF requests and plain Django ones (the async views)
+    params = getattr(request, 'query_params', None) or request.GET
+    fields = params.get('fields')
+    if not fields:
+        return None
+    return {name.strip() for name in fields.split(',') if name.strip()}
+
+
+class FieldProjectionMixin:
+    """Serializer mixin that drops fields not listed in ?fields= on reads"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+
+class ProjectedQuerysetMixin:
+    """
+    ViewSet mixin that defers plain columns the client didn't ask for, so
+    heavy text columns are never read for list views that leave them out.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = requested_fields(self.request)
+        if not fields:
+            return queryset
+
+        ordering = getattr(self, 'cursor_ordering', None) or ('id',)
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        keep = set(fields) | {name.lstrip('-') for name in ordering}
+        deferred = [
+            f.name for f in queryset.model._meta.concrete_fields
+            if not f.primary_key and not f.is_relation and f.name not in keep
+        ]
+        return queryset.defer(*deferred) if deferred else queryset
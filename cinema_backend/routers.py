@@ -0,0 +1,85 @@
+"""
+Primary/replica routing.
+
+Reads go to a random replica only while a safe-method (GET/HEAD/OPTIONS)
+request is being served by a client that hasn't written recently; all
+writes, and everything outside a request (management commands, signals
+fired by writes), use the primary. ReplicaRoutingMiddleware decides per
+request.
+"""
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_use_replica = ContextVar('use_replica', default=False)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Written at login/signup and read on the very next request, so replica
+# lag would look like a failed login
+PRIMARY_ONLY_APPS = {'authtoken', 'sessions'}
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+@contextmanager
+def use_replicas(enabled=True):
+    """Let (or stop) reads in this block go to the replicas"""
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def use_primary():
+    return use_replicas(False)
+
+
+class PrimaryReplicaRouter:
+    def __init__(self, replicas=None):
+        self.replicas = replica_aliases() if replicas is None else list(replicas)
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or not _use_replica.get():
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        # Reads inside a transaction must see its own writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data, so objects can relate across them
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        return db == DEFAULT_DB_ALIAS
+
+
+def client_key(request):
+    """Who wrote: the token or session the request carries, else its address"""
+    credential = (
+        request.headers.get('Authorization')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        or request.META.get('REMOTE_ADDR', '')
+    )
+    return 'db:primary-pin:' + hashlib.sha256(credential.encode()).hexdigest()[:32]
+
+
+def pin_cache():
+    # Must be shared between workers for the pin to follow a client
+    # around; see CACHES in settings
+    return caches['default']
@@ -1,6 +1,9 @@
 import os
 from pathlib import Path
 from django.core.management.utils import get_random_secret_key
+from corsheaders.defaults import default_headers
+from cinema_backend.log import parse_log_levels
+from cinema_backend.db import database_config, replica_configs
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -33,8 +36,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cinema_backend.metrics.RequestMetricsMiddleware',
+    'cinema_backend.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'cinema_backend.middleware.StaticFilesMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Move this to the top
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,13 +70,37 @@ TEMPLATES = [
 WSGI_APPLICATION = 'cinema_backend.wsgi.application'
 
 # Database
+# Configured from DATABASE_URL (SQLite next to manage.py by default), with
+# persistent connections or psycopg's pool on PostgreSQL and WAL mode on
+# SQLite; see cinema_backend/db.py for the DB_* and SQLITE_* variables
 DATABASES = {
+    'default': database_config(f'sqlite:///{BASE_DIR / "db.sqlite3"}'),
+}
+
+# Read replicas (DATABASE_REPLICA_URLS). Safe-method requests read from
+# them, except for REPLICA_PIN_SECONDS after the same client wrote; to
+# try it locally with SQLite, point DATABASE_REPLICA_URLS at a second
+# file and refresh it with `manage.py sync_sqlite_replicas`
+DATABASES.update(replica_configs())
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['cinema_backend.routers.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = float(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+# Cache
+# locmem is per process: multi-worker deployments should point CACHE_BACKEND
+# at a shared backend (file based, redis, memcached) so that schedule
+# invalidation reaches every worker.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'cinema-backend'),
     }
 }
 
+# Seconds a cached schedule payload lives; admin edits invalidate it
+# immediately, seat counters in it may lag by up to this long
+SCHEDULE_CACHE_TIMEOUT = int(os.environ.get('SCHEDULE_CACHE_TIMEOUT', 30))
+
 # Static files configuration
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -80,6 +109,7 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # For development
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 # Custom user model
 AUTH_USER_MODEL = 'users.User'
@@ -91,7 +121,101 @@ SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
-}
\ No newline at end of file
+    # Keyset pagination for the router-registered viewsets; ?fields=
+    # projection is handled by cinema_backend.pagination as well
+    'DEFAULT_PAGINATION_CLASS': 'cinema_backend.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+}
+
+# Logging
+# Records go through a bounded in-memory queue to a listener thread that
+# writes them to stderr with tokens and passwords redacted. LOG_LEVEL sets
+# the app loggers' level, LOG_LEVELS overrides it per logger
+# ("movies=DEBUG,users=WARNING") and LOG_DEBUG_SAMPLE_RATE keeps only that
+# fraction of DEBUG records.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'sample_debug': {
+            '()': 'cinema_backend.log.SamplingFilter',
+            'rate': float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 0.01)),
+        },
+    },
+    'handlers': {
+        'queue': {
+            '()': 'cinema_backend.log.QueueListenerHandler',
+            'queue_size': int(os.environ.get('LOG_QUEUE_SIZE', 10000)),
+            'filters': ['sample_debug'],
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': 'WARNING',
+    },
+    'loggers': {
+        name: {'level': level}
+        for name, level in {
+            'cinema_backend': LOG_LEVEL,
+            'movies': LOG_LEVEL,
+            'users': LOG_LEVEL,
+            'inventory': LOG_LEVEL,
+            **parse_log_levels(os.environ.get('LOG_LEVELS', '')),
+        }.items()
+    },
+}
+
+# Request metrics: Server-Timing header and per-route latency histograms
+# (see /api/movies/debug-metrics/). Set to 0 to drop the middleware.
+REQUEST_METRICS_ENABLED = os.environ.get('REQUEST_METRICS_ENABLED', '1') == '1'
+
+# Token authentication cache (per process): how many tokens to remember
+# and for how many seconds another worker's logout may go unnoticed
+TOKEN_AUTH_CACHE_SIZE = int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 10000))
+TOKEN_AUTH_CACHE_TTL = int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60))
+
+# Seat reservations: how long a process keeps rejecting bookings for a
+# showing it has just seen sell out, without asking the database again
+SEAT_SOLD_OUT_CACHE_SECONDS = float(os.environ.get('SEAT_SOLD_OUT_CACHE_SECONDS', 2))
+
+# Snack orders: 1 to queue baskets and apply them together every
+# SNACK_ORDER_BATCH_INTERVAL seconds (per process), which trades a little
+# latency for far fewer row-lock waits when every stand sells at once
+SNACK_ORDER_BATCHING = os.environ.get('SNACK_ORDER_BATCHING', '0') == '1'
+SNACK_ORDER_BATCH_INTERVAL = float(os.environ.get('SNACK_ORDER_BATCH_INTERVAL', 0.05))
+
+# Idempotency-Key on booking and checkout POSTs: how long a response is
+# kept for retries, and how long an in-flight request holds its key
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+IDEMPOTENCY_PENDING_TTL = int(os.environ.get('IDEMPOTENCY_PENDING_TTL', 60))
+
+# Seat holds: how long seats stay set aside before checkout must confirm
+# them, and how many expired holds the sweeper releases per transaction
+SEAT_HOLD_SECONDS = int(os.environ.get('SEAT_HOLD_SECONDS', 10 * 60))
+SEAT_HOLD_SWEEP_BATCH = int(os.environ.get('SEAT_HOLD_SWEEP_BATCH', 500))
+
+# Showing purges (movies.purge): showings deleted per transaction, and
+# seconds to pause between transactions so bookings get the locks too.
+# PURGE_IN_BACKGROUND=0 runs purge requests inside the request instead
+PURGE_CHUNK_SIZE = int(os.environ.get('PURGE_CHUNK_SIZE', 500))
+PURGE_CHUNK_PAUSE = float(os.environ.get('PURGE_CHUNK_PAUSE', 0.05))
+PURGE_IN_BACKGROUND = os.environ.get('PURGE_IN_BACKGROUND', '1') == '1'
+
+# Archive (movies.archive): showings that ended this many days ago move
+# to the archive tables, this many showings per transaction
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 30))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 100))
+
+# Dynamic pricing (movies.pricing): the fill rate prices aim for, how far
+# a price may move from the showing's base price, the rounding step, and
+# how many days of finished showings the demand model learns from
+PRICING_TARGET_FILL = float(os.environ.get('PRICING_TARGET_FILL', 0.7))
+PRICING_SENSITIVITY = float(os.environ.get('PRICING_SENSITIVITY', 0.8))
+PRICING_MIN_FACTOR = float(os.environ.get('PRICING_MIN_FACTOR', 0.8))
+PRICING_MAX_FACTOR = float(os.environ.get('PRICING_MAX_FACTOR', 1.5))
+PRICING_STEP = os.environ.get('PRICING_STEP', '0.25')
+PRICING_HISTORY_DAYS = int(os.environ.get('PRICING_HISTORY_DAYS', 90))
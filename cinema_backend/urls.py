@@ -18,8 +18,9 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from users.views import login_view, list_users, create_user, signup_view
-from movies.views import MovieViewSet, ShowingViewSet, TheaterViewSet, today_showings, book_showing, user_bookings, remove_test_showings
-from inventory.views import SnackItemViewSet
+from movies.views import MovieViewSet, ShowingViewSet, TheaterViewSet, today_showings, book_showing, checkout_view, create_hold, confirm_seat_hold, release_seat_hold, user_bookings, remove_test_showings, purge_showings, purge_status, sales_analytics, request_metrics, import_schedule, export_schedule, schedule_conflicts
+from movies import async_views
+from inventory.views import SnackItemViewSet, order as snack_order
 
 router = DefaultRouter()
 router.register(r'movies/movies', MovieViewSet)
@@ -33,8 +34,26 @@ urlpatterns = [
     path('api/users/login/', login_view),
     path('api/movies/today-showings/', today_showings),
     path('api/movies/book/', book_showing),
+    path('api/movies/checkout/', checkout_view),
+    path('api/movies/holds/', create_hold),
+    path('api/movies/holds/<int:hold_id>/', release_seat_hold),
+    path('api/movies/holds/<int:hold_id>/confirm/', confirm_seat_hold),
     path('api/movies/user-bookings/', user_bookings),
     path('api/movies/remove-test-showings/', remove_test_showings),
+    path('api/movies/purge/', purge_showings),
+    path('api/movies/purge/<int:job_id>/', purge_status),
+    path('api/movies/analytics/sales/', sales_analytics),
+    path('api/movies/debug-metrics/', request_metrics),
+    path('api/movies/schedule/import/', import_schedule),
+    path('api/movies/schedule/export/', export_schedule),
+    path('api/movies/schedule/conflicts/', schedule_conflicts),
+    # Async variants of the read-heavy endpoints, for the ASGI profile
+    path('api/async/movies/today-showings/', async_views.today_showings),
+    path('api/async/movies/user-bookings/', async_views.user_bookings),
+    path('api/async/movies/movies/', async_views.movie_list),
+    path('api/async/movies/theaters/', async_views.theater_list),
+    path('api/async/movies/now-showing/', async_views.now_showing),
+    path('api/inventory/order/', snack_order),
     path('api/users/', list_users),
     path('api/users/create/', create_user),
     path('api/users/signup/', signup_view),
@@ -0,0 +1,32 @@
+"""
+Gunicorn serving profiles, read automatically from the working directory:
+
+    gunicorn                      # SERVER_MODE=wsgi (default)
+    SERVER_MODE=asgi gunicorn
+
+wsgi runs sync workers on cinema_backend.wsgi; each worker handles one
+request at a time, so a slow client or slow query holds a whole worker.
+asgi runs uvicorn workers on cinema_backend.asgi; one worker per core
+holds many concurrent connections, and the /api/async/ views don't tie
+up a thread while they wait on the database.
+"""
+import multiprocessing
+import os
+
+mode = os.environ.get('SERVER_MODE', 'wsgi')
+cores = multiprocessing.cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', f'0.0.0.0:{os.environ.get("PORT", "8000")}')
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+
+if mode == 'asgi':
+    wsgi_app = 'cinema_backend.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    workers = int(os.environ.get('WEB_CONCURRENCY', cores))
+elif mode == 'wsgi':
+    wsgi_app = 'cinema_backend.wsgi:application'
+    worker_class = 'sync'
+    workers = int(os.environ.get('WEB_CONCURRENCY', cores * 2 + 1))
+else:
+    raise ValueError(f'SERVER_MODE must be wsgi or asgi, not {mode!r}')
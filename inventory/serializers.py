@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from cinema_backend.pagination import FieldProjectionMixin
 from .models import SnackItem
 
-class SnackItemSerializer(serializers.ModelSerializer):
+class SnackItemSerializer(FieldProjectionMixin, serializers.ModelSerializer):
     class Meta:
         model = SnackItem
         fields = '__all__' 
\ No newline at end of file
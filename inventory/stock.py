@@ -0,0 +1,193 @@
+"""
+Atomic snack stock decrements.
+
+Every item in a basket is taken with one conditional UPDATE, so concurrent
+concession stands can never oversell or lose each other's updates. Items
+are updated in primary key order, so two baskets sharing items lock their
+rows in the same order and can't deadlock.
+"""
+import logging
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from .models import SnackItem
+
+logger = logging.getLogger(__name__)
+
+
+class StockError(Exception):
+    """Base class for stock failures"""
+
+
+class UnknownItem(StockError):
+    def __init__(self, item_id):
+        self.item_id = item_id
+        super().__init__(f'Unknown snack item: {item_id}')
+
+
+class OutOfStock(StockError):
+    def __init__(self, item_id, requested, available):
+        self.item_id = item_id
+        self.requested = requested
+        self.available = available
+        super().__init__(f'Only {available} of item {item_id} left, {requested} requested')
+
+
+def parse_basket(items):
+    """
+    [{'item': id, 'quantity': n}, ...] -> {id: total quantity}. Repeated
+    items are merged. Raises ValueError on malformed input.
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError('items must be a non-empty list')
+    basket = {}
+    for entry in items:
+        try:
+            item_id, quantity = int(entry['item']), int(entry['quantity'])
+        except (TypeError, KeyError, ValueError):
+            raise ValueError('each item needs an integer "item" and "quantity"')
+        if quantity < 1:
+            raise ValueError('quantity must be a positive integer')
+        basket[item_id] = basket.get(item_id, 0) + quantity
+    return basket
+
+
+def take_stock(basket):
+    """
+    Take every {item_id: quantity} in `basket`, or nothing. Returns one row
+    per item (id, name, price, quantity, remaining), in id order. Raises
+    UnknownItem or OutOfStock and rolls the whole basket back.
+    """
+    with transaction.atomic():
+        for item_id in sorted(basket):
+            quantity = basket[item_id]
+            taken = SnackItem.objects.filter(
+                pk=item_id,
+                quantity_available__gte=quantity,
+            ).update(quantity_available=F('quantity_available') - quantity)
+            if not taken:
+                available = SnackItem.objects.filter(pk=item_id).values_list('quantity_available', flat=True).first()
+                if available is None:
+                    raise UnknownItem(item_id)
+                raise OutOfStock(item_id, quantity, available)
+
+        rows = SnackItem.objects.filter(pk__in=basket).order_by('pk').values('id', 'name', 'price', 'quantity_available')
+        return [
+            {'id': row['id'], 'name': row['name'], 'price': row['price'],
+             'quantity': basket[row['id']], 'remaining': row['quantity_available']}
+            for row in rows
+        ]
+
+
+def return_stock(basket):
+    """Put a basket's items back, e.g. for a cancelled order"""
+    with transaction.atomic():
+        for item_id in sorted(basket):
+            SnackItem.objects.filter(pk=item_id).update(
+                quantity_available=F('quantity_available') + basket[item_id]
+            )
+
+
+class StockBatcher:
+    """
+    Group commit for intermission rushes: baskets submitted from request
+    threads are queued and applied together every `interval` seconds, as
+    one UPDATE per item for the whole batch instead of one per basket.
+    Callers wait for their batch, so an order still either succeeds or
+    fails as a whole; if the batch's combined demand doesn't fit, its
+    baskets are applied one at a time (in arrival order) to find out
+    which ones do.
+    """
+
+    def __init__(self, interval=0.05, max_batch=500):
+        self.interval = interval
+        self.max_batch = max_batch
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def submit(self, basket):
+        """Queue a basket; the Future resolves to take_stock()'s rows"""
+        future = Future()
+        with self._lock:
+            self._pending.append((basket, future))
+            if len(self._pending) >= self.max_batch:
+                self._wake.set()
+        self._ensure_thread()
+        return future
+
+    def order(self, basket, timeout=10):
+        future = self.submit(basket)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            # Still queued: drop it, so the caller's failure is the whole story
+            if future.cancel():
+                raise
+            # Its batch is already being applied, so that decides the order
+            return future.result()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='stock-batcher', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+            # This thread's connection obeys CONN_MAX_AGE like a request's
+            close_old_connections()
+
+    def flush(self):
+        """Apply everything queued so far (also callable directly)"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        # Skip baskets whose callers gave up waiting
+        batch = [(basket, future) for basket, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        totals = {}
+        for basket, _ in batch:
+            for item_id, quantity in basket.items():
+                totals[item_id] = totals.get(item_id, 0) + quantity
+        try:
+            rows = take_stock(totals)
+        except StockError:
+            logger.debug('Batch of %d baskets does not fit, applying them one at a time', len(batch))
+            for basket, future in batch:
+                self._apply_one(basket, future)
+            return
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        by_id = {row['id']: row for row in rows}
+        for basket, future in batch:
+            future.set_result([{**by_id[item_id], 'quantity': basket[item_id]} for item_id in sorted(basket)])
+
+    def _apply_one(self, basket, future):
+        try:
+            future.set_result(take_stock(basket))
+        except Exception as e:
+            future.set_exception(e)
+
+
+stock_batcher = StockBatcher(interval=getattr(settings, 'SNACK_ORDER_BATCH_INTERVAL', 0.05))
+
+
+def order_snacks(basket):
+    """take_stock(), through the batcher when SNACK_ORDER_BATCHING is on"""
+    if getattr(settings, 'SNACK_ORDER_BATCHING', False):
+        return stock_batcher.order(basket)
+    return take_stock(basket)
@@ -1,3 +1,112 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from users.models import User
+from .models import SnackItem
+from .stock import OutOfStock, StockBatcher, UnknownItem, parse_basket, return_stock, take_stock
+
+
+class StockTests(TestCase):
+    def setUp(self):
+        self.popcorn = SnackItem.objects.create(name='Popcorn', description='', price=Decimal('5.50'), quantity_available=10)
+        self.soda = SnackItem.objects.create(name='Soda', description='', price=Decimal('3.00'), quantity_available=2)
+
+    def stock(self):
+        return dict(SnackItem.objects.values_list('id', 'quantity_available'))
+
+    def test_basket_is_taken_in_one_go(self):
+        rows = take_stock({self.soda.id: 2, self.popcorn.id: 3})
+        self.assertEqual([(row['id'], row['quantity'], row['remaining']) for row in rows],
+                         [(self.popcorn.id, 3, 7), (self.soda.id, 2, 0)])
+        self.assertEqual(self.stock(), {self.popcorn.id: 7, self.soda.id: 0})
+
+    def test_out_of_stock_rolls_back_the_whole_basket(self):
+        with self.assertRaises(OutOfStock) as caught:
+            take_stock({self.popcorn.id: 3, self.soda.id: 5})
+        self.assertEqual((caught.exception.item_id, caught.exception.available), (self.soda.id, 2))
+        self.assertEqual(self.stock(), {self.popcorn.id: 10, self.soda.id: 2})
+
+        with self.assertRaises(UnknownItem):
+            take_stock({self.popcorn.id: 1, 999: 1})
+        self.assertEqual(self.stock(), {self.popcorn.id: 10, self.soda.id: 2})
+
+    def test_parse_basket_merges_repeated_items(self):
+        basket = parse_basket([{'item': self.soda.id, 'quantity': 1}, {'item': str(self.soda.id), 'quantity': '1'}])
+        self.assertEqual(basket, {self.soda.id: 2})
+        for bad in (None, [], [{'item': 1}], [{'item': 1, 'quantity': 0}]):
+            with self.assertRaises(ValueError):
+                parse_basket(bad)
+
+    def test_return_stock(self):
+        take_stock({self.soda.id: 2})
+        return_stock({self.soda.id: 2})
+        self.assertEqual(self.stock()[self.soda.id], 2)
+
+    def test_batcher_applies_baskets_together(self):
+        batcher = StockBatcher()
+        batcher._ensure_thread = lambda: None  # flushed by hand below
+        first = batcher.submit({self.popcorn.id: 2})
+        second = batcher.submit({self.popcorn.id: 1, self.soda.id: 1})
+        with self.assertNumQueries(5):  # savepoint, 2 updates, 1 select, release
+            batcher.flush()
+        self.assertEqual(first.result(0), [{'id': self.popcorn.id, 'name': 'Popcorn', 'price': Decimal('5.50'),
+                                            'quantity': 2, 'remaining': 7}])
+        self.assertEqual([row['quantity'] for row in second.result(0)], [1, 1])
+        self.assertEqual(self.stock(), {self.popcorn.id: 7, self.soda.id: 1})
+
+    def test_batcher_falls_back_to_one_basket_at_a_time(self):
+        batcher = StockBatcher()
+        batcher._ensure_thread = lambda: None
+        fits = batcher.submit({self.soda.id: 2})
+        too_late = batcher.submit({self.soda.id: 1, self.popcorn.id: 1})
+        batcher.flush()
+        self.assertEqual(fits.result(0)[0]['remaining'], 0)
+        self.assertIsInstance(too_late.exception(0), OutOfStock)
+        self.assertEqual(self.stock(), {self.popcorn.id: 10, self.soda.id: 0})
+
+    def test_timed_out_baskets_are_not_applied(self):
+        batcher = StockBatcher()
+        batcher._ensure_thread = lambda: None
+        with self.assertRaises(TimeoutError):
+            batcher.order({self.soda.id: 2}, timeout=0.01)
+        kept = batcher.submit({self.soda.id: 1})
+        with self.assertNumQueries(4):  # the kept basket only
+            batcher.flush()
+        self.assertEqual(kept.result(0)[0]['remaining'], 1)
+        self.assertEqual(self.stock()[self.soda.id], 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class OrderViewTests(TestCase):
+    url = '/api/inventory/order/'
+
+    def setUp(self):
+        self.popcorn = SnackItem.objects.create(name='Popcorn', description='', price=Decimal('5.50'), quantity_available=10)
+        self.soda = SnackItem.objects.create(name='Soda', description='', price=Decimal('3.00'), quantity_available=2)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='stand', password='x', is_staff_member=True))
+
+    def order(self, *items):
+        return self.client.post(self.url, {'items': [{'item': i, 'quantity': q} for i, q in items]}, format='json')
+
+    def test_order(self):
+        response = self.order((self.popcorn.id, 2), (self.soda.id, 1))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], '14.00')
+        self.assertEqual([(item['name'], item['price'], item['remaining']) for item in response.data['items']],
+                         [('Popcorn', '5.50', 8), ('Soda', '3.00', 1)])
+
+    def test_errors(self):
+        response = self.order((self.popcorn.id, 1), (self.soda.id, 3))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual((response.data['item'], response.data['available']), (self.soda.id, 2))
+        self.assertEqual(SnackItem.objects.get(pk=self.popcorn.id).quantity_available, 10)
+
+        self.assertEqual(self.order((999, 1)).status_code, 404)
+        self.assertEqual(self.client.post(self.url, {'items': 'popcorn'}, format='json').status_code, 400)
+
+    def test_customers_cannot_order_at_the_stand(self):
+        self.client.force_authenticate(User.objects.create_user(username='customer', password='x'))
+        self.assertEqual(self.order((self.popcorn.id, 1)).status_code, 403)
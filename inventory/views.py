@@ -1,9 +1,17 @@
+import logging
+from concurrent.futures import TimeoutError as BatchTimeout
 from django.shortcuts import render
 from rest_framework import viewsets
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from .models import SnackItem
 from .serializers import SnackItemSerializer
+from .stock import OutOfStock, UnknownItem, order_snacks, parse_basket
 from rest_framework.permissions import BasePermission
+from cinema_backend.pagination import ProjectedQuerysetMixin
+
+logger = logging.getLogger(__name__)
 
 class IsStaffMember(BasePermission):
     def has_permission(self, request, view):
@@ -11,9 +19,10 @@ class IsStaffMember(BasePermission):
 
 # Create your views here.
 
-class SnackItemViewSet(viewsets.ModelViewSet):
+class SnackItemViewSet(ProjectedQuerysetMixin, viewsets.ModelViewSet):
     queryset = SnackItem.objects.all()
     serializer_class = SnackItemSerializer
+    cursor_ordering = 'id'
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -21,3 +30,30 @@ class SnackItemViewSet(viewsets.ModelViewSet):
         else:
             permission_classes = [IsStaffMember]
         return [permission() for permission in permission_classes]
+
+@api_view(['POST'])
+@permission_classes([IsStaffMember])
+def order(request):
+    """
+    Sell a basket of snacks at a concession stand:
+    {"items": [{"item": <id>, "quantity": <n>}, ...]}. All items are taken
+    atomically or none are; the response has the stock left per item.
+    """
+    try:
+        basket = parse_basket(request.data.get('items'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+    
+    try:
+        rows = order_snacks(basket)
+    except UnknownItem as e:
+        return Response({'error': str(e), 'item': e.item_id}, status=404)
+    except OutOfStock as e:
+        return Response({'error': str(e), 'item': e.item_id, 'available': e.available}, status=409)
+    except BatchTimeout:
+        logger.error("Snack order batch did not complete in time")
+        return Response({'error': 'Order could not be processed, please retry'}, status=503)
+    
+    total = sum(row['price'] * row['quantity'] for row in rows)
+    items = [{**row, 'price': str(row['price'])} for row in rows]
+    return Response({'items': items, 'total': str(total)})
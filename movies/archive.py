@@ -0,0 +1,81 @@
+"""
+Moving finished showings out of the hot tables.
+
+Showings that ended more than ARCHIVE_AFTER_DAYS ago are copied, with
+their bookings, into ArchivedShowing / ArchivedBooking, keeping their
+ids. They are then deleted from Showing and Booking with the purge's
+raw deletes. Each batch is one transaction, so a showing is always in
+exactly one place. The hot tables then hold only the current schedule,
+and their indexes stay small enough to live in memory.
+
+Reads only see archived rows when they ask for them (user_bookings with
+?include_archived=1).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ArchivedBooking, ArchivedShowing, Booking, Showing
+from .purge import delete_showings
+
+
+def archive_cutoff(now=None):
+    return (now or timezone.now()) - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+
+
+def finished_before(cutoff):
+    """Showings over by `cutoff` (those without an end time by their start)"""
+    return Showing.objects.filter(Q(end_time__lt=cutoff) | Q(end_time__isnull=True, start_time__lt=cutoff))
+
+
+def archive_showings(ids):
+    """Move these showings and their bookings to the archive. Returns (showings, bookings) moved"""
+    with transaction.atomic():
+        showings = list(Showing.objects.filter(pk__in=ids).values(
+            'id', 'movie_id', 'theater_id', 'start_time', 'end_time', 'price', 'seats_sold',
+            movie_title=F('movie__title'),
+            theater_name=F('theater__name'),
+        ))
+        ArchivedShowing.objects.bulk_create([ArchivedShowing(**row) for row in showings])
+        starts = {row['id']: row['start_time'] for row in showings}
+        bookings = [
+            ArchivedBooking(
+                id=booking_id,
+                user_id=user_id,
+                showing_id=showing_id,
+                seats=seats,
+                created_at=created_at,
+                showing_start=starts[showing_id],
+                unit_price=unit_price,
+            )
+            for booking_id, user_id, showing_id, seats, created_at, unit_price in Booking.objects.filter(
+                showing_id__in=starts
+            ).values_list('id', 'user_id', 'showing_id', 'seats', 'created_at', 'unit_price').iterator(chunk_size=2000)
+        ]
+        ArchivedBooking.objects.bulk_create(bookings, batch_size=1000)
+        delete_showings(list(starts))
+    return len(showings), len(bookings)
+
+
+def archive_finished(cutoff=None, batch_size=None, progress=None):
+    """
+    Archive every showing finished by `cutoff`, `batch_size` showings per
+    transaction, calling progress(showings, bookings) with running totals
+    after each batch. Returns the totals.
+    """
+    cutoff = cutoff or archive_cutoff()
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    finished = finished_before(cutoff).order_by('pk')
+    total_showings = total_bookings = 0
+    while True:
+        ids = list(finished.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total_showings, total_bookings
+        showings, bookings = archive_showings(ids)
+        total_showings += showings
+        total_bookings += bookings
+        if progress:
+            progress(total_showings, total_bookings)
@@ -0,0 +1,141 @@
+"""
+Async variants of the read-heavy endpoints, served under /api/async/.
+
+DRF views are sync-only, so these are plain Django async views: they
+authenticate with users.authentication.aauthenticate, query through the
+async ORM and render with DRF's JSON encoder. Payloads match the sync
+endpoints. Under the ASGI profile a worker keeps serving other requests
+while one of these waits on the database or a slow client.
+"""
+import asyncio
+from datetime import timedelta
+
+from django.conf import settings
+from django.http import HttpResponseNotModified, JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.utils.encoders import JSONEncoder
+
+from cinema_backend.pagination import KeysetPagination, requested_fields
+from users.authentication import aauthenticate
+from .booking_history import BookingPage
+from .flat_serializers import showing_values, serialize_showings
+from .models import Movie, Theater
+from .schedule_cache import aschedule_cache_key, acached_schedule_entry, not_modified
+from .serializers import MovieSerializer, TheaterSerializer
+from .views import get_schedule_window, showings_between
+
+
+def json_response(data, status=200, headers=None):
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder, headers=headers)
+
+
+def unauthorized():
+    return json_response({'detail': 'Authentication credentials were not provided.'}, status=401,
+                         headers={'WWW-Authenticate': 'Token'})
+
+
+async def fetch(queryset):
+    return [row async for row in queryset.aiterator(chunk_size=2000)]
+
+
+async def build_today_showings(start, end, explicit_date):
+    showings = await fetch(showing_values(showings_between(start, end)))
+    # Same fallback to tomorrow as the sync view
+    if not showings and not explicit_date:
+        showings = await fetch(showing_values(showings_between(end, end + timedelta(days=1))))
+    return serialize_showings(showings)
+
+
+async def schedule_entry(params):
+    """(etag, data) for the ?date/?days window, shared with the sync view's cache"""
+    start, end = get_schedule_window(params)
+    explicit_date = 'date' in params
+    key = await aschedule_cache_key('today', start.date(), end.date(), explicit_date)
+    return await acached_schedule_entry(key, lambda: build_today_showings(start, end, explicit_date))
+
+
+async def keyset_page(request, queryset, serializer_class):
+    """
+    One page ordered by id, continued with ?after=<last id>. A simpler
+    cursor than KeysetPagination's, but the same page size limits.
+    """
+    page_size = int(request.GET.get('page_size') or settings.REST_FRAMEWORK['PAGE_SIZE'])
+    page_size = min(max(page_size, 1), KeysetPagination.max_page_size)
+    after = int(request.GET.get('after') or 0)
+
+    fields = requested_fields(request)
+    if fields:
+        queryset = queryset.only('id', *(fields & {f.name for f in queryset.model._meta.concrete_fields}))
+    rows = await fetch(queryset.filter(pk__gt=after).order_by('pk')[:page_size + 1])
+
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        params = request.GET.copy()
+        params['after'] = rows[-1].pk
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    data = serializer_class(rows, many=True, context={'request': request}).data
+    return {'next': next_url, 'results': data}
+
+
+@require_GET
+async def today_showings(request):
+    try:
+        etag, data = await schedule_entry(request.GET)
+    except ValueError as e:
+        return json_response({'error': f'Invalid schedule window: {str(e)}'}, status=400)
+
+    if not_modified(request, etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    return json_response(data, headers={'ETag': etag})
+
+
+@require_GET
+async def user_bookings(request):
+    user = await aauthenticate(request)
+    if user is None:
+        return unauthorized()
+
+    try:
+        page = BookingPage(user, request.GET)
+    except ValueError as e:
+        return json_response({'error': f'Invalid page parameters: {str(e)}'}, status=400)
+    return json_response(page.render(request, await page.afetch()))
+
+
+@require_GET
+async def movie_list(request):
+    try:
+        return json_response(await keyset_page(request, Movie.objects.all(), MovieSerializer))
+    except ValueError as e:
+        return json_response({'error': f'Invalid page parameters: {str(e)}'}, status=400)
+
+
+@require_GET
+async def theater_list(request):
+    if await aauthenticate(request) is None:
+        return unauthorized()
+    try:
+        return json_response(await keyset_page(request, Theater.objects.all(), TheaterSerializer))
+    except ValueError as e:
+        return json_response({'error': f'Invalid page parameters: {str(e)}'}, status=400)
+
+
+@require_GET
+async def now_showing(request):
+    """
+    The app's start screen in one request: today's schedule (cached) and
+    the first page of movies, fetched concurrently. With Django 5.1's
+    async ORM the two queries still share the request's DB thread; the
+    saving is the extra client round trip.
+    """
+    try:
+        (_, showings), movies = await asyncio.gather(
+            schedule_entry(request.GET),
+            keyset_page(request, Movie.objects.all(), MovieSerializer),
+        )
+    except ValueError as e:
+        return json_response({'error': f'Invalid parameters: {str(e)}'}, status=400)
+    return json_response({'showings': showings, 'movies': movies})
@@ -0,0 +1,158 @@
+import decimal
+import math
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from users.models import User
+from .models import Movie, Theater, Showing, Booking
+
+
+@contextmanager
+def scratch_database(verbosity=0):
+    """Run the block against a throwaway test database, never the real one"""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity)
+
+
+def best_of(func, repeat=3):
+    """Smallest wall time of `repeat` calls to func(), in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def seed_schedule(movies=20, theaters=10, showings=5000, users=1000, bookings=20000, days=30, seed=0):
+    """
+    Bulk-create a synthetic schedule with exactly `showings` showings
+    spread over the next `days` days and `bookings` random bookings. Seat
+    counters are rebuilt afterwards so they match the bookings.
+    """
+    rng = random.Random(seed)
+    movie_rows = Movie.objects.bulk_create(
+        Movie(title=f'Movie {i}', description='A synthetic movie. ' * 20, duration=90 + i % 60)
+        for i in range(max(movies, 1))
+    )
+    theater_rows = Theater.objects.bulk_create(
+        Theater(name=f'Theater {i}', capacity=200) for i in range(max(theaters, 1))
+    )
+    user_rows = User.objects.bulk_create(
+        User(username=f'bench-{i}', password='!') for i in range(max(users, 1))
+    )
+
+    today = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+    rows = []
+    free_at = {}  # theater index -> end of its last showing, so none overlap
+    for i in range(showings):
+        movie = rng.choice(movie_rows)
+        theater = i % len(theater_rows)
+        opens = today + timedelta(days=i % max(days, 1), hours=10)
+        start = max(opens, free_at.get(theater, opens)) + timedelta(minutes=15 * rng.randint(0, 4))
+        free_at[theater] = start + timedelta(minutes=movie.duration)
+        rows.append(Showing(
+            movie=movie,
+            theater=theater_rows[theater],
+            start_time=start,
+            end_time=start + timedelta(minutes=movie.duration),
+            price=decimal.Decimal(rng.randint(850, 1500)) / 100,
+            seats_remaining=200,
+        ))
+    rows = Showing.objects.bulk_create(rows, batch_size=1000)
+
+    def booking(showing):
+        return Booking(user=rng.choice(user_rows), showing=showing, showing_start=showing.start_time,
+                       unit_price=showing.price, seats=rng.randint(1, 4))
+
+    Booking.objects.bulk_create((booking(rng.choice(rows)) for _ in range(bookings)), batch_size=1000)
+    call_command('rebuild_seat_counters', stdout=StringIO())
+
+
+def seed_booking_history(user, count, seed=0):
+    """Give `user` `count` one-seat bookings, to model a regular customer"""
+    rng = random.Random(seed)
+    showings = list(Showing.objects.filter(seats_remaining__gt=0).values_list('id', 'start_time', 'price'))
+    if not showings or not count:
+        return
+
+    def booking(showing_id, start_time, price):
+        return Booking(user=user, showing_id=showing_id, showing_start=start_time, unit_price=price, seats=1)
+
+    Booking.objects.bulk_create((booking(*rng.choice(showings)) for _ in range(count)), batch_size=1000)
+    call_command('rebuild_seat_counters', stdout=StringIO())
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(len(ordered) * p / 100) - 1, 0)]
+
+
+class QueryCounter:
+    """connection.execute_wrapper hook counting the queries run inside it"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def run_scenario(send, count):
+    """
+    Call send(i) `count` times and summarise latency, throughput and
+    queries per request. `send` returns the response; any status >= 400
+    is counted as an error.
+    """
+    latencies, queries, errors = [], [], 0
+    started = time.perf_counter()
+    for i in range(count):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = send(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+        queries.append(counter.count)
+        errors += response.status_code >= 400
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput_rps': round(count / elapsed, 1),
+        'mean_ms': round(sum(latencies) / count, 3),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_queries': round(sum(queries) / count, 2),
+        'max_queries': max(queries),
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    """Scenarios whose p95 latency or query count got worse than the baseline allows"""
+    regressions = []
+    for name, new in results['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name)
+        if old is None:
+            continue
+        if new['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {old['p95_ms']}ms -> {new['p95_ms']}ms")
+        if new['mean_queries'] > old['mean_queries']:
+            regressions.append(f"{name}: queries/request {old['mean_queries']} -> {new['mean_queries']}")
+    return regressions
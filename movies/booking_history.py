@@ -0,0 +1,118 @@
+"""
+A customer's bookings, one keyset page at a time.
+
+    ?when=upcoming   showings that haven't started, soonest first
+    ?when=past       showings that have started, most recent first
+    (default)        every booking, newest first
+    ?page_size=N     up to KeysetPagination.max_page_size
+    ?cursor=...      from the previous page's `next` link
+    ?include_archived=1  also bookings moved to the archive (movies.archive)
+
+Each page is a single query that seeks straight to the cursor position
+along an index (one per table with include_archived), so its cost is
+the page size, not the length of the customer's history. Shared by the
+sync and async user_bookings views.
+"""
+import base64
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from cinema_backend.pagination import KeysetPagination
+from .flat_serializers import archived_booking_values, booking_values, serialize_bookings
+from .models import ArchivedBooking, Booking
+
+# ?when= -> (ordering column, descending); both columns lead an index
+# after user
+ORDERINGS = {
+    None: ('created_at', True),
+    'upcoming': ('showing_start', False),
+    'past': ('showing_start', True),
+}
+
+
+def encode_cursor(value, pk):
+    return base64.urlsafe_b64encode(f'{value.isoformat()}|{pk}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        value, pk = raw.rsplit('|', 1)
+        value, pk = parse_datetime(value), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('invalid cursor')
+    if value is None:
+        raise ValueError('invalid cursor')
+    return value, pk
+
+
+class BookingPage:
+    """
+    Parses the request's paging parameters (ValueError if they're bad).
+    fetch() / afetch() read the page plus one row, render() turns those
+    rows into {'next': url or None, 'results': [...]}.
+    """
+
+    def __init__(self, user, params, now=None):
+        self.params = params
+        when = params.get('when') or None
+        if when not in ORDERINGS:
+            raise ValueError(f'when must be one of: {", ".join(name for name in ORDERINGS if name)}')
+        self.column, self.descending = ORDERINGS[when]
+
+        page_size = int(params.get('page_size') or settings.REST_FRAMEWORK['PAGE_SIZE'])
+        self.page_size = min(max(page_size, 1), KeysetPagination.max_page_size)
+
+        self.when, self.now = when, now or timezone.now()
+        cursor = params.get('cursor')
+        self.cursor = decode_cursor(cursor) if cursor else None
+
+        self.queryset = booking_values(self.page_of(Booking.objects.filter(user=user)))
+        # Archived showings are all over, so never upcoming
+        self.archived_queryset = None
+        if params.get('include_archived') in ('1', 'true') and when != 'upcoming':
+            self.archived_queryset = archived_booking_values(self.page_of(ArchivedBooking.objects.filter(user=user)))
+
+    def page_of(self, bookings):
+        if self.when == 'upcoming':
+            bookings = bookings.filter(showing_start__gte=self.now)
+        elif self.when == 'past':
+            bookings = bookings.filter(showing_start__lt=self.now)
+
+        column = self.column
+        if self.cursor:
+            value, pk = self.cursor
+            op = 'lt' if self.descending else 'gt'
+            bookings = bookings.filter(Q(**{f'{column}__{op}': value}) | Q(**{column: value, f'pk__{op}': pk}))
+
+        prefix = '-' if self.descending else ''
+        return bookings.order_by(f'{prefix}{column}', f'{prefix}pk')[:self.page_size + 1]
+
+    def merge(self, rows, archived_rows):
+        # Archived bookings keep their ids, so (column, id) still orders
+        # the two tables as one
+        if not archived_rows:
+            return rows
+        return sorted(rows + archived_rows, key=lambda row: (row[self.column], row['id']),
+                      reverse=self.descending)[:self.page_size + 1]
+
+    def fetch(self):
+        archived = list(self.archived_queryset) if self.archived_queryset is not None else []
+        return self.merge(list(self.queryset), archived)
+
+    async def afetch(self):
+        rows = [row async for row in self.queryset]
+        archived = [row async for row in self.archived_queryset] if self.archived_queryset is not None else []
+        return self.merge(rows, archived)
+
+    def render(self, request, rows):
+        next_url = None
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            params = self.params.copy()
+            params['cursor'] = encode_cursor(rows[-1][self.column], rows[-1]['id'])
+            next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+        return {'next': next_url, 'results': serialize_bookings(rows)}
@@ -0,0 +1,54 @@
+"""
+Tickets and snacks in one transaction.
+
+Locks are always taken in the same order: the showing's row first (by the
+seat counter UPDATE), then snack rows in primary key order (take_stock).
+Plain bookings only lock a showing and stand orders only lock snacks, so
+no mix of the three can wait on each other in a cycle.
+"""
+from django.db import transaction
+
+from inventory.stock import take_stock
+from .models import Booking, Showing
+from .reservations import reserve_seats
+
+
+def checkout(user, showing_id, seats, basket):
+    """
+    Book `seats` on a showing and take a {snack_id: quantity} basket, or do
+    neither. Raises what reserve_seats() and take_stock() raise. Returns a
+    dict with the booking, seats left, itemized lines and total; amounts
+    are Decimals.
+    """
+    with transaction.atomic():
+        remaining = reserve_seats(showing_id, seats)
+        # Not through the stock batcher: it writes on its own connection,
+        # outside this transaction. On StockError the seats roll back with it
+        snacks = take_stock(basket) if basket else []
+        booking = Booking.objects.create(user=user, showing_id=showing_id, seats=seats)
+        title = Showing.objects.values_list('movie__title', flat=True).get(pk=showing_id)
+
+    lines = [{
+        'type': 'ticket',
+        'showing': showing_id,
+        'description': title,
+        'quantity': seats,
+        'unit_price': booking.unit_price,
+        'amount': booking.unit_price * seats,
+    }]
+    lines += [{
+        'type': 'snack',
+        'item': row['id'],
+        'description': row['name'],
+        'quantity': row['quantity'],
+        'unit_price': row['price'],
+        'amount': row['price'] * row['quantity'],
+        'remaining': row['remaining'],
+    } for row in snacks]
+
+    return {
+        'booking': booking,
+        'seats_remaining': remaining,
+        'lines': lines,
+        'total': sum(line['amount'] for line in lines),
+    }
@@ -0,0 +1,97 @@
+"""
+Read-only serialization for list endpoints that skips model hydration.
+
+Rows are fetched with .values() (related titles and names come from the
+join) and formatted with the same DRF field classes ShowingSerializer and
+BookingSerializer use, so the output is identical to theirs.
+"""
+from django.db.models import F
+from rest_framework import serializers
+
+_datetime = serializers.DateTimeField()
+_price = serializers.DecimalField(max_digits=6, decimal_places=2)
+
+# Output field -> column or expression, in ShowingSerializer's field order
+SHOWING_COLUMNS = {
+    'id': 'id',
+    'movie': 'movie',
+    'theater': 'theater',
+    'start_time': 'start_time',
+    'end_time': 'end_time',
+    'price': 'price',
+    'movie_title': F('movie__title'),
+    'theater_name': F('theater__name'),
+    'seats_sold': 'seats_sold',
+    'seats_remaining': 'seats_remaining',
+}
+
+_SHOWING_FORMATTERS = {
+    'start_time': _datetime.to_representation,
+    'end_time': lambda value: _datetime.to_representation(value) if value is not None else None,
+    'price': _price.to_representation,
+}
+
+
+def showing_values(queryset, fields=None, extra=()):
+    """
+    Turn a Showing queryset into a .values() queryset with the columns for
+    `fields` (all of them by default) plus any `extra` ones, e.g. the
+    columns a paginator needs for its cursor.
+    """
+    names = [name for name in SHOWING_COLUMNS if fields is None or name in fields or name in extra]
+    columns = [SHOWING_COLUMNS[name] for name in names if isinstance(SHOWING_COLUMNS[name], str)]
+    expressions = {name: SHOWING_COLUMNS[name] for name in names if not isinstance(SHOWING_COLUMNS[name], str)}
+    return queryset.values(*columns, **expressions)
+
+
+def serialize_showings(rows, fields=None):
+    names = [name for name in SHOWING_COLUMNS if fields is None or name in fields]
+    formatters = [(name, _SHOWING_FORMATTERS.get(name)) for name in names]
+    return [
+        {name: fmt(row[name]) if fmt else row[name] for name, fmt in formatters}
+        for row in rows
+    ]
+
+
+def booking_values(queryset):
+    return queryset.values(
+        'id', 'seats', 'showing', 'created_at', 'showing_start',
+        movie_title=F('showing__movie__title'),
+        theater_name=F('showing__theater__name'),
+        start_time=F('showing__start_time'),
+        end_time=F('showing__end_time'),
+        # What the seats cost when booked, not the showing's current price
+        price=F('unit_price'),
+    )
+
+
+def archived_booking_values(queryset):
+    """booking_values() for ArchivedBooking, from the archived showing's copies"""
+    return queryset.values(
+        'id', 'seats', 'showing', 'created_at', 'showing_start',
+        movie_title=F('showing__movie_title'),
+        theater_name=F('showing__theater_name'),
+        start_time=F('showing__start_time'),
+        end_time=F('showing__end_time'),
+        price=F('unit_price'),
+    )
+
+
+def serialize_bookings(rows):
+    """Same shape as BookingSerializer, including its showing_details dict"""
+    return [
+        {
+            'id': row['id'],
+            'seats': row['seats'],
+            'showing': row['showing'],
+            'showing_details': {
+                'movie_title': row['movie_title'],
+                'theater_name': row['theater_name'],
+                'start_time': row['start_time'].strftime('%Y-%m-%d %H:%M'),
+                'end_time': row['end_time'].strftime('%Y-%m-%d %H:%M') if row['end_time'] else None,
+                'price': float(row['price']),
+            },
+            'created_at': _datetime.to_representation(row['created_at']),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,130 @@
+"""
+Two-phase seat reservations: hold, then confirm.
+
+A hold takes its seats from the showing's counters straight away (through
+reserve_seats), so availability is always net of open holds. Nothing is
+scheduled per hold: expiry is a timestamp, and sweep_expired_holds()
+releases whatever is past due, oldest first, in batches off the
+expires_at index, with one counter UPDATE per showing per batch. The
+sweep_seat_holds command runs it on a loop.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min, Sum
+from django.utils import timezone
+
+from .models import Booking, SeatHold
+from .reservations import NotEnoughSeats, SoldOut, is_known_sold_out, release_seats, reserve_seats, suspend_counters
+
+
+class HoldExpired(Exception):
+    pass
+
+
+def hold_seats(user, showing_id, seats):
+    """Hold `seats` on a showing for SEAT_HOLD_SECONDS. Returns (hold, seats left)"""
+    try:
+        return _hold(user, showing_id, seats)
+    except (SoldOut, NotEnoughSeats):
+        # Holds that have lapsed but not been swept yet may be all that is
+        # in the way. Only a read unless there are some: sweeping takes the
+        # write lock, and a sold-out premiere gets many of these
+        if not has_expired_holds(showing_id) or not sweep_expired_holds(showing_id=showing_id):
+            raise
+    return _hold(user, showing_id, seats)
+
+
+def has_expired_holds(showing_id, now=None):
+    return SeatHold.objects.filter(showing_id=showing_id, expires_at__lte=now or timezone.now()).exists()
+
+
+def _hold(user, showing_id, seats):
+    if is_known_sold_out(showing_id):
+        # Before BEGIN, which takes SQLite's write lock in IMMEDIATE mode
+        raise SoldOut('Showing is sold out')
+    with transaction.atomic():
+        remaining = reserve_seats(showing_id, seats)
+        hold = SeatHold.objects.create(
+            user=user,
+            showing_id=showing_id,
+            seats=seats,
+            expires_at=timezone.now() + timedelta(seconds=settings.SEAT_HOLD_SECONDS),
+        )
+    return hold, remaining
+
+
+def confirm_hold(user, hold_id):
+    """Turn a user's unexpired hold into a Booking; its seats are already taken"""
+    with transaction.atomic():
+        # Locked so the sweeper (which skips locked rows) can't release it
+        # while we book it
+        hold = SeatHold.objects.select_for_update().filter(pk=hold_id, user=user).first()
+        if hold is None:
+            raise SeatHold.DoesNotExist(f'Hold {hold_id} not found')
+        if hold.expires_at <= timezone.now():
+            raise HoldExpired(f'Hold {hold_id} has expired')
+        with suspend_counters():
+            hold.delete()
+        return Booking.objects.create(user=user, showing_id=hold.showing_id, seats=hold.seats)
+
+
+def release_hold(user, hold_id):
+    """Give a user's hold back before it expires"""
+    with transaction.atomic():
+        hold = SeatHold.objects.select_for_update().filter(pk=hold_id, user=user).first()
+        if hold is None:
+            raise SeatHold.DoesNotExist(f'Hold {hold_id} not found')
+        # The post_delete signal hands the seats back
+        hold.delete()
+    return hold
+
+
+def sweep_expired_holds(now=None, batch_size=None, showing_id=None):
+    """
+    Release every hold that has expired by `now`, `batch_size` at a time.
+    Returns the number of holds released.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.SEAT_HOLD_SWEEP_BATCH
+    expired = SeatHold.objects.filter(expires_at__lte=now)
+    if showing_id is not None:
+        expired = expired.filter(showing_id=showing_id)
+
+    released = 0
+    while True:
+        with transaction.atomic():
+            locked = expired.order_by('expires_at')
+            if connection.features.has_select_for_update_skip_locked:
+                # Holds being confirmed right now are left for the next round
+                locked = locked.select_for_update(skip_locked=True)
+            ids = list(locked.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return released
+            batch = SeatHold.objects.filter(pk__in=ids)
+            per_showing = list(
+                batch.order_by().values_list('showing_id').annotate(total=Sum('seats')).order_by('showing_id')
+            )
+            with suspend_counters():
+                batch.delete()
+            for hold_showing_id, total in per_showing:
+                release_seats(hold_showing_id, total)
+        released += len(ids)
+        if len(ids) < batch_size:
+            return released
+
+
+def seconds_until_next_expiry(now=None, granularity=1.0):
+    """
+    How long the sweeper can sleep before a hold is due, rounded up to
+    `granularity` seconds so holds expiring close together are released
+    in one pass. None when there are no holds.
+    """
+    now = now or timezone.now()
+    next_expiry = SeatHold.objects.aggregate(next=Min('expires_at'))['next']
+    if next_expiry is None:
+        return None
+    wait = max((next_expiry - now).total_seconds(), 0)
+    return math.ceil(wait / granularity) * granularity
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from movies.archive import archive_finished, finished_before
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves showings that ended more than ARCHIVE_AFTER_DAYS ago, with their bookings, into '
+        'the archive tables, in batches. Safe to run from cron while the site is serving.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive showings that ended this many days ago '
+                            '(default: ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, help='Showings per transaction (default: ARCHIVE_BATCH_SIZE)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+
+    def handle(self, *args, **options):
+        days = settings.ARCHIVE_AFTER_DAYS if options['days'] is None else options['days']
+        cutoff = timezone.now() - timedelta(days=days)
+
+        if options['dry_run']:
+            self.stdout.write(f'{finished_before(cutoff).count()} showings ended before {cutoff:%Y-%m-%d %H:%M}')
+            return
+
+        showings, bookings = archive_finished(cutoff, options['batch_size'], progress=self.progress)
+        self.stdout.write(self.style.SUCCESS(f'Archived {showings} showings and {bookings} bookings'))
+
+    def progress(self, showings, bookings):
+        self.stdout.write(f'  {showings} showings, {bookings} bookings')
@@ -0,0 +1,133 @@
+import json
+import platform
+import random
+import subprocess
+from io import StringIO
+
+import django
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from movies.benchmarking import scratch_database, seed_booking_history, run_scenario, find_regressions
+from movies.models import Showing
+from users.authentication import token_cache
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Load-tests the REST API in-process on a scratch database and writes the results as JSON'
+
+    def add_arguments(self, parser):
+        # Data set scale, passed on to populate_data's scale mode
+        parser.add_argument('--movies', type=int, default=50)
+        parser.add_argument('--theaters', type=int, default=20)
+        parser.add_argument('--days', type=int, default=60,
+                            help='Days of showings, 2-3 per theater per day')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--bookings', type=int, default=50000)
+        parser.add_argument('--history', type=int, default=500,
+                            help='Bookings owned by the benchmark customer')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per scenario (login uses a tenth, password hashing is slow)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--scenario', action='append',
+                            help='Only run the named scenario(s)')
+        parser.add_argument('--output', default='benchmark-results.json')
+        parser.add_argument('--baseline', help='Earlier results to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p95 slowdown against the baseline (0.25 = 25%%)')
+
+    def handle(self, *args, **options):
+        with scratch_database(), override_settings(SECURE_SSL_REDIRECT=False):
+            self.stdout.write('Seeding scratch database...')
+            self.seed(options)
+            scenarios = self.build_scenarios(options)
+            if options['scenario']:
+                scenarios = {name: s for name, s in scenarios.items() if name in options['scenario']}
+
+            results = {'meta': self.meta(options), 'scenarios': {}}
+            self.stdout.write(f'{"scenario":<22}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"queries":>9}')
+            for name, (send, count) in scenarios.items():
+                stats = run_scenario(send, count)
+                results['scenarios'][name] = stats
+                self.stdout.write(
+                    f'{name:<22}{stats["throughput_rps"]:>10}{stats["p50_ms"]:>10}'
+                    f'{stats["p95_ms"]:>10}{stats["p99_ms"]:>10}{stats["mean_queries"]:>9}'
+                )
+                if stats['errors']:
+                    self.stdout.write(self.style.WARNING(f'  {stats["errors"]} requests failed'))
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(f'Wrote {options["output"]}')
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = find_regressions(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Performance regressions:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def seed(self, options):
+        call_command(
+            'populate_data',
+            movies=options['movies'], theaters=options['theaters'], days=options['days'],
+            users=options['users'], bookings=options['bookings'], seed=options['seed'],
+            stdout=StringIO(),
+        )
+        # populate_data always creates the 'customer' account
+        self.customer = User.objects.get(username='customer')
+        seed_booking_history(self.customer, options['history'], seed=options['seed'])
+        self.token = Token.objects.get_or_create(user=self.customer)[0].key
+        caches['default'].clear()
+        token_cache.clear()
+
+    def build_scenarios(self, options):
+        client = Client(HTTP_AUTHORIZATION=f'Token {self.token}')
+        anonymous = Client()
+        rng = random.Random(options['seed'])
+        upcoming = list(
+            Showing.objects.filter(start_time__gte=timezone.now(), seats_remaining__gt=0)
+            .values_list('id', flat=True)
+        )
+        count = options['requests']
+
+        def book(i):
+            return client.post('/api/movies/book/', {'showing_id': rng.choice(upcoming), 'seats': 1},
+                               content_type='application/json')
+
+        def login(i):
+            return anonymous.post('/api/users/login/', {'username': 'customer', 'password': 'password123'},
+                                  content_type='application/json')
+
+        return {
+            'today_showings': (lambda i: client.get('/api/movies/today-showings/'), count),
+            'week_showings': (lambda i: client.get('/api/movies/today-showings/', {'days': 7}), count),
+            'user_bookings': (lambda i: client.get('/api/movies/user-bookings/'), count),
+            'book_showing': (book, count),
+            'login': (login, max(count // 10, 1)),
+            'list_movies': (lambda i: client.get('/api/movies/movies/'), count),
+            'list_showings': (lambda i: client.get('/api/movies/showings/'), count),
+            'list_theaters': (lambda i: client.get('/api/movies/theaters/'), count),
+            'list_snacks': (lambda i: client.get('/api/inventory/snacks/'), count),
+        }
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                    capture_output=True, text=True).stdout.strip() or None
+        except OSError:
+            commit = None
+        scale = ('movies', 'theaters', 'days', 'users', 'bookings', 'history', 'requests', 'seed')
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': django.db.connection.vendor,
+            'scale': {key: options[key] for key in scale},
+        }
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.utils import timezone
+from movies import pricing
+from movies.benchmarking import scratch_database, best_of, seed_schedule
+from movies.models import Showing
+
+
+class Command(BaseCommand):
+    help = 'Times each stage of repricing a large schedule (100k showings by default), on a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--showings', type=int, default=100000)
+        parser.add_argument('--theaters', type=int, default=100)
+        parser.add_argument('--bookings', type=int, default=200000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if pricing.np is None:
+            raise CommandError('Repricing needs NumPy (pip install -r requirements.txt)')
+
+        with scratch_database():
+            seed_schedule(theaters=options['theaters'], showings=options['showings'],
+                          bookings=options['bookings'], days=90)
+            now = timezone.now()
+            end = Showing.objects.aggregate(last=Max('start_time'))['last'] + timedelta(seconds=1)
+            model = pricing.DemandModel.fit(now)
+            showings = pricing.upcoming(now, end, now)
+            prices = pricing.suggest(showings, model)
+            count = len(prices)
+
+            cases = [
+                ('fit demand model', lambda: pricing.DemandModel.fit(now)),
+                ('load showings', lambda: pricing.upcoming(now, end, now)),
+                ('price (vectorized)', lambda: pricing.suggest(showings, model)),
+                # Every price changes on the first pass; later passes only touch what moved
+                ('write prices', lambda: pricing.write_prices(showings['id'], prices)),
+            ]
+
+            self.stdout.write(f'{count} showings priced')
+            self.stdout.write(f'{"stage":<22}{"seconds":>10}{"showings/sec":>16}')
+            for name, func in cases:
+                elapsed = best_of(func, options['repeat'])
+                self.stdout.write(f'{name:<22}{elapsed:>10.3f}{count / elapsed:>16,.0f}')
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from movies.benchmarking import scratch_database, best_of, seed_schedule
+from movies.flat_serializers import showing_values, serialize_showings, booking_values, serialize_bookings
+from movies.models import Showing, Booking
+from movies.serializers import ShowingSerializer, BookingSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compares rows/sec of the model serializers and the flat read-only path, on a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--showings', type=int, default=5000)
+        parser.add_argument('--bookings', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            seed_schedule(showings=options['showings'], bookings=options['bookings'])
+
+            showings = Showing.objects.select_related('movie', 'theater')
+            bookings = Booking.objects.select_related('showing', 'showing__movie', 'showing__theater')
+            cases = [
+                ('showings', 'ShowingSerializer', options['showings'],
+                 lambda: ShowingSerializer(showings.all(), many=True).data),
+                ('showings', 'flat', options['showings'],
+                 lambda: serialize_showings(showing_values(Showing.objects.all()))),
+                ('bookings', 'BookingSerializer', options['bookings'],
+                 lambda: BookingSerializer(bookings.all(), many=True).data),
+                ('bookings', 'flat', options['bookings'],
+                 lambda: serialize_bookings(booking_values(Booking.objects.all()))),
+            ]
+
+            self.stdout.write(f'{"rows":<10}{"path":<20}{"rows/sec":>12}')
+            for name, path, count, func in cases:
+                elapsed = best_of(func, options['repeat'])
+                self.stdout.write(f'{name:<10}{path:<20}{count / elapsed:>12,.0f}')
@@ -0,0 +1,193 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+from django.utils import timezone
+from movies.benchmarking import percentile
+from movies.models import Showing
+from users.models import User
+
+# Scenario -> (sync DRF path, async path or None)
+ENDPOINTS = {
+    'today_showings': ('/api/movies/today-showings/', '/api/async/movies/today-showings/'),
+    'user_bookings': ('/api/movies/user-bookings/', '/api/async/movies/user-bookings/'),
+    'list_movies': ('/api/movies/movies/', '/api/async/movies/movies/'),
+    'list_theaters': ('/api/movies/theaters/', '/api/async/movies/theaters/'),
+    # Concurrent writes; a sold-out 409 is an answer, not an error
+    'book_showing': ('/api/movies/book/', None),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Starts the app under gunicorn in the WSGI and ASGI profiles (gunicorn.conf.py) and '
+        'load-tests the read endpoints with concurrent, optionally slow, clients. Uses the '
+        'configured database as it is; run populate_data (e.g. in scale mode) first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', choices=['wsgi', 'asgi'],
+                            help='Profiles to run (default: both)')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Gunicorn workers per profile; 1 shows per-worker concurrency')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--slow-clients', type=int, default=0,
+                            help='Extra connections that trickle their request headers in slowly')
+        parser.add_argument('--slow-ms', type=int, default=500,
+                            help='How long each slow client takes to finish sending its headers')
+        parser.add_argument('--scenario', action='append', choices=list(ENDPOINTS))
+        parser.add_argument('--output', help='Also write the results as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username='customer')
+        except User.DoesNotExist:
+            raise CommandError('No "customer" user; run populate_data first')
+        self.token = Token.objects.get_or_create(user=user)[0].key
+        self.upcoming = list(
+            Showing.objects.filter(start_time__gte=timezone.now(), seats_remaining__gt=0)
+            .values_list('id', flat=True)
+        ) or [0]
+
+        scenarios = options['scenario'] or list(ENDPOINTS)
+        results = {}
+        self.stdout.write(f'{"run":<28}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"errors":>8}')
+        for mode in options['mode'] or ['wsgi', 'asgi']:
+            with self.server(mode, options['workers']) as port:
+                for name in scenarios:
+                    sync_path, async_path = ENDPOINTS[name]
+                    runs = [(f'{mode} {name}', sync_path)]
+                    if mode == 'asgi' and async_path:
+                        runs.append((f'{mode}+async {name}', async_path))
+                    for label, path in runs:
+                        stats = self.load(port, path, options)
+                        results[label] = stats
+                        self.stdout.write(
+                            f'{label:<28}{stats["throughput_rps"]:>10}{stats["p50_ms"]:>10}'
+                            f'{stats["p95_ms"]:>10}{stats["p99_ms"]:>10}{stats["errors"]:>8}'
+                        )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'options': {key: options[key] for key in (
+                    'workers', 'requests', 'concurrency', 'slow_clients', 'slow_ms')},
+                    'results': results}, f, indent=2)
+            self.stdout.write(f'Wrote {options["output"]}')
+
+    @contextmanager
+    def server(self, mode, workers):
+        """Run gunicorn in the given profile on a free port for the duration"""
+        port = free_port()
+        env = {**os.environ, 'SERVER_MODE': mode, 'LOG_LEVEL': 'WARNING',
+               'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'cinema_backend.settings')}
+        with tempfile.TemporaryFile() as log:
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '-c', str(settings.BASE_DIR / 'gunicorn.conf.py'),
+                 '--bind', f'127.0.0.1:{port}', '--workers', str(workers)],
+                cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+            )
+            try:
+                self.wait_until_listening(process, port, mode, log)
+                yield port
+            finally:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    def wait_until_listening(self, process, port, mode, log):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and process.poll() is None:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        log.seek(0)
+        raise CommandError(f'{mode} server did not start:\n{log.read().decode()[-2000:]}')
+
+    def headers(self):
+        # Looks like a TLS-terminating proxy, so SECURE_SSL_REDIRECT lets it through
+        return {'Authorization': f'Token {self.token}', 'X-Forwarded-Proto': 'https'}
+
+    def request(self, port, path, i):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        method, body, headers = 'GET', None, self.headers()
+        if path == ENDPOINTS['book_showing'][0]:
+            method, headers['Content-Type'] = 'POST', 'application/json'
+            body = json.dumps({'showing_id': self.upcoming[i % len(self.upcoming)], 'seats': 1})
+        start = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            failed = response.status >= 400 and response.status != 409
+        except (OSError, http.client.HTTPException):
+            failed = True
+        finally:
+            connection.close()
+        return (time.perf_counter() - start) * 1000, failed
+
+    def slow_client(self, port, path, slow_ms, stop):
+        """Sends half a request, waits, then finishes it, over and over"""
+        if path == ENDPOINTS['book_showing'][0]:
+            path = ENDPOINTS['today_showings'][0]
+        lines = [f'GET {path} HTTP/1.1', 'Host: 127.0.0.1', 'Connection: close',
+                 *(f'{key}: {value}' for key, value in self.headers().items())]
+        while not stop.is_set():
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=60) as sock:
+                    sock.sendall(('\r\n'.join(lines[:2]) + '\r\n').encode())
+                    stop.wait(slow_ms / 1000)
+                    sock.sendall(('\r\n'.join(lines[2:]) + '\r\n\r\n').encode())
+                    while sock.recv(65536):
+                        pass
+            except OSError:
+                stop.wait(0.05)
+
+    def load(self, port, path, options):
+        stop = threading.Event()
+        slow = [threading.Thread(target=self.slow_client, args=(port, path, options['slow_ms'], stop), daemon=True)
+                for _ in range(options['slow_clients'])]
+        for thread in slow:
+            thread.start()
+
+        count = options['requests']
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(options['concurrency']) as pool:
+                samples = list(pool.map(lambda i: self.request(port, path, i), range(count)))
+        finally:
+            elapsed = time.perf_counter() - started
+            stop.set()
+            for thread in slow:
+                thread.join()
+
+        latencies = [ms for ms, _ in samples]
+        return {
+            'requests': count,
+            'errors': sum(failed for _, failed in samples),
+            'throughput_rps': round(count / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 1),
+            'p95_ms': round(percentile(latencies, 95), 1),
+            'p99_ms': round(percentile(latencies, 99), 1),
+        }
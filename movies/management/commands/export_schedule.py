@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from movies.models import Showing
+from movies.schedule_io import FORMATS, export_rows
+
+
+class Command(BaseCommand):
+    help = 'Streams all showings to stdout as CSV or JSON lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=FORMATS, default='csv')
+
+    def handle(self, *args, **options):
+        for chunk in export_rows(Showing.objects.order_by('start_time', 'id'), options['type']):
+            self.stdout.write(chunk, ending='')
@@ -0,0 +1,37 @@
+import codecs
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from movies.schedule_io import FORMATS, ScheduleImporter, guess_format, parse_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk-imports showings from a CSV or JSON-lines file (- for stdin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - to read stdin')
+        parser.add_argument('--type', choices=FORMATS, help='Defaults to guessing from the file name')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Showings per bulk_create')
+        parser.add_argument('--dry-run', action='store_true', help='Validate without inserting anything')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['type'] or guess_format(path)
+        importer = ScheduleImporter(chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+
+        if path == '-':
+            report = importer.run(parse_rows(codecs.iterdecode(sys.stdin.buffer, 'utf-8-sig'), fmt))
+        else:
+            try:
+                with open(path, encoding='utf-8-sig', newline='') as f:
+                    report = importer.run(parse_rows(f, fmt))
+            except OSError as e:
+                raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stderr.write(f'line {error["line"]}: {error["error"]}')
+        verb = 'Validated' if report['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {report["created"]} showings, rejected {report["rejected"]}'))
+        if options['verbosity'] > 1:
+            self.stdout.write(json.dumps(report, indent=2))
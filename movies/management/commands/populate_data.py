@@ -1,18 +1,79 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from movies.models import Movie, Theater, Showing
+from django.contrib.auth.hashers import make_password
+from rest_framework.authtoken.models import Token
+from movies.models import (
+    Movie, Theater, Showing, Booking, SeatHold, PurgeJob, ArchivedShowing, ArchivedBooking, SalesRollup,
+)
+from movies.schedule_cache import invalidate_schedule
+from movies import rollups
 from inventory.models import SnackItem
+from users.models import IdempotencyKey
+from array import array
 from datetime import timedelta
 import random
 import decimal
 
 User = get_user_model()
 
+# Prefix of the accounts generated in scale mode, so reruns can remove them
+LOADTEST_USER_PREFIX = 'loadtest-'
+
+# Time slots for showings
+TIME_SLOTS = [
+    (10, 0),  # 10:00 AM
+    (13, 30), # 1:30 PM
+    (16, 0),  # 4:00 PM
+    (19, 30), # 7:30 PM
+    (22, 0)   # 10:00 PM
+]
+
+
+def pick_showings(midnight, movies):
+    """
+    (start_time, movie) for 2-3 random time slots of one theater-day. Only
+    movies that end before the next chosen slot are picked, since some
+    slots are closer together than the longest movies.
+    """
+    slots = sorted(random.sample(TIME_SLOTS, random.randint(2, 3)))
+    starts = [midnight + timedelta(hours=hour, minutes=minute) for hour, minute in slots]
+    picks = []
+    for start_time, next_start in zip(starts, starts[1:] + [None]):
+        fits = [movie for movie in movies
+                if next_start is None or start_time + timedelta(minutes=movie.duration) <= next_start]
+        if fits:
+            picks.append((start_time, random.choice(fits)))
+    return picks
+
+
 class Command(BaseCommand):
-    help = 'Populates the database with sample data'
+    help = 'Populates the database with sample data, or with a large synthetic data set in scale mode'
+
+    SCALE_OPTIONS = ('movies', 'theaters', 'days', 'users', 'bookings')
+
+    def add_arguments(self, parser):
+        # Passing any of these switches to scale mode
+        parser.add_argument('--movies', type=int, help='Number of movies to generate')
+        parser.add_argument('--theaters', type=int, help='Number of theaters to generate')
+        parser.add_argument('--days', type=int, help='Days of showings to generate, starting today')
+        parser.add_argument('--past-days', type=int, default=0,
+                            help='Also generate showings for this many days before today')
+        parser.add_argument('--users', type=int, help='Number of customer accounts to generate')
+        parser.add_argument('--bookings', type=int, help='Number of bookings to generate')
+        parser.add_argument('--seed', type=int, help='Random seed, for reproducible data sets')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows per bulk_create call in scale mode')
 
     def handle(self, *args, **kwargs):
+        if kwargs.get('seed') is not None:
+            random.seed(kwargs['seed'])
+        
+        if any(kwargs.get(name) is not None for name in self.SCALE_OPTIONS):
+            self.populate_at_scale(**kwargs)
+            return
+        
         self.stdout.write('Creating sample data...')
         
         # Clear existing data
@@ -38,11 +99,21 @@ class Command(BaseCommand):
     def clear_data(self):
         """Clear existing data from the database"""
         self.stdout.write('Clearing existing data...')
-        Showing.objects.all().delete()
-        Movie.objects.all().delete()
-        Theater.objects.all().delete()
-        SnackItem.objects.all().delete()
-        # Don't delete users, as you might have created a superuser already
+        # One DELETE per table, children first, instead of loading every
+        # row into the cascade collector. Nothing needs the per-row
+        # signals: the seat counters go away with their showings.
+        with transaction.atomic():
+            for model in (SalesRollup, ArchivedBooking, ArchivedShowing, SeatHold, Booking, Showing, Movie, Theater, SnackItem):
+                model.objects.all()._raw_delete(model.objects.db)
+            # Don't delete users, as you might have created a superuser
+            # already; only the accounts generated in scale mode
+            generated = User.objects.filter(username__startswith=LOADTEST_USER_PREFIX)
+            # Raw deletes don't cascade: clear every row that points at them
+            for model in (Token, IdempotencyKey):
+                model.objects.filter(user__in=generated)._raw_delete(model.objects.db)
+            PurgeJob.objects.filter(requested_by__in=generated).update(requested_by=None)
+            generated._raw_delete(User.objects.db)
+        invalidate_schedule()
     
     def create_users(self):
         """Create sample users"""
@@ -147,34 +218,19 @@ class Command(BaseCommand):
         """Create sample showings for the next 7 days"""
         self.stdout.write('Creating showings...')
         
-        # Time slots for showings
-        time_slots = [
-            (10, 0),  # 10:00 AM
-            (13, 30), # 1:30 PM
-            (16, 0),  # 4:00 PM
-            (19, 30), # 7:30 PM
-            (22, 0)   # 10:00 PM
-        ]
-        
         # Create showings for the next 7 days
         now = timezone.now()
         for day in range(7):
             current_date = now.date() + timedelta(days=day)
             
             # For each theater, create showings at different time slots
+            midnight = timezone.make_aware(
+                timezone.datetime.combine(current_date, timezone.datetime.min.time())
+            )
             for theater in theaters:
-                # Randomly select 2-3 time slots for this theater on this day
-                selected_slots = random.sample(time_slots, random.randint(2, 3))
-                
-                for hour, minute in selected_slots:
-                    # Randomly select a movie
-                    movie = random.choice(movies)
-                    
-                    # Calculate start and end times
-                    start_time = timezone.make_aware(
-                        timezone.datetime.combine(current_date, timezone.datetime.min.time()) + 
-                        timedelta(hours=hour, minutes=minute)
-                    )
+                # 2-3 time slots for this theater on this day, each with a movie that fits
+                for start_time, movie in pick_showings(midnight, movies):
+                    # Calculate end time
                     end_time = start_time + timedelta(minutes=movie.duration)
                     
                     # Generate a random price between $8.50 and $15.00
@@ -191,7 +247,7 @@ class Command(BaseCommand):
                     
                     self.stdout.write(f'Created showing: {movie.title} at {theater.name} on {start_time.strftime("%Y-%m-%d %H:%M")}')
     
-    def create_snacks(self):
+    def create_snacks(self, verbose=True):
         """Create sample snack items"""
         self.stdout.write('Creating snack items...')
         
@@ -240,6 +296,154 @@ class Command(BaseCommand):
             }
         ]
         
-        for snack_data in snacks_data:
-            snack = SnackItem.objects.create(**snack_data)
-            self.stdout.write(f'Created snack item: {snack.name}')
+        snacks = SnackItem.objects.bulk_create(SnackItem(**snack_data) for snack_data in snacks_data)
+        if verbose:
+            for snack in snacks:
+                self.stdout.write(f'Created snack item: {snack.name}')
+    
+    def populate_at_scale(self, **options):
+        """
+        Generate a production-sized data set with batched bulk_create calls
+        inside a single transaction, reporting progress per batch.
+        """
+        n_movies = options.get('movies') or 50
+        n_theaters = options.get('theaters') or 10
+        n_days = options.get('days') or 30
+        past_days = options.get('past_days') or 0
+        n_users = options.get('users') or 1000
+        n_bookings = options.get('bookings') or 0
+        batch_size = options.get('batch_size') or 5000
+        
+        self.stdout.write(
+            f'Generating {n_movies} movies, {n_theaters} theaters, {past_days + n_days} days of showings, '
+            f'{n_users} users and {n_bookings} bookings...'
+        )
+        
+        with transaction.atomic():
+            self.clear_data()
+            self.create_users()
+            movies = self.bulk_movies(n_movies, batch_size)
+            theaters = self.bulk_theaters(n_theaters, batch_size)
+            users = self.bulk_users(n_users, batch_size)
+            showings = self.plan_showings(movies, theaters, past_days, n_days)
+            picks, seats = self.plan_bookings(showings, theaters, n_bookings)
+            showings = self.bulk_showings(showings, batch_size)
+            self.bulk_bookings(showings, users, picks, seats, batch_size)
+            self.create_snacks(verbose=False)
+            # bulk_create skips the signals that keep the rollups current
+            rollups.refresh()
+        
+        invalidate_schedule()
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(showings)} showings and {len(picks)} bookings'
+        ))
+    
+    def progress(self, label, done, total):
+        self.stdout.write(f'{label}: {done}/{total}')
+        self.stdout.flush()
+    
+    def bulk_movies(self, count, batch_size):
+        titles = ['The Space Odyssey', 'Midnight Mystery', 'The Last Adventure', 'Digital Dreams', 'Love in Paris']
+        movies = [
+            Movie(
+                title=f'{titles[i % len(titles)]} {i // len(titles) + 1}',
+                description='A generated movie for load testing.',
+                duration=random.randint(85, 180),
+                poster_url=f'https://example.com/posters/generated_{i}.jpg'
+            )
+            for i in range(count)
+        ]
+        movies = Movie.objects.bulk_create(movies, batch_size=batch_size)
+        self.progress('Movies', len(movies), count)
+        return movies
+    
+    def bulk_theaters(self, count, batch_size):
+        theaters = [
+            Theater(name=f'Screen {i + 1}', capacity=random.choice([40, 80, 150, 200, 300]))
+            for i in range(count)
+        ]
+        theaters = Theater.objects.bulk_create(theaters, batch_size=batch_size)
+        self.progress('Theaters', len(theaters), count)
+        return theaters
+    
+    def bulk_users(self, count, batch_size):
+        """Customer accounts sharing one password hash, hashing is far too slow per row"""
+        password = make_password('password123')
+        users = []
+        for start in range(0, count, batch_size):
+            batch = [
+                User(username=f'{LOADTEST_USER_PREFIX}{i}', email=f'{LOADTEST_USER_PREFIX}{i}@example.com',
+                     password=password)
+                for i in range(start, min(start + batch_size, count))
+            ]
+            users.extend(User.objects.bulk_create(batch))
+            self.progress('Users', len(users), count)
+        return [user.id for user in users] or [User.objects.get(username='customer').id]
+    
+    def plan_showings(self, movies, theaters, past_days, days):
+        """Unsaved showings, 2-3 per theater per day like the sample data"""
+        today = timezone.now().date()
+        showings = []
+        for day in range(-past_days, days):
+            current_date = today + timedelta(days=day)
+            midnight = timezone.make_aware(timezone.datetime.combine(current_date, timezone.datetime.min.time()))
+            for theater in theaters:
+                for start_time, movie in pick_showings(midnight, movies):
+                    showings.append(Showing(
+                        movie=movie,
+                        theater=theater,
+                        start_time=start_time,
+                        end_time=start_time + timedelta(minutes=movie.duration),
+                        price=decimal.Decimal(random.randint(850, 1500)) / 100,
+                        seats_sold=0,
+                        seats_remaining=theater.capacity
+                    ))
+        return showings
+    
+    def plan_bookings(self, showings, theaters, count):
+        """
+        Pick a showing and seat count for every booking up front, so the
+        showings can be inserted with correct seat counters. Kept in
+        compact arrays: a few bytes per booking even for millions.
+        """
+        picks, seats = array('L'), array('B')
+        # Showings with seats left; full ones are swap-removed so every
+        # pick stays O(1) however dense the data set gets
+        open_indices = list(range(len(showings)))
+        while len(picks) < count and open_indices:
+            position = random.randrange(len(open_indices))
+            index = open_indices[position]
+            showing = showings[index]
+            wanted = min(random.randint(1, 4), showing.seats_remaining)
+            showing.seats_sold += wanted
+            showing.seats_remaining -= wanted
+            picks.append(index)
+            seats.append(wanted)
+            if not showing.seats_remaining:
+                open_indices[position] = open_indices[-1]
+                open_indices.pop()
+        if len(picks) < count:
+            self.stdout.write(self.style.WARNING(
+                f'Every showing is sold out after {len(picks)} bookings, '
+                f'add theaters or days for more'
+            ))
+        return picks, seats
+    
+    def bulk_showings(self, showings, batch_size):
+        created = []
+        for start in range(0, len(showings), batch_size):
+            created.extend(Showing.objects.bulk_create(showings[start:start + batch_size]))
+            self.progress('Showings', len(created), len(showings))
+        return created
+    
+    def bulk_bookings(self, showings, users, picks, seats, batch_size):
+        total = len(picks)
+        for start in range(0, total, batch_size):
+            end = min(start + batch_size, total)
+            Booking.objects.bulk_create([
+                Booking(user_id=random.choice(users), showing_id=showings[picks[i]].id,
+                        showing_start=showings[picks[i]].start_time, unit_price=showings[picks[i]].price,
+                        seats=seats[i])
+                for i in range(start, end)
+            ])
+            self.progress('Bookings', end, total)
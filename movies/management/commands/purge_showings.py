@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from movies.models import PurgeJob
+from movies.purge import parse_filters, run_purge, showings_matching
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes showings (and their bookings and holds) in chunks, e.g. to clear out old '
+        'schedules without locking the booking tables for long. Progress is also visible at '
+        '/api/movies/purge/<id>/.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--starts-after', help='Only showings starting at or after this ISO date/datetime')
+        parser.add_argument('--starts-before', help='Only showings starting before this ISO date/datetime')
+        parser.add_argument('--theater', type=int, action='append', dest='theaters', help='Theater id (repeatable)')
+        parser.add_argument('--chunk-size', type=int, help='Showings per transaction (default: PURGE_CHUNK_SIZE)')
+        parser.add_argument('--pause', type=float, help='Seconds between chunks (default: PURGE_CHUNK_PAUSE)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the matching showings')
+
+    def handle(self, *args, **options):
+        try:
+            filters = parse_filters(options)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['dry_run']:
+            self.stdout.write(f'{showings_matching(filters).count()} showings match {filters or "(everything)"}')
+            return
+
+        job = PurgeJob.objects.create(filters=filters)
+        try:
+            run_purge(job, chunk_size=options['chunk_size'], pause=options['pause'], progress=self.progress)
+        except Exception as e:
+            raise CommandError(f'Purge {job.pk} failed: {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Purge {job.pk} removed {job.showings_deleted} showings: {job.rows_deleted}'
+        ))
+
+    def progress(self, job):
+        self.stdout.write(f'  {job.showings_deleted}/{job.showings_total} showings')
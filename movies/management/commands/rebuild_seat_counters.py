@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from movies.models import Showing, Booking, SeatHold, Theater
+
+
+class Command(BaseCommand):
+    help = (
+        'Verifies and rebuilds the seats_sold / seats_remaining counters on showings. '
+        'Seats in open holds count as sold.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report drifted showings, exit with an error if any are found')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of showings fixed per UPDATE')
+
+    def handle(self, *args, **options):
+        drifted = self.find_drifted()
+        self.stdout.write(f'{len(drifted)} showings with drifted seat counters')
+
+        if options['check']:
+            if drifted:
+                raise CommandError(f'Seat counters out of date for showings: {drifted[:20]}')
+            return
+
+        batch_size = options['batch_size']
+        for i in range(0, len(drifted), batch_size):
+            self.rebuild(drifted[i:i + batch_size])
+            self.stdout.write(f'Rebuilt {min(i + batch_size, len(drifted))}/{len(drifted)}')
+
+        self.stdout.write(self.style.SUCCESS('Seat counters are up to date'))
+
+    def find_drifted(self):
+        """Compare every showing's counters against its bookings in one aggregate query"""
+        showings = Showing.objects.annotate(
+            actual_sold=self.seats_taken(),
+        ).values_list('id', 'seats_sold', 'seats_remaining', 'actual_sold', 'theater__capacity')
+
+        drifted = []
+        for showing_id, sold, remaining, actual_sold, capacity in showings.iterator(chunk_size=2000):
+            if sold != actual_sold or remaining != max(capacity - actual_sold, 0):
+                drifted.append(showing_id)
+        return drifted
+
+    def seats_taken(self):
+        """Booked plus held seats of the outer showing, as subqueries"""
+        def total(model):
+            return Coalesce(
+                Subquery(
+                    model.objects.filter(showing=OuterRef('pk'))
+                    .order_by().values('showing').annotate(total=Sum('seats')).values('total'),
+                    output_field=IntegerField(),
+                ),
+                Value(0),
+            )
+        return total(Booking) + total(SeatHold)
+
+    def rebuild(self, showing_ids):
+        """
+        Recompute counters inside the UPDATE itself, so bookings made
+        between the check and the fix are still counted.
+        """
+        Showing.objects.filter(pk__in=showing_ids).update(seats_sold=self.seats_taken())
+        capacity = Subquery(Theater.objects.filter(pk=OuterRef('theater_id')).values('capacity'))
+        Showing.objects.filter(pk__in=showing_ids).update(
+            seats_remaining=Greatest(capacity - F('seats_sold'), 0)
+        )
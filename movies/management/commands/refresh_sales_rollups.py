@@ -0,0 +1,21 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from movies import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the sales/occupancy rollups from showings and bookings (live and archived). '
+        'Run nightly to pick up rescheduled showings, resized theaters and bulk imports.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First local day (YYYY-MM-DD)')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last local day (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        if options['start'] and options['end'] and options['start'] > options['end']:
+            raise CommandError('--start must not be after --end')
+        rows = rollups.refresh(options['start'], options['end'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} rollup rows'))
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from movies import pricing
+
+
+class Command(BaseCommand):
+    help = (
+        'Sets the price of every showing starting in the next --days days from its base price and '
+        'projected demand (see movies.pricing). Run it a few times a day, e.g. from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=14, help='Length of the window to reprice (default: 14)')
+        parser.add_argument('--history-days', type=int, help='Days of past sales to learn demand from '
+                            '(default: PRICING_HISTORY_DAYS)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the prices that would change')
+
+    def handle(self, *args, **options):
+        if pricing.np is None:
+            raise CommandError('Repricing needs NumPy (pip install -r requirements.txt)')
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+
+        now = timezone.now()
+        model = pricing.DemandModel.fit(now, options['history_days'])
+        priced, changed = pricing.reprice(now, now + timedelta(days=options['days']), now, model,
+                                          dry_run=options['dry_run'])
+        verb = 'would change' if options['dry_run'] else 'changed'
+        self.stdout.write(self.style.SUCCESS(f'Priced {priced} showings, {changed} {verb}'))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from movies.holds import seconds_until_next_expiry, sweep_expired_holds
+
+
+class Command(BaseCommand):
+    help = (
+        'Releases the seats of expired holds. Runs once (e.g. from cron), or with --loop keeps '
+        'running and sleeps until the next hold is due instead of polling.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping until interrupted')
+        parser.add_argument('--batch-size', type=int, help='Holds released per transaction '
+                            '(default: SEAT_HOLD_SWEEP_BATCH)')
+        parser.add_argument('--granularity', type=float, default=1.0,
+                            help='Seconds; holds expiring within one such bucket are released together')
+        parser.add_argument('--max-sleep', type=float, default=30.0,
+                            help='Longest wait between sweeps, so new holds with earlier expiries are not missed for long')
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            released = sweep_expired_holds(batch_size=options['batch_size'])
+            self.stdout.write(f'Released {released} expired holds')
+            return
+
+        try:
+            while True:
+                released = sweep_expired_holds(batch_size=options['batch_size'])
+                if released:
+                    self.stdout.write(f'Released {released} expired holds')
+                wait = seconds_until_next_expiry(granularity=options['granularity'])
+                if wait is None:
+                    wait = options['max_sleep']
+                close_old_connections()
+                # Never spin: a due hold we skipped is locked by a confirm
+                time.sleep(min(max(wait, options['granularity']), options['max_sleep']))
+        except KeyboardInterrupt:
+            pass
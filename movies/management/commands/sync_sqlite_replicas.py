@@ -0,0 +1,38 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        'Copies the SQLite primary into every SQLite read replica, standing in for '
+        'replication when trying replica routing locally. Run it again to "replicate".'
+    )
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not primary['ENGINE'].endswith('sqlite3'):
+            raise CommandError('The primary is not an SQLite database')
+        if not replicas:
+            raise CommandError('No replicas configured; set DATABASE_REPLICA_URLS')
+
+        source = sqlite3.connect(primary['NAME'])
+        try:
+            for alias in replicas:
+                replica = settings.DATABASES[alias]
+                if not replica['ENGINE'].endswith('sqlite3'):
+                    self.stdout.write(self.style.WARNING(f'Skipping {alias}: not SQLite'))
+                    continue
+                # The online backup API copies a consistent snapshot even
+                # while the primary is being written to
+                target = sqlite3.connect(replica['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'{alias}: copied {primary["NAME"]} -> {replica["NAME"]}')
+        finally:
+            source.close()
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:46
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_seats_remaining(apps, schema_editor):
+    Showing = apps.get_model('movies', 'Showing')
+    Booking = apps.get_model('movies', 'Booking')
+
+    sold = dict(
+        Booking.objects.values_list('showing_id').annotate(total=Sum('seats'))
+    )
+    showings = list(Showing.objects.select_related('theater'))
+    for showing in showings:
+        showing.seats_remaining = max(showing.theater.capacity - sold.get(showing.id, 0), 0)
+    Showing.objects.bulk_update(showings, ['seats_remaining'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_rename_booking_time_booking_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showing',
+            name='seats_remaining',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_seats_remaining, migrations.RunPython.noop),
+    ]
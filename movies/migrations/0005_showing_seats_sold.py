@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:46
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_seats_sold(apps, schema_editor):
+    Showing = apps.get_model('movies', 'Showing')
+    Booking = apps.get_model('movies', 'Booking')
+
+    sold = dict(
+        Booking.objects.values_list('showing_id').annotate(total=Sum('seats'))
+    )
+    showings = list(Showing.objects.filter(pk__in=sold.keys()))
+    for showing in showings:
+        showing.seats_sold = sold[showing.id]
+    Showing.objects.bulk_update(showings, ['seats_sold'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_showing_seats_remaining'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showing',
+            name='seats_sold',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_seats_sold, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_showing_seats_sold'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='showing',
+            index=models.Index(fields=['start_time', 'theater'], name='showing_start_theater_idx'),
+        ),
+    ]
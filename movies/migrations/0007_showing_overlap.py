@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:04
+
+from django.db import migrations, models
+
+CONSTRAINT = 'showing_no_overlap'
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    """
+    On PostgreSQL, let the database itself refuse overlapping showings in
+    a theater. Other backends rely on the application-level check.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    # Fails on existing overlaps (resolve them via /api/movies/schedule/conflicts/
+    # and migrate again) or without permission to create the extension
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        f'ALTER TABLE movies_showing ADD CONSTRAINT {CONSTRAINT} '
+        'EXCLUDE USING gist (theater_id WITH =, tstzrange(start_time, end_time) WITH &&) '
+        'WHERE (end_time IS NOT NULL)'
+    )
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'ALTER TABLE movies_showing DROP CONSTRAINT IF EXISTS {CONSTRAINT}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_showing_start_time_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='showing',
+            index=models.Index(fields=['theater', 'start_time', 'end_time'], name='showing_theater_span_idx'),
+        ),
+        migrations.RunPython(add_exclusion_constraint, drop_exclusion_constraint),
+    ]
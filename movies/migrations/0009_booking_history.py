@@ -0,0 +1,39 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:31
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_showing_start(apps, schema_editor):
+    Showing = apps.get_model('movies', 'Showing')
+    Booking = apps.get_model('movies', 'Booking')
+
+    Booking.objects.update(showing_start=Subquery(
+        Showing.objects.filter(pk=OuterRef('showing_id')).values('start_time')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_seathold'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='showing_start',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_showing_start, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='booking_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'showing_start', 'id'], name='booking_user_start_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0010_purgejob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedShowing',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('movie_title', models.CharField(max_length=200)),
+                ('theater_name', models.CharField(max_length=100)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('seats_sold', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('movie', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='movies.movie')),
+                ('theater', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='movies.theater')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('seats', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('showing_start', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('showing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='movies.archivedshowing')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedshowing',
+            index=models.Index(fields=['start_time'], name='archshowing_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='archbooking_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['user', 'showing_start', 'id'], name='archbooking_user_start_idx'),
+        ),
+    ]
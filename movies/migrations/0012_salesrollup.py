@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0011_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('showings', models.IntegerField(default=0)),
+                ('capacity', models.IntegerField(default=0)),
+                ('seats_sold', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('movie', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='movies.movie')),
+                ('theater', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='movies.theater')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'hour', 'movie', 'theater'), name='salesrollup_bucket_unique')],
+            },
+        ),
+    ]
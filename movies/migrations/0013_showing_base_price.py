@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0012_salesrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showing',
+            name='base_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0013_showing_base_price'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='seathold',
+            index=models.Index(fields=['showing', 'expires_at'], name='seathold_showing_expires_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_unit_price(apps, schema_editor):
+    # Best known: what the showing costs now
+    for booking_name, showing_name in (('Booking', 'Showing'), ('ArchivedBooking', 'ArchivedShowing')):
+        Showing = apps.get_model('movies', showing_name)
+        apps.get_model('movies', booking_name).objects.update(unit_price=Subquery(
+            Showing.objects.filter(pk=OuterRef('showing_id')).values('price')
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0014_seathold_showing_expires_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedbooking',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=6, null=True),
+        ),
+        migrations.RunPython(fill_unit_price, migrations.RunPython.noop),
+    ]
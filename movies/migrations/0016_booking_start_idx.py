@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0015_booking_unit_price'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['showing_start'], name='archbooking_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['showing_start'], name='booking_start_idx'),
+        ),
+    ]
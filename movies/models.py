@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
 from users.models import User
 
 class Movie(models.Model):
@@ -23,6 +25,47 @@ class Showing(models.Model):
     start_time = models.DateTimeField()
     end_time = models.DateTimeField(blank=True, null=True)
     price = models.DecimalField(max_digits=6, decimal_places=2)
+    # The price movies.pricing scales with demand. Null until the first
+    # reprice, which takes it from price
+    base_price = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
+    # Maintained atomically by movies.reservations, never by a plain save()
+    seats_sold = models.PositiveIntegerField(default=0)
+    seats_remaining = models.PositiveIntegerField(blank=True, null=True)
+    
+    COUNTER_FIELDS = ('seats_sold', 'seats_remaining')
+    
+    class Meta:
+        indexes = [
+            # Schedule lookups are date ranges, usually listed per theater
+            models.Index(fields=['start_time', 'theater'], name='showing_start_theater_idx'),
+            # Overlap checks are a short range scan within one theater
+            models.Index(fields=['theater', 'start_time', 'end_time'], name='showing_theater_span_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        if self.seats_remaining is None:
+            self.seats_remaining = max(self.theater.capacity - self.seats_sold, 0)
+            super().save(*args, **kwargs)
+            return
+        
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Don't overwrite counters that concurrent bookings may have moved
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+            super().save(*args, **kwargs)
+            # The theater may have changed, so re-derive what is left from it
+            self.sync_seats_remaining()
+            return
+        
+        super().save(*args, **kwargs)
+    
+    def sync_seats_remaining(self):
+        Showing.objects.filter(pk=self.pk).update(
+            seats_remaining=Greatest(Value(self.theater.capacity) - F('seats_sold'), 0)
+        )
+        self.refresh_from_db(fields=list(self.COUNTER_FIELDS))
     
     def __str__(self):
         return f"{self.movie.title} - {self.theater.name} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
@@ -32,6 +75,146 @@ class Booking(models.Model):
     showing = models.ForeignKey(Showing, on_delete=models.CASCADE)
     seats = models.PositiveIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # Copy of showing.start_time, so a customer's upcoming or past bookings
+    # are one index range instead of a join over their whole history.
+    # Filled in by save() (bulk_create callers set it), kept in step with
+    # the showing by movies.signals
+    showing_start = models.DateTimeField(null=True, editable=False)
+    # The showing's price when the booking was made; revenue is counted at
+    # this, whatever the showing is repriced to later. Filled in by save()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2, null=True, editable=False)
+    
+    class Meta:
+        indexes = [
+            # A customer's history, newest first (id breaks keyset ties)
+            models.Index(fields=['user', '-created_at', '-id'], name='booking_user_created_idx'),
+            models.Index(fields=['user', 'showing_start', 'id'], name='booking_user_start_idx'),
+            # Past bookings by showing date, for movies.pricing's booking curve
+            models.Index(fields=['showing_start'], name='booking_start_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        if self.showing_id is not None and (self.showing_start is None or self.unit_price is None):
+            # Loads (and caches) the showing, which callers usually
+            # serialize next anyway
+            if self.showing_start is None:
+                self.showing_start = self.showing.start_time
+            if self.unit_price is None:
+                self.unit_price = self._meta.get_field('unit_price').to_python(self.showing.price)
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.user.username} - {self.showing} - {self.seats} seats"
+
+class SeatHold(models.Model):
+    """
+    Seats set aside while a customer finishes checking out. The seats are
+    taken from the showing's counters when the hold is made; confirming
+    turns the hold into a Booking, expiry or release hands them back.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    showing = models.ForeignKey(Showing, on_delete=models.CASCADE)
+    seats = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            # The sweeper: the oldest expiries first
+            models.Index(fields=['expires_at'], name='seathold_expires_idx'),
+            # Lapsed holds in the way of a new hold on one showing
+            models.Index(fields=['showing', 'expires_at'], name='seathold_showing_expires_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.showing} - {self.seats} seats until {self.expires_at:%H:%M:%S}"
+
+class PurgeJob(models.Model):
+    """A chunked background delete of showings; see movies.purge"""
+    PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+    
+    requested_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    # starts_after / starts_before (ISO datetimes) and theaters (ids)
+    filters = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    showings_total = models.PositiveIntegerField(null=True, blank=True)
+    showings_deleted = models.PositiveIntegerField(default=0)
+    # Rows removed per model, e.g. {"movies.Booking": 1200}
+    rows_deleted = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Purge {self.pk} ({self.status}): {self.showings_deleted}/{self.showings_total} showings"
+
+class ArchivedShowing(models.Model):
+    """
+    A finished showing moved out of the hot tables by archive_showings.
+    Keeps its original id, and copies the names shown in booking history
+    so it reads the same after the movie or theater is gone.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    movie = models.ForeignKey(Movie, null=True, on_delete=models.SET_NULL)
+    theater = models.ForeignKey(Theater, null=True, on_delete=models.SET_NULL)
+    movie_title = models.CharField(max_length=200)
+    theater_name = models.CharField(max_length=100)
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField(blank=True, null=True)
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    seats_sold = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_time'], name='archshowing_start_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.movie_title} - {self.theater_name} - {self.start_time.strftime('%Y-%m-%d %H:%M')} (archived)"
+
+class ArchivedBooking(models.Model):
+    """A booking of an ArchivedShowing, with its original id"""
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    showing = models.ForeignKey(ArchivedShowing, on_delete=models.CASCADE)
+    seats = models.PositiveIntegerField()
+    created_at = models.DateTimeField()
+    showing_start = models.DateTimeField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2, null=True)
+    
+    class Meta:
+        # Same shape as Booking's, for the same history pages
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='archbooking_user_created_idx'),
+            models.Index(fields=['user', 'showing_start', 'id'], name='archbooking_user_start_idx'),
+            models.Index(fields=['showing_start'], name='archbooking_start_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.showing} - {self.seats} seats"
+
+class SalesRollup(models.Model):
+    """
+    Showings, seats offered, seats booked and revenue per local day, hour
+    of showing start, movie and theater; see movies.rollups. Movie and
+    theater deletes leave the history alone.
+    """
+    day = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    movie = models.ForeignKey(Movie, null=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    theater = models.ForeignKey(Theater, null=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    showings = models.IntegerField(default=0)
+    capacity = models.IntegerField(default=0)
+    seats_sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'hour', 'movie', 'theater'], name='salesrollup_bucket_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.hour:02d}h movie={self.movie_id} theater={self.theater_id}: {self.seats_sold} seats"
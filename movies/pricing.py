@@ -0,0 +1,228 @@
+"""
+Demand-based showing prices.
+
+Every upcoming showing in a window is priced in one pass over NumPy
+arrays (one element per showing), not one showing at a time:
+
+    prior      = mean fill * movie factor * weekday factor
+    projected  = min(fill so far + (1 - booked share) * prior, 1)
+    factor     = 1 + PRICING_SENSITIVITY * (projected - target) / target
+    price      = base price * factor, clipped to PRICING_MIN/MAX_FACTOR
+                 and rounded to PRICING_STEP
+
+"Booked share" is the part of a showing's final sales that, going by
+past bookings, is usually in by this many hours before the start. Far
+from showtime the prior carries the projection; close to it, the seats
+actually sold do. Movie and weekday factors are how full those movies
+and days ran compared with the mean, read from the sales rollups.
+
+Prices always scale Showing.base_price, so repricing again and again
+doesn't drift. NumPy is only needed here, by the reprice_showings and
+benchmark_pricing commands.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.db.models.functions import ExtractIsoWeekDay
+from django.utils import timezone
+
+from .models import ArchivedBooking, Booking, SalesRollup, Showing
+from .schedule_cache import invalidate_schedule
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Hours before the start at which the booking curve is sampled
+LEAD_HOURS = (0, 1, 3, 6, 12, 24, 48, 72, 120, 168, 336, 720)
+# Without booking history, assume sales come in as exp(-hours / this)
+DEFAULT_BOOKING_HOURS = 72
+# Seats of evidence a movie or weekday needs before its own fill rate
+# counts as much as the overall mean
+PRIOR_SEATS = 500
+# Rows per UPDATE ... WHERE id IN (...)
+WRITE_CHUNK = 900
+
+
+class DemandModel:
+    """What past sales say about how full a showing will end up"""
+
+    def __init__(self, booked_share, mean_fill, movie_ids=(), movie_factors=(), weekday_factors=None):
+        self.booked_share_curve = np.asarray(booked_share, dtype=float)
+        self.mean_fill = mean_fill
+        order = np.argsort(np.asarray(movie_ids, dtype=np.int64))
+        self.movie_ids = np.asarray(movie_ids, dtype=np.int64)[order]
+        self.movie_factors = np.asarray(movie_factors, dtype=float)[order]
+        self.weekday_factors = np.ones(7) if weekday_factors is None else np.asarray(weekday_factors, dtype=float)
+
+    @classmethod
+    def fit(cls, now=None, history_days=None):
+        """Fit to the last `history_days` days (default PRICING_HISTORY_DAYS) before `now`"""
+        now = now or timezone.now()
+        since = now - timedelta(days=history_days or settings.PRICING_HISTORY_DAYS)
+        mean_fill, movie_ids, movie_factors, weekday_factors = _fill_factors(
+            timezone.localdate(since), timezone.localdate(now)
+        )
+        return cls(_booking_curve(since, now), mean_fill, movie_ids, movie_factors, weekday_factors)
+
+    def booked_share(self, lead_hours):
+        return np.interp(lead_hours, LEAD_HOURS, self.booked_share_curve)
+
+    def movie_factor(self, movie_ids):
+        factors = np.ones(len(movie_ids))
+        if len(self.movie_ids):
+            at = np.searchsorted(self.movie_ids, movie_ids).clip(max=len(self.movie_ids) - 1)
+            known = self.movie_ids[at] == movie_ids
+            factors[known] = self.movie_factors[at[known]]
+        return factors
+
+    def projected_fill(self, fill, lead_hours, movie_ids, weekdays):
+        """Expected final fill rate; weekdays are 0 (Monday) to 6"""
+        prior = self.mean_fill * self.movie_factor(movie_ids) * self.weekday_factors[weekdays]
+        return np.minimum(fill + (1 - self.booked_share(lead_hours)) * prior, 1)
+
+    def prices(self, base, capacity, sold, lead_hours, movie_ids, weekdays):
+        """Suggested prices (floats, on the PRICING_STEP grid) for arrays of showings"""
+        fill = np.divide(sold, capacity, out=np.ones(len(base)), where=capacity > 0)
+        projected = self.projected_fill(fill, np.maximum(lead_hours, 0), movie_ids, weekdays)
+        target = settings.PRICING_TARGET_FILL
+        factor = np.clip(1 + settings.PRICING_SENSITIVITY * (projected - target) / target,
+                         settings.PRICING_MIN_FACTOR, settings.PRICING_MAX_FACTOR)
+        step = float(settings.PRICING_STEP)
+        return np.maximum(np.rint(base * factor / step), 1) * step
+
+
+def _lead_buckets(model, since, now):
+    """
+    Seats booked per lead-time bucket, summed in SQL: bucket i holds the
+    bookings made less than LEAD_HOURS[i] hours before the start (and not
+    less than LEAD_HOURS[i - 1]); bucket len(LEAD_HOURS) the earlier ones
+    """
+    bucket = Case(
+        *[When(created_at__gt=F('showing_start') - timedelta(hours=hours), then=Value(i))
+          for i, hours in enumerate(LEAD_HOURS) if i],
+        # Bookings made after the start (e.g. back-filled) land in bucket 1
+        default=Value(len(LEAD_HOURS)),
+    )
+    return model.objects.filter(showing_start__gte=since, showing_start__lt=now).annotate(
+        bucket=bucket,
+    ).values_list('bucket').annotate(seats=Sum('seats')).order_by()
+
+
+def _booking_curve(since, now):
+    """Share of a showing's seats already booked at each of LEAD_HOURS before it starts"""
+    seats = np.zeros(len(LEAD_HOURS) + 1)
+    for model in (Booking, ArchivedBooking):
+        rows = np.array(list(_lead_buckets(model, since, now)), dtype=float).reshape(-1, 2)
+        np.add.at(seats, rows[:, 0].astype(int), rows[:, 1])
+    if not seats.sum():
+        return np.exp(-np.asarray(LEAD_HOURS, dtype=float) / DEFAULT_BOOKING_HOURS)
+
+    # Seats booked with less than h hours to go are not in yet at h
+    late = np.cumsum(seats)[:len(LEAD_HOURS)]
+    return 1 - late / seats.sum()
+
+
+def _smoothed(sold, capacity, mean_fill):
+    """Fill rates relative to mean_fill, pulled towards 1 where there is little data"""
+    return (sold + PRIOR_SEATS * mean_fill) / (capacity + PRIOR_SEATS) / mean_fill
+
+
+def _fill_factors(first_day, last_day):
+    """(mean fill, movie ids, movie factors, weekday factors) for showings on first_day..last_day - 1"""
+    past = SalesRollup.objects.filter(day__gte=first_day, day__lt=last_day, capacity__gt=0)
+    totals = past.aggregate(sold=Sum('seats_sold'), capacity=Sum('capacity'))
+    if not totals['capacity'] or not totals['sold']:
+        return settings.PRICING_TARGET_FILL, [], [], None
+    mean_fill = totals['sold'] / totals['capacity']
+
+    movies = np.array(
+        past.values_list('movie').annotate(sold=Sum('seats_sold'), seats=Sum('capacity')).order_by(),
+        dtype=float,
+    ).reshape(-1, 3)
+    movie_factors = _smoothed(movies[:, 1], movies[:, 2], mean_fill)
+
+    weekday_factors = np.ones(7)
+    days = np.array(
+        past.annotate(weekday=ExtractIsoWeekDay('day')).values_list('weekday')
+        .annotate(sold=Sum('seats_sold'), seats=Sum('capacity')).order_by(),
+        dtype=float,
+    ).reshape(-1, 3)
+    weekday_factors[days[:, 0].astype(int) - 1] = _smoothed(days[:, 1], days[:, 2], mean_fill)
+    return mean_fill, movies[:, 0].astype(np.int64), movie_factors, weekday_factors
+
+
+def upcoming(start, end, now=None):
+    """
+    Column arrays for the showings starting in [start, end), skipping any
+    that have already started: id, base, price, capacity, sold, movie,
+    weekday and lead_hours.
+    """
+    now = now or timezone.now()
+    rows = list(Showing.objects.filter(start_time__gte=max(start, now), start_time__lt=end).values_list(
+        'id', 'base_price', 'price', 'theater__capacity', 'seats_sold', 'movie_id', 'start_time',
+        ExtractIsoWeekDay('start_time'),
+    ).order_by())
+    ids, bases, prices, capacity, sold, movies, starts, weekdays = zip(*rows) if rows else ([],) * 8
+    price = np.array(prices, dtype=float)
+    base = np.array([p if b is None else b for b, p in zip(bases, prices)], dtype=float)
+    return {
+        'id': np.array(ids, dtype=np.int64),
+        'base': base,
+        'price': price,
+        'capacity': np.array(capacity, dtype=float),
+        'sold': np.array(sold, dtype=float),
+        'movie': np.array(movies, dtype=np.int64),
+        'weekday': np.array(weekdays, dtype=np.int64) - 1,
+        'lead_hours': np.array([(s - now).total_seconds() for s in starts], dtype=float) / 3600,
+    }
+
+
+def suggest(showings, model):
+    """Suggested prices for the columns returned by upcoming()"""
+    return model.prices(showings['base'], showings['capacity'], showings['sold'],
+                        showings['lead_hours'], showings['movie'], showings['weekday'])
+
+
+def write_prices(ids, prices):
+    """
+    Set Showing.price for these ids, with one UPDATE per distinct price
+    (there are only a few on the PRICING_STEP grid). Showings without a
+    base price keep their current one as base. Returns the rows updated.
+    """
+    cents = np.rint(np.asarray(prices) * 100).astype(np.int64)
+    values, groups = np.unique(cents, return_inverse=True)
+    updated = 0
+    with transaction.atomic():
+        for chunk in _chunks(ids.tolist()):
+            Showing.objects.filter(pk__in=chunk, base_price__isnull=True).update(base_price=F('price'))
+        for at, value in enumerate(values.tolist()):
+            for chunk in _chunks(ids[groups == at].tolist()):
+                updated += Showing.objects.filter(pk__in=chunk).update(price=Decimal(value) / 100)
+    if updated:
+        invalidate_schedule()
+    return updated
+
+
+def _chunks(ids):
+    for at in range(0, len(ids), WRITE_CHUNK):
+        yield ids[at:at + WRITE_CHUNK]
+
+
+def reprice(start, end, now=None, model=None, dry_run=False):
+    """
+    Reprice the showings starting in [start, end). Returns (showings
+    priced, showings whose price changed).
+    """
+    now = now or timezone.now()
+    model = model or DemandModel.fit(now)
+    showings = upcoming(start, end, now)
+    prices = suggest(showings, model)
+    changed = np.rint(prices * 100) != np.rint(showings['price'] * 100)
+    if not dry_run:
+        write_prices(showings['id'][changed], prices[changed])
+    return len(prices), int(changed.sum())
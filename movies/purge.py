@@ -0,0 +1,198 @@
+"""
+Bulk deletes of showings that don't stall the booking path.
+
+Showings are deleted in primary key order, PURGE_CHUNK_SIZE at a time.
+Each chunk is its own short transaction, so row and table locks are held
+for one chunk only. A PURGE_CHUNK_PAUSE between chunks gives other
+writers a turn. Within a chunk every table under Showing's CASCADE
+relations gets a single raw DELETE, children first. No rows are loaded
+and no per-row signals are sent. Those signals would only hand seats back
+to showings that are being deleted anyway, take the rows out of the
+sales rollups (done per chunk from two aggregate queries instead) and
+invalidate the schedule cache (done once at the end).
+
+Relations that need the collector (SET_NULL, PROTECT, ...) make the
+purge fall back to QuerySet.delete() per chunk. That is still bounded,
+just slower.
+
+Jobs are PurgeJob rows. The API runs them on a background thread, and
+the purge_showings command runs them in the foreground. Both update the
+row after every chunk.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, time as dt_time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import rollups
+from .models import PurgeJob, Showing
+from .schedule_cache import invalidate_schedule
+
+logger = logging.getLogger(__name__)
+
+
+class UnsafeRawDelete(Exception):
+    pass
+
+
+def _parse_moment(value, name):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'{name} must be an ISO date or datetime')
+        moment = datetime.combine(day, dt_time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_filters(data):
+    """
+    Validated, JSON-storable filters from request data or command options:
+    starts_after / starts_before (ISO date or datetime; dates mean
+    midnight) and theaters (an id or a list of ids). Raises ValueError.
+    """
+    filters = {}
+    try:
+        for name in ('starts_after', 'starts_before'):
+            if data.get(name):
+                filters[name] = _parse_moment(str(data[name]), name).isoformat()
+    except (TypeError, ValueError) as e:
+        raise ValueError(str(e))
+    theaters = data.get('theaters')
+    if theaters not in (None, '', []):
+        if not isinstance(theaters, (list, tuple)):
+            theaters = [theaters]
+        try:
+            filters['theaters'] = sorted({int(theater) for theater in theaters})
+        except (TypeError, ValueError):
+            raise ValueError('theaters must be a list of theater ids')
+    return filters
+
+
+def showings_matching(filters):
+    showings = Showing.objects.all()
+    if 'starts_after' in filters:
+        showings = showings.filter(start_time__gte=parse_datetime(filters['starts_after']))
+    if 'starts_before' in filters:
+        showings = showings.filter(start_time__lt=parse_datetime(filters['starts_before']))
+    if 'theaters' in filters:
+        showings = showings.filter(theater_id__in=filters['theaters'])
+    return showings
+
+
+def check_raw_delete(model, seen=()):
+    """Raise UnsafeRawDelete unless everything under `model` is plain CASCADE"""
+    for rel in model._meta.related_objects:
+        if rel.on_delete is models.DO_NOTHING:
+            continue
+        if rel.many_to_many or rel.on_delete is not models.CASCADE:
+            raise UnsafeRawDelete(f'{rel.related_model._meta.label}.{rel.field.name} needs the collector')
+        if rel.related_model not in seen:
+            check_raw_delete(rel.related_model, (*seen, model))
+
+
+def _raw_delete_tree(model, lookup, value, using, counts):
+    for rel in model._meta.related_objects:
+        if rel.on_delete is models.CASCADE:
+            _raw_delete_tree(rel.related_model, f'{rel.field.name}__{lookup}', value, using, counts)
+    deleted = model._base_manager.using(using).filter(**{lookup: value})._raw_delete(using)
+    if deleted:
+        counts[model._meta.label] = counts.get(model._meta.label, 0) + deleted
+
+
+def delete_showings(ids, using=DEFAULT_DB_ALIAS, raw=True):
+    """
+    Delete the showings with these ids and everything that cascades from
+    them, in one transaction. Returns rows deleted per model label.
+    """
+    counts = {}
+    with transaction.atomic(using=using):
+        if raw:
+            ids = list(ids)
+            rollups.remove_showings(ids)
+            _raw_delete_tree(Showing, 'pk__in', ids, using, counts)
+        else:
+            _, per_model = Showing.objects.using(using).filter(pk__in=ids).delete()
+            counts = {label: n for label, n in per_model.items() if n}
+    return counts
+
+
+def run_purge(job, chunk_size=None, pause=None, progress=None):
+    """
+    Run a PurgeJob to completion in this thread, calling progress(job)
+    after each chunk. Failures are recorded on the job and re-raised.
+    """
+    chunk_size = chunk_size or settings.PURGE_CHUNK_SIZE
+    pause = settings.PURGE_CHUNK_PAUSE if pause is None else pause
+    try:
+        check_raw_delete(Showing)
+        raw = True
+    except UnsafeRawDelete as e:
+        logger.warning('Purge %s falls back to the delete collector: %s', job.pk, e)
+        raw = False
+
+    showings = showings_matching(job.filters)
+    job.status, job.started_at = PurgeJob.RUNNING, timezone.now()
+    job.showings_total = showings.count()
+    job.save(update_fields=['status', 'started_at', 'showings_total'])
+
+    try:
+        last_pk = 0
+        while True:
+            ids = list(showings.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                break
+            for label, deleted in delete_showings(ids, raw=raw).items():
+                job.rows_deleted[label] = job.rows_deleted.get(label, 0) + deleted
+            job.showings_deleted += len(ids)
+            job.save(update_fields=['showings_deleted', 'rows_deleted'])
+            if progress:
+                progress(job)
+            last_pk = ids[-1]
+            if pause:
+                time.sleep(pause)
+    except Exception as e:
+        job.status, job.error, job.finished_at = PurgeJob.FAILED, str(e), timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        raise
+    finally:
+        if job.showings_deleted:
+            invalidate_schedule()
+
+    job.status, job.finished_at = PurgeJob.DONE, timezone.now()
+    job.save(update_fields=['status', 'finished_at'])
+    logger.info('Purge %s removed %d showings (%s)', job.pk, job.showings_deleted, job.rows_deleted)
+    return job
+
+
+def _run_in_background(job_id):
+    try:
+        run_purge(PurgeJob.objects.get(pk=job_id))
+    except Exception:
+        logger.exception('Purge %s failed', job_id)
+    finally:
+        connection.close()
+
+
+def start_purge(filters, user=None):
+    """
+    Create a PurgeJob and run it on a background thread once the current
+    transaction commits (inline when PURGE_IN_BACKGROUND is off).
+    """
+    job = PurgeJob.objects.create(requested_by=user, filters=filters)
+    if getattr(settings, 'PURGE_IN_BACKGROUND', True):
+        thread = threading.Thread(target=_run_in_background, args=(job.pk,), name=f'purge-{job.pk}', daemon=True)
+        transaction.on_commit(thread.start)
+        return job
+    try:
+        run_purge(job)
+    except Exception:
+        logger.exception('Purge %s failed', job.pk)
+    return job
@@ -0,0 +1,140 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Greatest, Least
+
+from . import rollups
+from .models import Showing, Theater
+
+# Showings recently seen sold out, mapped to the monotonic time until which
+# we reject new requests without touching the database.
+_sold_out_until = {}
+
+_local = threading.local()
+
+
+class ReservationError(Exception):
+    """Base class for seat reservation failures"""
+
+
+class SoldOut(ReservationError):
+    pass
+
+
+class NotEnoughSeats(ReservationError):
+    def __init__(self, requested, remaining):
+        self.requested = requested
+        self.remaining = remaining
+        super().__init__(f'Only {remaining} seats left, {requested} requested')
+
+
+def _sold_out_ttl():
+    return getattr(settings, 'SEAT_SOLD_OUT_CACHE_SECONDS', 2.0)
+
+
+def is_known_sold_out(showing_id):
+    """Fast path: was this showing sold out a moment ago?"""
+    until = _sold_out_until.get(showing_id)
+    if until is None:
+        return False
+    if until < time.monotonic():
+        _sold_out_until.pop(showing_id, None)
+        return False
+    return True
+
+
+def _mark_sold_out(showing_id):
+    _sold_out_until[showing_id] = time.monotonic() + _sold_out_ttl()
+
+
+def forget_sold_out(showing_id):
+    """Drop the fast-path mark, e.g. when seats are handed back"""
+    _sold_out_until.pop(showing_id, None)
+
+
+def reserve_seats(showing_id, seats):
+    """
+    Atomically take `seats` from a showing's remaining-seat counter.
+
+    The decrement is a single conditional UPDATE, so concurrent callers can
+    never push the counter below zero on either SQLite or Postgres. Returns
+    the number of seats left after the reservation.
+    """
+    if is_known_sold_out(showing_id):
+        raise SoldOut('Showing is sold out')
+
+    updated = Showing.objects.filter(
+        pk=showing_id,
+        seats_remaining__gte=seats,
+    ).update(
+        seats_sold=F('seats_sold') + seats,
+        seats_remaining=F('seats_remaining') - seats,
+    )
+
+    remaining = Showing.objects.filter(pk=showing_id).values_list('seats_remaining', flat=True).first()
+
+    if updated:
+        if remaining == 0:
+            # Only once the seats are really gone: the caller's transaction
+            # may still roll back (e.g. its Booking insert fails)
+            transaction.on_commit(lambda: _mark_sold_out(showing_id))
+        return remaining
+
+    if remaining is None and not Showing.objects.filter(pk=showing_id).exists():
+        raise Showing.DoesNotExist(f'Showing {showing_id} not found')
+    if not remaining:
+        _mark_sold_out(showing_id)
+        raise SoldOut('Showing is sold out')
+    raise NotEnoughSeats(seats, remaining)
+
+
+def release_seats(showing_id, seats):
+    """Give `seats` back to a showing, e.g. when a booking is cancelled"""
+    forget_sold_out(showing_id)
+    # Never more than the theater holds now: it may have shrunk since the
+    # seats were taken (the SET clauses all see the old seats_sold)
+    capacity = Subquery(Theater.objects.filter(pk=OuterRef('theater_id')).values('capacity')[:1])
+    return Showing.objects.filter(pk=showing_id).update(
+        seats_sold=F('seats_sold') - seats,
+        seats_remaining=Greatest(Least(F('seats_remaining') + seats, capacity - F('seats_sold') + seats), 0),
+    )
+
+
+def counters_suspended():
+    """True while delete_bookings() or the hold sweeper is releasing seats itself"""
+    return getattr(_local, 'suspended', False)
+
+
+@contextmanager
+def suspend_counters():
+    """Stop the delete signals from releasing seats in this block"""
+    previous = counters_suspended()
+    _local.suspended = True
+    try:
+        yield
+    finally:
+        _local.suspended = previous
+
+
+def delete_bookings(bookings):
+    """
+    Delete a queryset of bookings and hand their seats back (and take
+    them off the sales rollups) with one UPDATE per affected showing
+    instead of one per booking.
+    """
+    with transaction.atomic():
+        released = list(
+            bookings.order_by().values_list('showing_id').annotate(
+                total=Sum('seats'), revenue=Sum(F('seats') * F('unit_price')),
+            ).order_by('showing_id')
+        )
+        with suspend_counters():
+            deleted, _ = bookings.delete()
+        for showing_id, total, _ in released:
+            release_seats(showing_id, total)
+        rollups.record_cancellations(released)
+    return deleted
@@ -0,0 +1,215 @@
+"""
+Sales and occupancy rollups.
+
+SalesRollup has one row per (local day, hour of showing start, movie,
+theater). Each row holds the showings scheduled, seats offered (sum of
+theater capacities), seats booked and revenue (at each booking's
+unit_price, what the showing cost when it was booked). The signals in
+movies.signals keep the rows current as showings and bookings come and
+go, with one conditional UPDATE (or INSERT) in the writer's own
+transaction. A rescheduled showing or one moved to another theater
+takes its counts to the new bucket, and a resized theater updates the
+capacity of its buckets. The schedule importer counts what it
+bulk-creates, and purges, which delete raw, subtract what they remove.
+refresh(), which the refresh_sales_rollups command runs, rebuilds rows
+from scratch and also counts other bulk-loaded and archived data.
+
+Reports read only SalesRollup. Their cost depends on the number of
+buckets in the date range, not on how many bookings were made.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Min, Sum
+from django.db.models.functions import Coalesce, ExtractHour, TruncDate
+from django.utils import timezone
+
+from .models import ArchivedBooking, ArchivedShowing, Booking, SalesRollup, Showing
+
+DIMENSIONS = ('day', 'hour', 'movie', 'theater')
+MEASURES = ('showings', 'capacity', 'seats_sold', 'revenue')
+
+
+def bucket(start_time):
+    local = timezone.localtime(start_time)
+    return local.date(), local.hour
+
+
+def _bump(start_time, movie_id, theater_id, **deltas):
+    day, hour = bucket(start_time)
+    key = {'day': day, 'hour': hour, 'movie_id': movie_id, 'theater_id': theater_id}
+    updates = {name: F(name) + delta for name, delta in deltas.items()}
+    if SalesRollup.objects.filter(**key).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            SalesRollup.objects.create(**key, **deltas)
+    except IntegrityError:
+        # Another writer created the bucket first
+        SalesRollup.objects.filter(**key).update(**updates)
+
+
+def record_showing(showing, sign=1):
+    _bump(showing.start_time, showing.movie_id, showing.theater_id,
+          showings=sign, capacity=sign * showing.theater.capacity)
+
+
+def record_showings(showings):
+    """Count showings created together (e.g. by bulk_create), one write per bucket"""
+    totals = {}
+    for showing in showings:
+        key = (*bucket(showing.start_time), showing.movie_id, showing.theater_id)
+        counts = totals.setdefault(key, [showing.start_time, 0, 0])
+        counts[1] += 1
+        counts[2] += showing.theater.capacity
+    for (_, _, movie_id, theater_id), (start_time, count, capacity) in totals.items():
+        _bump(start_time, movie_id, theater_id, showings=count, capacity=capacity)
+
+
+def move_showing(showing, start_time, movie_id, theater_id, capacity):
+    """
+    Move a saved showing, and its bookings, out of the bucket it was
+    counted in with this start_time, movie, theater and capacity
+    """
+    sales = Booking.objects.filter(showing=showing).aggregate(sold=Sum('seats'), paid=Sum(_booking_amount()))
+    seats, revenue = sales['sold'] or 0, sales['paid'] or 0
+    _bump(start_time, movie_id, theater_id, showings=-1, capacity=-capacity, seats_sold=-seats, revenue=-revenue)
+    _bump(showing.start_time, showing.movie_id, showing.theater_id, showings=1,
+          capacity=showing.theater.capacity, seats_sold=seats, revenue=revenue)
+
+
+def resize_theater(theater_id, change):
+    """Add `change` seats per showing to the theater's buckets"""
+    SalesRollup.objects.filter(theater_id=theater_id).update(capacity=F('capacity') + change * F('showings'))
+
+
+def record_sale(showing, seats, revenue):
+    """Count `seats` booked on `showing` for `revenue` (both negative for cancellations)"""
+    _bump(showing.start_time, showing.movie_id, showing.theater_id, seats_sold=seats, revenue=revenue)
+
+
+def booking_revenue(booking):
+    return booking.unit_price * booking.seats
+
+
+def record_cancellations(released):
+    """Subtract [(showing_id, seats, revenue), ...] released together by delete_bookings()"""
+    showings = Showing.objects.in_bulk([showing_id for showing_id, _, _ in released])
+    for showing_id, seats, revenue in released:
+        if showing_id in showings:
+            record_sale(showings[showing_id], -seats, -revenue)
+
+
+def remove_showings(ids):
+    """
+    Subtract the showings with these ids, and their bookings, ahead of a
+    raw delete that sends no signals. Run it in the deleting transaction.
+    """
+    totals = {}
+    _collect(totals, _showing_rows(Showing.objects.filter(pk__in=ids)))
+    _collect(totals, _sales_rows(Booking.objects.filter(showing_id__in=ids)))
+    for (day, hour, movie_id, theater_id), measures in totals.items():
+        SalesRollup.objects.filter(day=day, hour=hour, movie_id=movie_id, theater_id=theater_id).update(
+            **{name: F(name) - value for name, value in measures.items() if value}
+        )
+
+
+def _day_bounds(first_day, last_day):
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+    return start, end
+
+
+def _collect(totals, rows):
+    for row in rows:
+        key = (row['day'], row['hour'], row['bucket_movie'], row['bucket_theater'])
+        bucket_totals = totals.setdefault(key, dict.fromkeys(MEASURES, 0))
+        for name in MEASURES:
+            if name in row:
+                bucket_totals[name] += row[name] or 0
+
+
+def _showing_rows(showings):
+    return showings.annotate(
+        day=TruncDate('start_time'), hour=ExtractHour('start_time'),
+    ).values('day', 'hour', bucket_movie=F('movie'), bucket_theater=F('theater')).annotate(
+        showings=Count('id'), capacity=Coalesce(Sum('theater__capacity'), 0),
+    ).order_by()
+
+
+def _booking_amount():
+    return ExpressionWrapper(F('seats') * F('unit_price'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def _sales_rows(bookings):
+    return bookings.annotate(
+        day=TruncDate('showing__start_time'), hour=ExtractHour('showing__start_time'),
+    ).values('day', 'hour', bucket_movie=F('showing__movie'), bucket_theater=F('showing__theater')).annotate(
+        seats_sold=Sum('seats'), revenue=Sum(_booking_amount()),
+    ).order_by()
+
+
+def refresh(first_day=None, last_day=None):
+    """
+    Rebuild the rollups for local days first_day..last_day (inclusive;
+    default: every day with a showing, live or archived) from the
+    showing and booking tables. Returns the number of rows written.
+    """
+    if first_day is None or last_day is None:
+        bounds = [
+            model.objects.aggregate(first=Min('start_time'), last=Max('start_time'))
+            for model in (Showing, ArchivedShowing)
+        ]
+        starts = [bound['first'] for bound in bounds if bound['first']]
+        ends = [bound['last'] for bound in bounds if bound['last']]
+        if not starts:
+            SalesRollup.objects.all().delete()
+            return 0
+        first_day = first_day or bucket(min(starts))[0]
+        last_day = last_day or bucket(max(ends))[0]
+
+    start, end = _day_bounds(first_day, last_day)
+    totals = {}
+    for showing_model, booking_model in ((Showing, Booking), (ArchivedShowing, ArchivedBooking)):
+        _collect(totals, _showing_rows(showing_model.objects.filter(start_time__gte=start, start_time__lt=end)))
+        _collect(totals, _sales_rows(
+            booking_model.objects.filter(showing__start_time__gte=start, showing__start_time__lt=end)
+        ))
+
+    rows = [
+        SalesRollup(day=day, hour=hour, movie_id=movie_id, theater_id=theater_id, **measures)
+        for (day, hour, movie_id, theater_id), measures in totals.items()
+    ]
+    with transaction.atomic():
+        SalesRollup.objects.filter(day__gte=first_day, day__lte=last_day).delete()
+        SalesRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def occupancy(seats_sold, capacity):
+    return round(100 * seats_sold / capacity, 1) if capacity else None
+
+
+def report(first_day, last_day, group_by=('day',)):
+    """
+    Totals per combination of `group_by` dimensions (day, hour, movie,
+    theater) for local days first_day..last_day, plus overall totals.
+    """
+    names = {}
+    if 'movie' in group_by:
+        names['movie_title'] = F('movie__title')
+    if 'theater' in group_by:
+        names['theater_name'] = F('theater__name')
+    rows = list(
+        SalesRollup.objects.filter(day__gte=first_day, day__lte=last_day)
+        .values(*group_by, **names)
+        .annotate(**{f'total_{name}': Sum(name) for name in MEASURES})
+        .order_by(*group_by)
+    )
+    for row in rows:
+        for name in MEASURES:
+            row[name] = row.pop(f'total_{name}')
+    totals = {name: sum((row[name] for row in rows), 0) for name in MEASURES}
+    for row in (*rows, totals):
+        row['occupancy'] = occupancy(row['seats_sold'], row['capacity'])
+    return rows, totals
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from cinema_backend.routers import use_primary
+
+# Bumped on every schedule edit; it is part of every cache key, so one
+# write invalidates the cached payloads for all dates at once.
+GENERATION_KEY = 'schedule:generation'
+
+
+def get_cache():
+    return caches[getattr(settings, 'SCHEDULE_CACHE_ALIAS', 'default')]
+
+
+def _generation():
+    cache = get_cache()
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+async def _ageneration():
+    cache = get_cache()
+    generation = await cache.aget(GENERATION_KEY)
+    if generation is None:
+        await cache.aadd(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = await cache.aget(GENERATION_KEY)
+    return generation
+
+
+def invalidate_schedule():
+    """Drop every cached schedule payload"""
+    # A fresh timestamp rather than incr(), so a generation evicted from
+    # the cache can never come back with a value that old keys still use
+    get_cache().set(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def schedule_cache_key(name, *parts):
+    return ':'.join(['schedule', str(_generation()), name, *map(str, parts)])
+
+
+async def aschedule_cache_key(name, *parts):
+    return ':'.join(['schedule', str(await _ageneration()), name, *map(str, parts)])
+
+
+def make_etag(data):
+    payload = json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()
+    return '"%s"' % hashlib.md5(payload, usedforsecurity=False).hexdigest()
+
+
+def not_modified(request, etag):
+    """Whether the request's If-None-Match already covers `etag`"""
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in etags
+
+
+def cached_schedule_response(request, key, build):
+    """
+    Serve `build()`'s data from the schedule cache under `key`, tagged
+    with an ETag. Clients sending a matching If-None-Match get an empty
+    304 instead of the payload.
+    """
+    cache = get_cache()
+    entry = cache.get(key)
+    if entry is None:
+        # A lagging replica would get its payload cached for the full
+        # timeout; misses are rare enough to send them to the primary
+        with use_primary():
+            data = build()
+        entry = (make_etag(data), data)
+        cache.set(key, entry, getattr(settings, 'SCHEDULE_CACHE_TIMEOUT', 30))
+    etag, data = entry
+
+    if not_modified(request, etag):
+        return Response(status=304, headers={'ETag': etag})
+    return Response(data, headers={'ETag': etag})
+
+
+async def acached_schedule_entry(key, abuild):
+    """(etag, data) for `key`, awaiting `abuild()` on a miss"""
+    cache = get_cache()
+    entry = await cache.aget(key)
+    if entry is None:
+        with use_primary():
+            data = await abuild()
+        entry = (make_etag(data), data)
+        await cache.aset(key, entry, getattr(settings, 'SCHEDULE_CACHE_TIMEOUT', 30))
+    return entry
@@ -0,0 +1,240 @@
+"""
+Bulk schedule import and export as CSV or JSON lines.
+
+Both directions stream: imports parse and insert a chunk at a time,
+exports read rows with a server-side iterator and yield a chunk of lines
+at a time, so a quarter's schedule is never held in memory at once.
+"""
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import rollups
+from .flat_serializers import showing_values, serialize_showings
+from .models import Movie, Theater, Showing
+from .schedule_cache import invalidate_schedule
+from .scheduling import IntervalTree, longest_showing
+
+FORMATS = ('csv', 'jsonl')
+
+# Rejected rows beyond this are counted but not described
+MAX_REPORTED_ERRORS = 1000
+
+EXPORT_FIELDS = ['id', 'movie', 'movie_title', 'theater', 'theater_name',
+                 'start_time', 'end_time', 'price', 'seats_sold', 'seats_remaining']
+
+
+class ScheduleRowError(ValueError):
+    pass
+
+
+def guess_format(name='', content_type=''):
+    """'csv' or 'jsonl' from a file name or content type, csv by default"""
+    if name.endswith(('.jsonl', '.ndjson', '.json')) or 'json' in content_type:
+        return 'jsonl'
+    return 'csv'
+
+
+def parse_rows(lines, fmt):
+    """
+    Yield (line_number, row dict) from an iterable of text lines.
+    Malformed JSON lines are yielded as (line_number, ScheduleRowError).
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, ScheduleRowError(f'Invalid JSON: {e}')
+            continue
+        if not isinstance(row, dict):
+            yield number, ScheduleRowError('Each line must be a JSON object')
+            continue
+        yield number, row
+
+
+class ScheduleImporter:
+    """
+    Turns parsed rows into Showings. Movies and theaters are loaded once
+    up front (both tables are small) and looked up by id or by name.
+
+    Rows overlapping an existing showing, or an earlier row of the same
+    import, are rejected. Each theater gets an interval tree that is fed
+    the existing showings around every chunk (one query per chunk) and
+    every accepted row, so each check is O(log n) instead of a query.
+    """
+
+    def __init__(self, chunk_size=1000, dry_run=False):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.trees = {}
+        self.loaded = set()
+        self.longest = longest_showing()
+        self.movies = {}
+        self.theaters = {}
+        for movie in Movie.objects.only('id', 'title', 'duration'):
+            self.movies[str(movie.id)] = movie
+            self.movies.setdefault(movie.title.casefold(), movie)
+        for theater in Theater.objects.only('id', 'name', 'capacity'):
+            self.theaters[str(theater.id)] = theater
+            self.theaters.setdefault(theater.name.casefold(), theater)
+
+    def lookup(self, table, row, id_key, name_key, label):
+        key = row.get(id_key) or row.get(name_key)
+        if key in (None, ''):
+            raise ScheduleRowError(f'{id_key} or {name_key} is required')
+        found = table.get(str(key)) or table.get(str(key).casefold())
+        if found is None:
+            raise ScheduleRowError(f'Unknown {label}: {key}')
+        return found
+
+    def build(self, row):
+        movie = self.lookup(self.movies, row, 'movie', 'movie_title', 'movie')
+        theater = self.lookup(self.theaters, row, 'theater', 'theater_name', 'theater')
+
+        start_time = parse_datetime(str(row.get('start_time') or ''))
+        if start_time is None:
+            raise ScheduleRowError(f'Invalid start_time: {row.get("start_time")!r}')
+        if timezone.is_naive(start_time):
+            start_time = timezone.make_aware(start_time)
+
+        try:
+            price = Decimal(str(row.get('price'))).quantize(Decimal('0.01'))
+        except (InvalidOperation, TypeError):
+            raise ScheduleRowError(f'Invalid price: {row.get("price")!r}')
+        if price < 0 or price >= 10000:
+            raise ScheduleRowError(f'Price out of range: {price}')
+
+        return Showing(
+            movie=movie,
+            theater=theater,
+            start_time=start_time,
+            end_time=start_time + timedelta(minutes=movie.duration),
+            price=price,
+            seats_sold=0,
+            seats_remaining=theater.capacity,
+        )
+
+    def load_existing(self, showings):
+        """Add the stored showings that could overlap this chunk to the trees"""
+        start = min(showing.start_time for showing in showings)
+        end = max(showing.end_time for showing in showings)
+        existing = Showing.objects.filter(
+            theater_id__in={showing.theater_id for showing in showings},
+            start_time__lt=end,
+            start_time__gt=start - self.longest - timedelta(minutes=1),
+            end_time__gt=start,
+        ).values_list('id', 'theater_id', 'start_time', 'end_time')
+        for pk, theater_id, start_time, end_time in existing:
+            # Skipped here rather than with pk__in, which would outgrow the
+            # database's limit on query parameters in a big import
+            if pk in self.loaded:
+                continue
+            self.loaded.add(pk)
+            self.tree(theater_id).add(start_time, end_time, f'showing {pk}')
+
+    def tree(self, theater_id):
+        tree = self.trees.get(theater_id)
+        if tree is None:
+            tree = self.trees[theater_id] = IntervalTree()
+        return tree
+
+    def accept(self, chunk):
+        """Yield (line, showing, clash) for each row, clash being None if it fits"""
+        self.load_existing([showing for _, showing in chunk])
+        for line, showing in chunk:
+            tree = self.tree(showing.theater_id)
+            clash = tree.overlapping(showing.start_time, showing.end_time)
+            if not clash:
+                tree.add(showing.start_time, showing.end_time, f'line {line}')
+            yield line, showing, min(clash, default=None)
+
+    def run(self, rows):
+        """
+        Import parsed rows, skipping invalid ones. Returns a report with
+        the number of showings created and rejected, and the line number
+        and reason for (up to MAX_REPORTED_ERRORS) rejected rows.
+        """
+        created, rejected, errors, chunk = 0, 0, [], []
+
+        def reject(line, error):
+            nonlocal rejected
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'line': line, 'error': str(error)})
+
+        def flush():
+            nonlocal created
+            if not chunk:
+                return
+            accepted = []
+            for line, showing, clash in self.accept(chunk):
+                if clash is None:
+                    accepted.append(showing)
+                else:
+                    reject(line, f'Overlaps {clash} in {showing.theater.name}')
+            if accepted and not self.dry_run:
+                Showing.objects.bulk_create(accepted)
+                # bulk_create sends no post_save for record_new_showing
+                rollups.record_showings(accepted)
+                # Already in the trees under their line numbers
+                self.loaded.update(showing.pk for showing in accepted if showing.pk)
+            created += len(accepted)
+            chunk.clear()
+
+        with transaction.atomic():
+            for line, row in rows:
+                if isinstance(row, Exception):
+                    reject(line, row)
+                    continue
+                try:
+                    chunk.append((line, self.build(row)))
+                except ScheduleRowError as e:
+                    reject(line, e)
+                    continue
+                if len(chunk) >= self.chunk_size:
+                    flush()
+            flush()
+
+        if created and not self.dry_run:
+            invalidate_schedule()
+        return {'created': created, 'rejected': rejected, 'errors': errors, 'dry_run': self.dry_run}
+
+
+def export_rows(queryset, fmt, flush_at=65536):
+    """
+    Yield the showings in `queryset` as CSV (header first) or JSON lines,
+    in chunks of roughly `flush_at` characters.
+    """
+    rows = showing_values(queryset).iterator(chunk_size=2000)
+    buffer = io.StringIO()
+
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(row):
+            buffer.write(json.dumps(row))
+            buffer.write('\n')
+
+    for row in rows:
+        write(serialize_showings([row], EXPORT_FIELDS)[0])
+        if buffer.tell() >= flush_at:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,176 @@
+"""
+Theater scheduling conflicts: two showings overlap when they share a
+theater and their [start_time, end_time) ranges intersect.
+"""
+import random
+from datetime import timedelta
+
+from django.db.models import Max
+
+from .models import Movie, Showing
+
+
+def longest_showing():
+    """Upper bound on any showing's length, used to bound range scans"""
+    minutes = Movie.objects.aggregate(longest=Max('duration'))['longest'] or 0
+    return timedelta(minutes=minutes)
+
+
+def find_overlaps(theater_id, start, end, exclude_pk=None, longest=None):
+    """
+    Showings in a theater overlapping [start, end). The extra lower bound
+    on start_time keeps this a short scan of the (theater, start_time,
+    end_time) index instead of everything that started earlier.
+    """
+    longest = longest if longest is not None else longest_showing()
+    overlaps = Showing.objects.filter(
+        theater_id=theater_id,
+        start_time__lt=end,
+        start_time__gt=start - longest - timedelta(minutes=1),
+        end_time__gt=start,
+    )
+    if exclude_pk is not None:
+        overlaps = overlaps.exclude(pk=exclude_pk)
+    return overlaps
+
+
+class _Node:
+    __slots__ = ('start', 'end', 'label', 'max_end', 'priority', 'left', 'right')
+
+    def __init__(self, start, end, label):
+        self.start = start
+        self.end = end
+        self.label = label
+        self.max_end = end
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+
+
+class IntervalTree:
+    """
+    An interval tree for half-open [start, end) ranges: a treap ordered by
+    start where every node knows the largest end below it. Inserts and
+    overlap checks are O(log n) expected.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @staticmethod
+    def _update(node):
+        node.max_end = node.end
+        for child in (node.left, node.right):
+            if child is not None and child.max_end > node.max_end:
+                node.max_end = child.max_end
+
+    def _rotate_right(self, node):
+        pivot = node.left
+        node.left, pivot.right = pivot.right, node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def _rotate_left(self, node):
+        pivot = node.right
+        node.right, pivot.left = pivot.left, node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def add(self, start, end, label=None):
+        # Iterative descent, then rotate back up along the recorded path
+        new = _Node(start, end, label)
+        self.size += 1
+        if self.root is None:
+            self.root = new
+            return
+        path = []
+        node = self.root
+        while node is not None:
+            path.append(node)
+            node = node.left if start < node.start else node.right
+        parent = path[-1]
+        if start < parent.start:
+            parent.left = new
+        else:
+            parent.right = new
+        child = new
+        for index in range(len(path) - 1, -1, -1):
+            node = path[index]
+            if node.left is child and child.priority > node.priority:
+                child = self._rotate_right(node)
+            elif node.right is child and child.priority > node.priority:
+                child = self._rotate_left(node)
+            else:
+                self._update(node)
+                child = node
+            if index:
+                grandparent = path[index - 1]
+                if grandparent.left is node:
+                    grandparent.left = child
+                else:
+                    grandparent.right = child
+            else:
+                self.root = child
+
+    def overlapping(self, start, end):
+        """Labels of stored ranges intersecting [start, end)"""
+        found, stack = [], [self.root]
+        while stack:
+            node = stack.pop()
+            # Nothing below here ends after our start
+            if node is None or node.max_end <= start:
+                continue
+            stack.append(node.left)
+            if node.start < end:
+                if node.end > start:
+                    found.append(node.label)
+                stack.append(node.right)
+        return found
+
+
+def scan_schedule(showings):
+    """
+    One pass over showing rows sorted by (theater, start_time), returning
+    the overlapping pairs and the idle gaps between showings per theater.
+    Rows are dicts with id, theater, theater_name, start_time, end_time.
+    """
+    conflicts, gaps = [], []
+    theater = None
+    active = []  # earlier showings in this theater still running
+
+    for row in showings:
+        if row['theater'] != theater:
+            theater, active = row['theater'], []
+        start, end = row['start_time'], row['end_time'] or row['start_time']
+
+        running = [other for other in active if other['end'] > start]
+        for other in running:
+            conflicts.append({
+                'theater': theater,
+                'theater_name': row['theater_name'],
+                'showings': [other['id'], row['id']],
+                'overlap_start': start,
+                'overlap_end': min(other['end'], end),
+            })
+        if not running and active:
+            last_end = max(other['end'] for other in active)
+            if start > last_end:
+                gaps.append({
+                    'theater': theater,
+                    'theater_name': row['theater_name'],
+                    'after': max(active, key=lambda other: other['end'])['id'],
+                    'before': row['id'],
+                    'start': last_end,
+                    'end': start,
+                    'minutes': int((start - last_end).total_seconds() // 60),
+                })
+        running.append({'id': row['id'], 'end': end})
+        active = running
+
+    return conflicts, gaps
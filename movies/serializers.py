@@ -1,24 +1,31 @@
+import logging
 from rest_framework import serializers
-from .models import Movie, Theater, Showing, Booking
+from cinema_backend.pagination import FieldProjectionMixin
+from .models import Movie, Theater, Showing, Booking, SeatHold, PurgeJob
+from .scheduling import find_overlaps
 from datetime import timedelta
 
-class MovieSerializer(serializers.ModelSerializer):
+logger = logging.getLogger(__name__)
+
+class MovieSerializer(FieldProjectionMixin, serializers.ModelSerializer):
     class Meta:
         model = Movie
         fields = '__all__'
 
-class TheaterSerializer(serializers.ModelSerializer):
+class TheaterSerializer(FieldProjectionMixin, serializers.ModelSerializer):
     class Meta:
         model = Theater
         fields = '__all__'
 
-class ShowingSerializer(serializers.ModelSerializer):
+class ShowingSerializer(FieldProjectionMixin, serializers.ModelSerializer):
     movie_title = serializers.SerializerMethodField()
     theater_name = serializers.SerializerMethodField()
     
     class Meta:
         model = Showing
-        fields = ['id', 'movie', 'theater', 'start_time', 'end_time', 'price', 'movie_title', 'theater_name']
+        fields = ['id', 'movie', 'theater', 'start_time', 'end_time', 'price', 'movie_title', 'theater_name',
+                  'seats_sold', 'seats_remaining']
+        read_only_fields = ['seats_sold', 'seats_remaining']
     
     def get_movie_title(self, obj):
         return obj.movie.title if obj.movie else None
@@ -30,16 +37,39 @@ class ShowingSerializer(serializers.ModelSerializer):
         """
         Calculate end_time based on movie duration
         """
-        if 'movie' in data and 'start_time' in data:
-            movie = data['movie']
-            start_time = data['start_time']
-            
-            # Calculate end time based on movie duration
-            duration_minutes = movie.duration
-            end_time = start_time + timedelta(minutes=duration_minutes)
-            data['end_time'] = end_time
-        
+        # A partial update may change either one; fill the other in from
+        # the stored showing
+        instance = self.instance
+        if 'movie' in data or 'start_time' in data:
+            movie = data.get('movie', instance.movie if instance else None)
+            start_time = data.get('start_time', instance.start_time if instance else None)
+            if movie is not None and start_time is not None:
+                # Calculate end time based on movie duration
+                data['end_time'] = start_time + timedelta(minutes=movie.duration)
+
+        # A hand-set price is what dynamic pricing scales from then on
+        if instance is not None and 'price' in data and data['price'] != instance.price:
+            data['base_price'] = data['price']
+
+        self.check_overlap(data)
         return data
+
+    def check_overlap(self, data):
+        """Reject a showing that overlaps another in the same theater"""
+        instance = self.instance
+        theater = data.get('theater', instance.theater if instance else None)
+        start_time = data.get('start_time', instance.start_time if instance else None)
+        end_time = data.get('end_time', instance.end_time if instance else None)
+        if theater is None or start_time is None or end_time is None:
+            return
+
+        clash = find_overlaps(theater.pk, start_time, end_time,
+                              exclude_pk=instance.pk if instance else None).first()
+        if clash is not None:
+            raise serializers.ValidationError(
+                f'Overlaps showing {clash.pk} in {theater.name} '
+                f'({clash.start_time:%Y-%m-%d %H:%M} - {clash.end_time:%H:%M})'
+            )
     
     def to_representation(self, instance):
         """
@@ -47,11 +77,11 @@ class ShowingSerializer(serializers.ModelSerializer):
         """
         data = super().to_representation(instance)
         
-        # Ensure these fields are always present
-        if 'movie_title' not in data or data['movie_title'] is None:
+        # Ensure these fields are always present (unless projected away)
+        if 'movie_title' in self.fields and data.get('movie_title') is None:
             data['movie_title'] = instance.movie.title if instance.movie else 'Unknown Movie'
             
-        if 'theater_name' not in data or data['theater_name'] is None:
+        if 'theater_name' in self.fields and data.get('theater_name') is None:
             data['theater_name'] = instance.theater.name if instance.theater else 'Unknown Theater'
             
         return data
@@ -70,14 +100,25 @@ class BookingSerializer(serializers.ModelSerializer):
                 'theater_name': obj.showing.theater.name,
                 'start_time': obj.showing.start_time.strftime('%Y-%m-%d %H:%M'),
                 'end_time': obj.showing.end_time.strftime('%Y-%m-%d %H:%M') if obj.showing.end_time else None,
-                'price': float(obj.showing.price)
+                'price': float(obj.unit_price)
             }
         except Exception as e:
-            print(f"Error getting showing details: {str(e)}")
+            logger.warning("Error getting showing details for booking %s: %s", obj.pk, e)
             return {
                 'movie_title': 'Unknown',
                 'theater_name': 'Unknown',
                 'start_time': 'Unknown',
                 'end_time': 'Unknown',
                 'price': 0.0
-            }
\ No newline at end of file
+            }
+
+class SeatHoldSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SeatHold
+        fields = ['id', 'showing', 'seats', 'created_at', 'expires_at']
+
+class PurgeJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PurgeJob
+        fields = ['id', 'status', 'filters', 'showings_total', 'showings_deleted', 'rows_deleted',
+                  'error', 'requested_by', 'created_at', 'started_at', 'finished_at']
@@ -0,0 +1,113 @@
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import reservations, rollups
+from .models import Booking, Movie, SeatHold, Showing, Theater
+from .schedule_cache import invalidate_schedule
+
+
+@receiver(post_delete, sender=SeatHold)
+@receiver(post_delete, sender=Booking)
+def release_booking_seats(sender, instance, **kwargs):
+    """Hand a deleted booking's (or hold's) seats back to its showing"""
+    if reservations.counters_suspended():
+        return
+    reservations.release_seats(instance.showing_id, instance.seats)
+
+
+@receiver(post_save, sender=Booking)
+def record_booking_sale(sender, instance, created, **kwargs):
+    if created:
+        rollups.record_sale(instance.showing, instance.seats, rollups.booking_revenue(instance))
+
+
+@receiver(post_delete, sender=Booking)
+def record_booking_cancellation(sender, instance, **kwargs):
+    if reservations.counters_suspended():
+        return
+    try:
+        showing = instance.showing
+    except Showing.DoesNotExist:
+        return
+    rollups.record_sale(showing, -instance.seats, -rollups.booking_revenue(instance))
+
+
+@receiver(post_save, sender=Showing)
+def record_new_showing(sender, instance, created, **kwargs):
+    if created:
+        rollups.record_showing(instance)
+
+
+@receiver(post_delete, sender=Showing)
+def record_removed_showing(sender, instance, **kwargs):
+    try:
+        rollups.record_showing(instance, sign=-1)
+    except Theater.DoesNotExist:
+        pass
+
+
+@receiver(pre_save, sender=Showing)
+def remember_showing_bucket(sender, instance, update_fields=None, **kwargs):
+    """Note the rollup bucket a showing was counted in, for move_showing_rollup"""
+    instance._rollup_was = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and not {'start_time', 'movie', 'theater'} & set(update_fields):
+        return
+    instance._rollup_was = Showing.objects.filter(pk=instance.pk).values_list(
+        'start_time', 'movie_id', 'theater_id', 'theater__capacity'
+    ).first()
+
+
+@receiver(post_save, sender=Showing)
+def move_showing_rollup(sender, instance, created, **kwargs):
+    was, instance._rollup_was = getattr(instance, '_rollup_was', None), None
+    if created or was is None:
+        return
+    start_time, movie_id, theater_id, capacity = was
+    if (rollups.bucket(start_time), movie_id, theater_id) != (
+        rollups.bucket(instance.start_time), instance.movie_id, instance.theater_id
+    ):
+        rollups.move_showing(instance, start_time, movie_id, theater_id, capacity)
+
+
+@receiver(pre_save, sender=Theater)
+def remember_theater_capacity(sender, instance, **kwargs):
+    instance._capacity_was = None if instance._state.adding else (
+        Theater.objects.filter(pk=instance.pk).values_list('capacity', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Theater)
+def resize_theater_showings(sender, instance, created, **kwargs):
+    """Keep seats_remaining and the rollups in step with a changed theater capacity"""
+    if created:
+        return
+    Showing.objects.filter(theater=instance).update(
+        seats_remaining=Greatest(Value(instance.capacity) - F('seats_sold'), 0)
+    )
+    was = getattr(instance, '_capacity_was', None)
+    if was is not None and was != int(instance.capacity):
+        rollups.resize_theater(instance.pk, int(instance.capacity) - was)
+
+
+@receiver(post_save, sender=Showing)
+def move_booking_starts(sender, instance, created, **kwargs):
+    """Keep Booking.showing_start in step with a rescheduled showing"""
+    if created:
+        return
+    Booking.objects.filter(showing=instance).exclude(showing_start=instance.start_time).update(
+        showing_start=instance.start_time
+    )
+
+
+@receiver(post_save, sender=Showing)
+@receiver(post_delete, sender=Showing)
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+@receiver(post_save, sender=Theater)
+@receiver(post_delete, sender=Theater)
+def schedule_changed(sender, **kwargs):
+    invalidate_schedule()
@@ -1,3 +1,1326 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipIf
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cinema_backend import idempotency
+from inventory.models import SnackItem
+from users.models import IdempotencyKey, User
+from . import archive, holds, pricing, purge, reservations, rollups
+from .models import Movie, Theater, Showing, Booking, SeatHold, PurgeJob, ArchivedShowing, ArchivedBooking, SalesRollup
+from .serializers import BookingSerializer
+
+
+class CinemaTestCase(TestCase):
+    """Shared fixtures: one movie in one small theater"""
+
+    def setUp(self):
+        cache.clear()
+        reservations._sold_out_until.clear()
+        self.user = User.objects.create_user(username='customer', password='password123')
+        self.movie = Movie.objects.create(title='The Space Odyssey', description='Space.', duration=120)
+        self.theater = Theater.objects.create(name='VIP Screening Room', capacity=10)
+        self.showing = self.make_showing()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_showing(self, start_time=None, theater=None):
+        start_time = start_time or timezone.now() + timedelta(hours=2)
+        return Showing.objects.create(
+            movie=self.movie,
+            theater=theater or self.theater,
+            start_time=start_time,
+            end_time=start_time + timedelta(minutes=self.movie.duration),
+            price='12.50',
+        )
+
+
+class ReservationEngineTests(CinemaTestCase):
+    def test_new_showing_starts_at_theater_capacity(self):
+        self.assertEqual(self.showing.seats_remaining, 10)
+
+    def test_reserve_decrements_counter(self):
+        self.assertEqual(reservations.reserve_seats(self.showing.id, 4), 6)
+        self.showing.refresh_from_db()
+        self.assertEqual(self.showing.seats_remaining, 6)
+
+    def test_cannot_oversell(self):
+        reservations.reserve_seats(self.showing.id, 8)
+        with self.assertRaises(reservations.NotEnoughSeats) as ctx:
+            reservations.reserve_seats(self.showing.id, 3)
+        self.assertEqual(ctx.exception.remaining, 2)
+        reservations.reserve_seats(self.showing.id, 2)
+        with self.assertRaises(reservations.SoldOut):
+            reservations.reserve_seats(self.showing.id, 1)
+
+    def test_sold_out_showing_rejected_without_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            reservations.reserve_seats(self.showing.id, 10)
+        with self.assertNumQueries(0):
+            with self.assertRaises(reservations.SoldOut):
+                reservations.reserve_seats(self.showing.id, 1)
+
+    def test_rolled_back_sell_out_is_not_remembered(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                reservations.reserve_seats(self.showing.id, 10)
+                raise RuntimeError('Booking insert failed')
+        self.assertFalse(reservations.is_known_sold_out(self.showing.id))
+        self.assertEqual(reservations.reserve_seats(self.showing.id, 10), 0)
+
+    def test_release_reopens_showing(self):
+        reservations.reserve_seats(self.showing.id, 10)
+        reservations.release_seats(self.showing.id, 3)
+        self.assertEqual(reservations.reserve_seats(self.showing.id, 3), 0)
+
+    def test_release_after_theater_shrinks(self):
+        reservations.reserve_seats(self.showing.id, 6)
+        self.theater.capacity = 4
+        self.theater.save()
+        reservations.release_seats(self.showing.id, 4)
+        self.showing.refresh_from_db()
+        self.assertEqual((self.showing.seats_sold, self.showing.seats_remaining), (2, 2))
+
+    def test_admin_save_keeps_counter(self):
+        stale = Showing.objects.get(pk=self.showing.pk)
+        reservations.reserve_seats(self.showing.id, 4)
+        stale.price = '9.99'
+        stale.save()
+        stale.refresh_from_db()
+        self.assertEqual(stale.seats_remaining, 6)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class BookShowingViewTests(CinemaTestCase):
+    def test_booking_takes_seats(self):
+        response = self.client.post('/api/movies/book/', {'showing_id': self.showing.id, 'seats': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['seats_remaining'], 7)
+        self.assertEqual(Booking.objects.get().seats, 3)
+
+    def test_oversell_is_rejected(self):
+        response = self.client.post('/api/movies/book/', {'showing_id': self.showing.id, 'seats': 11}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Booking.objects.exists())
+        self.showing.refresh_from_db()
+        self.assertEqual(self.showing.seats_remaining, 10)
+
+    def test_invalid_seat_count(self):
+        for seats in (0, -2, 'two', None):
+            response = self.client.post('/api/movies/book/', {'showing_id': self.showing.id, 'seats': seats}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_unknown_showing(self):
+        response = self.client.post('/api/movies/book/', {'showing_id': 9999, 'seats': 1}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CheckoutTests(CinemaTestCase):
+    url = '/api/movies/checkout/'
+
+    def setUp(self):
+        super().setUp()
+        self.popcorn = SnackItem.objects.create(name='Popcorn', description='', price='5.50', quantity_available=5)
+        self.soda = SnackItem.objects.create(name='Soda', description='', price='3.00', quantity_available=1)
+
+    def checkout(self, seats, *snacks):
+        return self.client.post(self.url, {
+            'showing_id': self.showing.id,
+            'seats': seats,
+            'snacks': [{'item': item, 'quantity': quantity} for item, quantity in snacks],
+        }, format='json')
+
+    def assertUntouched(self):
+        self.showing.refresh_from_db()
+        self.assertEqual(self.showing.seats_remaining, 10)
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(dict(SnackItem.objects.values_list('name', 'quantity_available')), {'Popcorn': 5, 'Soda': 1})
+
+    def test_itemized_checkout(self):
+        response = self.checkout(2, (self.soda.id, 1), (self.popcorn.id, 2))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['seats_remaining'], 8)
+        self.assertEqual(
+            [(line['type'], line['description'], line['quantity'], line['unit_price'], line['amount'])
+             for line in response.data['lines']],
+            [('ticket', 'The Space Odyssey', 2, '12.50', '25.00'),
+             ('snack', 'Popcorn', 2, '5.50', '11.00'),
+             ('snack', 'Soda', 1, '3.00', '3.00')],
+        )
+        self.assertEqual(response.data['total'], '39.00')
+        self.assertEqual(Booking.objects.get().seats, 2)
+        self.assertEqual(SnackItem.objects.get(pk=self.popcorn.id).quantity_available, 3)
+
+    def test_tickets_only(self):
+        response = self.client.post(self.url, {'showing_id': self.showing.id, 'seats': 1}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], '12.50')
+
+    def test_failures_roll_everything_back(self):
+        response = self.checkout(2, (self.popcorn.id, 1), (self.soda.id, 2))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['item'], self.soda.id)
+        self.assertUntouched()
+
+        self.assertEqual(self.checkout(11, (self.popcorn.id, 1)).status_code, 409)
+        self.assertEqual(self.checkout(1, (999, 1)).status_code, 404)
+        self.assertEqual(self.checkout(0, (self.popcorn.id, 1)).status_code, 400)
+        self.assertEqual(self.checkout(1, (self.popcorn.id, 0)).status_code, 400)
+        self.assertUntouched()
+
+    def test_rolled_back_sell_out_does_not_stick(self):
+        # The last seats are taken, then the snacks fail; the showing must
+        # not be left marked sold out
+        self.assertEqual(self.checkout(10, (self.soda.id, 2)).status_code, 409)
+        self.assertEqual(self.checkout(10).status_code, 200)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class IdempotencyKeyTests(CinemaTestCase):
+    def book(self, key, seats=2, client=None):
+        return (client or self.client).post('/api/movies/book/', {'showing_id': self.showing.id, 'seats': seats},
+                                            format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.book('retry-1')
+        with self.assertNumQueries(1):
+            retry = self.book('retry-1')
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Booking.objects.count(), 1)
+        self.showing.refresh_from_db()
+        self.assertEqual(self.showing.seats_remaining, 8)
+
+        # A new key is a new booking
+        self.assertEqual(self.book('retry-2').data['seats_remaining'], 6)
+
+    def test_key_reused_for_another_request(self):
+        self.book('reused')
+        self.assertEqual(self.book('reused', seats=3).status_code, 422)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_keys_are_per_user(self):
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', password='password123'))
+        self.book('same-key')
+        self.assertNotIn('Idempotent-Replayed', self.book('same-key', client=other))
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_in_flight_key_is_rejected(self):
+        IdempotencyKey.objects.create(user=self.user, path='/api/movies/book/', key='in-flight', fingerprint='x',
+                                      expires_at=timezone.now() + timedelta(seconds=60))
+        self.assertEqual(self.book('in-flight').status_code, 409)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_keys_outlive_the_cache(self):
+        # Another worker's cache, or this one after evictions
+        self.book('durable')
+        cache.clear()
+        self.assertEqual(self.book('durable')['Idempotent-Replayed'], 'true')
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_expired_keys_are_reused_and_purged(self):
+        self.book('old')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertNotIn('Idempotent-Replayed', self.book('old'))
+        self.assertEqual(Booking.objects.count(), 2)
+
+        self.book('older')
+        IdempotencyKey.objects.filter(key='older').update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(idempotency.purge_expired(), 1)
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['old'])
+
+    def test_checkout_retry_takes_snacks_once(self):
+        popcorn = SnackItem.objects.create(name='Popcorn', description='', price='5.50', quantity_available=5)
+        body = {'showing_id': self.showing.id, 'seats': 1, 'snacks': [{'item': popcorn.id, 'quantity': 2}]}
+        for _ in range(2):
+            response = self.client.post('/api/movies/checkout/', body, format='json', HTTP_IDEMPOTENCY_KEY='cart-1')
+            self.assertEqual(response.data['total'], '23.50')
+        popcorn.refresh_from_db()
+        self.assertEqual(popcorn.quantity_available, 3)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, SEAT_HOLD_SECONDS=60)
+class SeatHoldTests(CinemaTestCase):
+    def hold(self, seats):
+        return self.client.post('/api/movies/holds/', {'showing_id': self.showing.id, 'seats': seats}, format='json')
+
+    def remaining(self):
+        self.showing.refresh_from_db()
+        return self.showing.seats_remaining
+
+    def expire(self, *hold_ids):
+        SeatHold.objects.filter(pk__in=hold_ids).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_hold_then_confirm(self):
+        response = self.hold(3)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['seats_remaining'], 7)
+        hold_id = response.data['hold_id']
+
+        response = self.client.post(f'/api/movies/holds/{hold_id}/confirm/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Booking.objects.get().seats, 3)
+        self.assertFalse(SeatHold.objects.exists())
+        self.assertEqual(self.remaining(), 7)
+        self.assertEqual(self.client.post(f'/api/movies/holds/{hold_id}/confirm/').status_code, 404)
+
+    def test_release(self):
+        hold_id = self.hold(4).data['hold_id']
+        self.assertEqual(self.client.delete(f'/api/movies/holds/{hold_id}/').status_code, 204)
+        self.assertEqual(self.remaining(), 10)
+        self.assertEqual(self.client.delete(f'/api/movies/holds/{hold_id}/').status_code, 404)
+
+    def test_other_users_holds_are_invisible(self):
+        hold_id = self.hold(2).data['hold_id']
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', password='password123'))
+        self.assertEqual(other.post(f'/api/movies/holds/{hold_id}/confirm/').status_code, 404)
+        self.assertEqual(other.delete(f'/api/movies/holds/{hold_id}/').status_code, 404)
+
+    def test_expired_hold_cannot_be_confirmed(self):
+        hold_id = self.hold(2).data['hold_id']
+        self.expire(hold_id)
+        self.assertEqual(self.client.post(f'/api/movies/holds/{hold_id}/confirm/').status_code, 410)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_sweep_releases_expired_holds_in_batches(self):
+        ids = [self.hold(2).data['hold_id'] for _ in range(4)]
+        self.expire(*ids[:3])
+        self.assertEqual(self.remaining(), 2)
+
+        self.assertEqual(holds.sweep_expired_holds(batch_size=2), 3)
+        self.assertEqual(list(SeatHold.objects.values_list('pk', flat=True)), ids[3:])
+        self.assertEqual(self.remaining(), 8)
+        self.assertEqual(holds.sweep_expired_holds(), 0)
+
+    def test_lapsed_holds_are_swept_when_they_block_a_new_hold(self):
+        self.expire(self.hold(10).data['hold_id'])
+        self.assertEqual(self.hold(4).status_code, 201)
+        self.assertEqual(self.remaining(), 6)
+
+    def test_sold_out_hold_only_reads(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            reservations.reserve_seats(self.showing.id, 10)
+        # The sold-out mark skips the counter; one EXISTS finds nothing to sweep
+        with self.assertNumQueries(1):
+            with self.assertRaises(reservations.SoldOut):
+                holds.hold_seats(self.user, self.showing.id, 1)
+
+    def test_counters_count_open_holds(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        self.hold(3)
+        self.client.post('/api/movies/book/', {'showing_id': self.showing.id, 'seats': 2}, format='json')
+        Showing.objects.filter(pk=self.showing.pk).update(seats_sold=0, seats_remaining=10)
+        call_command('rebuild_seat_counters', stdout=StringIO())
+        self.assertEqual(self.remaining(), 5)
+
+    def test_deleting_a_user_releases_their_holds(self):
+        other = User.objects.create_user(username='other', password='password123')
+        holds.hold_seats(other, self.showing.id, 4)
+        other.delete()
+        self.assertEqual(self.remaining(), 10)
+
+    def test_next_expiry(self):
+        self.assertIsNone(holds.seconds_until_next_expiry())
+        self.hold(1)
+        self.assertEqual(holds.seconds_until_next_expiry(granularity=5), 60)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class BookingHistoryTests(CinemaTestCase):
+    url = '/api/movies/user-bookings/'
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.past = [self.make_showing(now - timedelta(days=days)) for days in (3, 2, 1)]
+        self.upcoming = [self.showing, self.make_showing(now + timedelta(days=1))]
+        # Booked in an order unrelated to the showing times
+        self.bookings = [
+            Booking.objects.create(user=self.user, showing=showing, seats=1)
+            for showing in (self.upcoming[1], self.past[0], self.showing, self.past[2], self.past[1])
+        ]
+        Booking.objects.create(user=User.objects.create_user(username='other', password='x'),
+                               showing=self.showing, seats=1)
+
+    def walk(self, **params):
+        """Every page's showing ids, following the next links"""
+        pages = []
+        response = self.client.get(self.url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([booking['showing'] for booking in response.data['results']])
+            if not response.data['next']:
+                return pages
+            response = self.client.get(response.data['next'])
+
+    def test_newest_bookings_first(self):
+        ids = [booking.showing_id for booking in reversed(self.bookings)]
+        self.assertEqual(self.walk(page_size=2), [ids[:2], ids[2:4], ids[4:]])
+
+    def test_upcoming_and_past(self):
+        self.assertEqual(self.walk(when='upcoming', page_size=1), [[showing.id] for showing in self.upcoming])
+        past = [showing.id for showing in reversed(self.past)]
+        self.assertEqual(self.walk(when='past', page_size=2), [past[:2], past[2:]])
+
+    def test_rescheduled_showing_moves_its_bookings(self):
+        self.showing.start_time = timezone.now() - timedelta(hours=1)
+        self.showing.save()
+        self.assertEqual(self.walk(when='upcoming'), [[self.upcoming[1].id]])
+        self.assertIn(self.showing.id, self.walk(when='past')[0])
+
+    def test_one_query_per_page(self):
+        first = self.client.get(self.url, {'page_size': 2})
+        with self.assertNumQueries(1):
+            self.client.get(first.data['next'])
+
+    def test_bad_parameters(self):
+        for params in ({'when': 'someday'}, {'cursor': 'garbage'}, {'page_size': 'lots'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, PURGE_IN_BACKGROUND=False, PURGE_CHUNK_SIZE=2, PURGE_CHUNK_PAUSE=0)
+class PurgeTests(CinemaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        self.client.force_authenticate(self.admin)
+        self.other_theater = Theater.objects.create(name='Screen 2', capacity=10)
+        now = timezone.now()
+        self.old = [self.make_showing(now - timedelta(days=days)) for days in (30, 20, 10)]
+        self.elsewhere = self.make_showing(now - timedelta(days=30), theater=self.other_theater)
+        for showing in (*self.old, self.showing):
+            Booking.objects.create(user=self.user, showing=showing, seats=2)
+        holds.hold_seats(self.user, self.old[0].id, 1)
+
+    def purge(self, **filters):
+        response = self.client.post('/api/movies/purge/', filters, format='json')
+        self.assertEqual(response.status_code, 202)
+        return PurgeJob.objects.get(pk=response.data['id'])
+
+    def test_purge_by_date_and_theater(self):
+        job = self.purge(starts_before=timezone.localdate().isoformat(), theaters=[self.theater.id])
+        self.assertEqual((job.status, job.showings_total, job.showings_deleted), (PurgeJob.DONE, 3, 3))
+        self.assertEqual(job.rows_deleted, {'movies.Showing': 3, 'movies.Booking': 3, 'movies.SeatHold': 1})
+        self.assertEqual(set(Showing.objects.values_list('pk', flat=True)), {self.showing.id, self.elsewhere.id})
+        self.assertEqual(Booking.objects.get().showing_id, self.showing.id)
+
+        status = self.client.get(f'/api/movies/purge/{job.id}/')
+        self.assertEqual(status.data['showings_deleted'], 3)
+
+    def test_chunks_are_raw_deletes(self):
+        purge.check_raw_delete(Showing)
+        ids = [showing.id for showing in self.old]
+        # savepoint, two rollup aggregates and one UPDATE per bucket, one
+        # DELETE per table, release; no rows loaded
+        with self.assertNumQueries(10):
+            purge.delete_showings(ids)
+        self.assertFalse(Booking.objects.filter(showing_id__in=ids).exists())
+
+    def test_rollups_lose_the_purged_rows(self):
+        Booking.objects.filter(showing=self.old[1]).update(unit_price='20.00')
+        rollups.refresh()
+        purge.run_purge(PurgeJob.objects.create(filters={'theaters': [self.theater.id]}), chunk_size=2)
+        fields = ('day', 'hour', 'movie', 'theater', 'showings', 'capacity', 'seats_sold', 'revenue')
+        purged = list(SalesRollup.objects.exclude(showings=0).order_by('day', 'theater').values(*fields))
+        self.assertFalse(SalesRollup.objects.filter(showings=0).exclude(seats_sold=0, revenue=0).exists())
+        rollups.refresh(timezone.localdate() - timedelta(days=31), timezone.localdate() + timedelta(days=1))
+        self.assertEqual(purged, list(SalesRollup.objects.order_by('day', 'theater').values(*fields)))
+        self.assertEqual([row['theater'] for row in purged], [self.other_theater.id])
+
+    def test_progress_is_saved_per_chunk(self):
+        job = PurgeJob.objects.create()
+        seen = []
+        purge.run_purge(job, progress=lambda job: seen.append(job.showings_deleted))
+        self.assertEqual(seen, [2, 4, 5])
+        self.assertEqual(PurgeJob.objects.get(pk=job.pk).showings_deleted, 5)
+
+    def test_remove_test_showings_purges_everything(self):
+        response = self.client.delete('/api/movies/remove-test-showings/')
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Showing.objects.exists())
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(PurgeJob.objects.get().status, PurgeJob.DONE)
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.delete('/api/movies/remove-test-showings/').status_code, 403)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.post('/api/movies/purge/', {'starts_before': 'soon'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/movies/purge/', {'theaters': ['x']}, format='json').status_code, 400)
+        self.assertEqual(self.client.get('/api/movies/purge/999/').status_code, 404)
+
+    def test_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('purge_showings', '--theater', str(self.other_theater.id), '--dry-run', stdout=out)
+        self.assertIn('1 showings match', out.getvalue())
+        call_command('purge_showings', '--theater', str(self.other_theater.id), stdout=out)
+        self.assertFalse(Showing.objects.filter(pk=self.elsewhere.id).exists())
+
+
+@override_settings(PURGE_IN_BACKGROUND=True, PURGE_CHUNK_PAUSE=0)
+class PurgeBackgroundTests(TransactionTestCase):
+    def test_job_runs_after_commit(self):
+        import threading
+
+        movie = Movie.objects.create(title='Old', description='', duration=60)
+        theater = Theater.objects.create(name='Screen', capacity=5)
+        Showing.objects.create(movie=movie, theater=theater, start_time=timezone.now(), price='5.00')
+        job = purge.start_purge({})
+        for thread in threading.enumerate():
+            if thread.name == f'purge-{job.pk}':
+                thread.join(10)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.showings_deleted), (PurgeJob.DONE, 1))
+        self.assertFalse(Showing.objects.exists())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, ARCHIVE_AFTER_DAYS=30, ARCHIVE_BATCH_SIZE=1)
+class ArchiveTests(CinemaTestCase):
+    url = '/api/movies/user-bookings/'
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.old = [self.make_showing(now - timedelta(days=days)) for days in (60, 45)]
+        self.recent = self.make_showing(now - timedelta(days=2))
+        self.bookings = {}
+        for showing in (self.old[1], self.showing, self.old[0], self.recent):
+            reservations.reserve_seats(showing.id, 2)
+            self.bookings[showing.id] = Booking.objects.create(user=self.user, showing=showing, seats=2)
+
+    def history(self, **params):
+        ids, response = [], self.client.get(self.url, params)
+        while True:
+            ids += [booking['id'] for booking in response.data['results']]
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_finished_showings_move_with_their_bookings(self):
+        before = self.history(page_size=10)
+        self.assertEqual(archive.archive_finished(), (2, 2))
+
+        self.assertEqual(set(Showing.objects.values_list('pk', flat=True)), {self.showing.id, self.recent.id})
+        self.assertEqual(Booking.objects.count(), 2)
+        archived = ArchivedShowing.objects.get(pk=self.old[0].id)
+        self.assertEqual((archived.movie_title, archived.theater_name, archived.seats_sold),
+                         ('The Space Odyssey', 'VIP Screening Room', 2))
+        self.assertEqual(ArchivedBooking.objects.get(showing=archived).id, self.bookings[self.old[0].id].id)
+
+        # Hot reads don't see the archive unless asked to
+        self.assertEqual(self.history(page_size=10), [b for b in before if b not in
+                                                       {self.bookings[s.id].id for s in self.old}])
+        self.assertEqual(self.history(page_size=1, include_archived=1), before)
+        past = [self.bookings[showing.id].id for showing in (self.recent, *reversed(self.old))]
+        self.assertEqual(self.history(when='past', page_size=2, include_archived=1), past)
+        self.assertEqual(self.history(when='upcoming', include_archived=1), [self.bookings[self.showing.id].id])
+
+    def test_archive_outlives_the_movie(self):
+        archive.archive_finished()
+        self.movie.delete()
+        rows = self.client.get(self.url, {'include_archived': 1}).data['results']
+        self.assertEqual([row['showing_details']['movie_title'] for row in rows], ['The Space Odyssey'] * 2)
+
+    def test_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('archive_showings', '--dry-run', stdout=out)
+        self.assertIn('2 showings ended before', out.getvalue())
+        call_command('archive_showings', '--days', '1', stdout=out)
+        self.assertIn('Archived 3 showings and 3 bookings', out.getvalue())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SalesRollupTests(CinemaTestCase):
+    url = '/api/movies/analytics/sales/'
+
+    def rollup(self):
+        return SalesRollup.objects.values('showings', 'capacity', 'seats_sold', 'revenue').get()
+
+    def book(self, seats):
+        return self.client.post('/api/movies/book/', {'showing_id': self.showing.id, 'seats': seats}, format='json')
+
+    def test_bookings_update_the_rollup(self):
+        self.assertEqual(self.rollup(), {'showings': 1, 'capacity': 10, 'seats_sold': 0, 'revenue': 0})
+        self.book(3)
+        booking_id = self.book(1).data['booking_id']
+        self.assertEqual(self.rollup(), {'showings': 1, 'capacity': 10, 'seats_sold': 4, 'revenue': Decimal('50.00')})
+
+        Booking.objects.get(pk=booking_id).delete()
+        reservations.delete_bookings(Booking.objects.all())
+        self.assertEqual(self.rollup()['seats_sold'], 0)
+
+    def test_refresh_matches_incremental_updates(self):
+        self.book(3)
+        self.make_showing(timezone.now() + timedelta(days=1))
+        incremental = list(SalesRollup.objects.order_by('day', 'hour').values('day', 'hour', 'movie', 'theater',
+                                                                             'showings', 'capacity', 'seats_sold', 'revenue'))
+        # Something the signals never saw
+        Booking.objects.bulk_create([Booking(user=self.user, showing=self.showing, seats=2, unit_price='12.50')])
+        rollups.refresh()
+        refreshed = list(SalesRollup.objects.order_by('day', 'hour').values('day', 'hour', 'movie', 'theater',
+                                                                           'showings', 'capacity', 'seats_sold', 'revenue'))
+        incremental[0 if incremental[0]['seats_sold'] else 1]['seats_sold'] += 2
+        for row in incremental:
+            row['revenue'] = row['seats_sold'] * Decimal('12.50')
+        self.assertEqual(refreshed, incremental)
+
+    def test_revenue_is_counted_at_the_price_paid(self):
+        first = self.book(2).data['booking_id']
+        Showing.objects.filter(pk=self.showing.pk).update(price='20.00')
+        self.book(1)
+        self.assertEqual(self.rollup()['revenue'], Decimal('45.00'))
+
+        # A price edit between a sale and its cancellation, then a rebuild
+        Showing.objects.filter(pk=self.showing.pk).update(price='5.00')
+        Booking.objects.get(pk=first).delete()
+        self.assertEqual(self.rollup()['revenue'], Decimal('20.00'))
+        rollups.refresh()
+        self.assertEqual(self.rollup()['revenue'], Decimal('20.00'))
+        reservations.delete_bookings(Booking.objects.all())
+        self.assertEqual(self.rollup()['revenue'], 0)
+
+    def assert_matches_refresh(self):
+        fields = ('day', 'hour', 'movie', 'theater', 'showings', 'capacity', 'seats_sold', 'revenue')
+        # Buckets a showing moved out of stay behind empty; refresh drops them
+        incremental = list(SalesRollup.objects.exclude(showings=0, seats_sold=0).order_by(*fields).values(*fields))
+        today = timezone.localdate()
+        rollups.refresh(today - timedelta(days=1), today + timedelta(days=3))
+        self.assertEqual(incremental, list(SalesRollup.objects.order_by(*fields).values(*fields)))
+
+    def test_schedule_changes_move_the_rollups(self):
+        from .schedule_io import ScheduleImporter
+
+        self.book(3)
+        self.showing.start_time += timedelta(days=1, hours=1)
+        self.showing.end_time += timedelta(days=1, hours=1)
+        self.showing.save()
+        self.assert_matches_refresh()
+
+        other = Theater.objects.create(name='Screen 2', capacity=20)
+        self.showing.theater = other
+        self.showing.save()
+        self.assert_matches_refresh()
+        self.assertEqual(self.rollup(), {'showings': 1, 'capacity': 20, 'seats_sold': 3, 'revenue': Decimal('37.50')})
+
+        other.capacity = 30
+        other.save()
+        self.assert_matches_refresh()
+
+        start = self.showing.start_time + timedelta(hours=4)
+        report = ScheduleImporter().run([
+            (line, {'movie': self.movie.id, 'theater': other.id, 'price': '9',
+                    'start_time': (start + timedelta(hours=3 * line)).isoformat()})
+            for line in (1, 2)
+        ])
+        self.assertEqual(report['created'], 2)
+        self.assert_matches_refresh()
+
+    def test_report(self):
+        self.book(3)
+        other = Movie.objects.create(title='Second', description='', duration=90)
+        Showing.objects.create(movie=other, theater=self.theater, price='8.00',
+                               start_time=self.showing.start_time + timedelta(hours=3))
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='x', is_staff=True))
+
+        day = timezone.localtime(self.showing.start_time).date().isoformat()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'start': day, 'end': day, 'group_by': 'movie'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['movie_title'], row['seats_sold'], row['revenue'], row['occupancy']) for row in response.data['rows']],
+            [('The Space Odyssey', 3, '37.50', 30.0), ('Second', 0, '0.00', 0.0)],
+        )
+        self.assertEqual((response.data['totals']['capacity'], response.data['totals']['occupancy']), (20, 15.0))
+
+        for params in ({'group_by': 'weekday'}, {'start': 'yesterday'}, {'start': day, 'end': '2000-01-01'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_admins_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        SalesRollup.objects.all().delete()
+        out = StringIO()
+        call_command('refresh_sales_rollups', stdout=out)
+        self.assertIn('Wrote 1 rollup rows', out.getvalue())
+
+
+@skipIf(pricing.np is None, 'NumPy is not installed')
+@override_settings(SECURE_SSL_REDIRECT=False, PRICING_TARGET_FILL=0.5, PRICING_SENSITIVITY=0.5,
+                   PRICING_MIN_FACTOR=0.8, PRICING_MAX_FACTOR=1.5, PRICING_STEP='0.25')
+class PricingTests(CinemaTestCase):
+    def reprice(self, **kwargs):
+        now = timezone.now()
+        return pricing.reprice(now, now + timedelta(days=14), now, **kwargs)
+
+    def price(self, showing):
+        showing.refresh_from_db()
+        return showing.price
+
+    def test_prices_follow_demand(self):
+        quiet = self.make_showing(timezone.now() + timedelta(days=3), Theater.objects.create(name='Two', capacity=10))
+        reservations.reserve_seats(self.showing.id, 8)
+
+        self.assertEqual(self.reprice(), (2, 2))
+        # 8 of 10 seats gone two hours out, so it should end up about 81% full
+        self.assertEqual(self.price(self.showing), Decimal('16.50'))
+        # Nothing sold three days out, when a third of the sales are usually in
+        self.assertEqual(self.price(quiet), Decimal('10.25'))
+        self.assertEqual(Showing.objects.get(pk=quiet.pk).base_price, Decimal('12.50'))
+
+    def test_repricing_does_not_drift(self):
+        reservations.reserve_seats(self.showing.id, 8)
+        self.reprice()
+        self.assertEqual(self.reprice(), (1, 0))
+        self.assertEqual(Showing.objects.get(pk=self.showing.pk).base_price, Decimal('12.50'))
+
+    def test_repricing_keeps_the_price_paid(self):
+        booking = self.client.post('/api/movies/book/', {'showing_id': self.showing.id, 'seats': 8},
+                                   format='json').data['booking_id']
+        self.reprice()
+        self.assertEqual(self.price(self.showing), Decimal('16.50'))
+        self.assertEqual(Booking.objects.get(pk=booking).unit_price, Decimal('12.50'))
+        rollups.refresh()
+        self.assertEqual(SalesRollup.objects.get().revenue, Decimal('100.00'))
+
+        # The customer's history shows what they paid, archived or not
+        old = self.make_showing(timezone.now() - timedelta(days=60))
+        Booking.objects.create(user=self.user, showing=old, seats=1)
+        Showing.objects.filter(pk=old.pk).update(price='30.00')
+        with override_settings(ARCHIVE_AFTER_DAYS=30):
+            archive.archive_finished()
+        response = self.client.get('/api/movies/user-bookings/', {'include_archived': '1'})
+        self.assertEqual([row['showing_details']['price'] for row in response.data['results']], [12.5, 12.5])
+        self.assertEqual(BookingSerializer(Booking.objects.get(pk=booking)).data['showing_details']['price'], 12.5)
+
+    def test_started_showings_are_left_alone(self):
+        started = self.make_showing(timezone.now() - timedelta(minutes=5), Theater.objects.create(name='Two', capacity=10))
+        self.assertEqual(self.reprice(dry_run=True), (1, 1))
+        self.assertEqual((self.price(self.showing), self.price(started)), (Decimal('12.50'), Decimal('12.50')))
+
+    def test_hand_set_price_becomes_the_base(self):
+        self.reprice()
+        admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        self.client.force_authenticate(admin)
+        response = self.client.patch(f'/api/movies/showings/{self.showing.id}/', {'price': '9.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Showing.objects.get(pk=self.showing.pk).base_price, Decimal('9.00'))
+
+    def test_booking_curve(self):
+        now = timezone.now()
+        past = self.make_showing(now - timedelta(days=2), Theater.objects.create(name='Two', capacity=10))
+        early = Booking.objects.create(user=self.user, showing=past, seats=3)
+        late = Booking.objects.create(user=self.user, showing=past, seats=1)
+        Booking.objects.filter(pk=early.pk).update(created_at=past.start_time - timedelta(hours=48))
+        Booking.objects.filter(pk=late.pk).update(created_at=past.start_time - timedelta(hours=2))
+
+        with self.assertNumQueries(2):  # one GROUP BY per table
+            curve = dict(zip(pricing.LEAD_HOURS, pricing._booking_curve(now - timedelta(days=7), now)))
+        self.assertEqual([curve[hours] for hours in (0, 1, 3, 48, 72)], [1, 1, 0.75, 0.75, 0])
+
+    def test_popular_movies_and_days_weigh_more(self):
+        today = timezone.localdate()
+        hit = Movie.objects.create(title='Hit', description='', duration=90)
+        SalesRollup.objects.create(day=today - timedelta(days=7), hour=20, movie=hit, theater=self.theater,
+                                   showings=10, capacity=1000, seats_sold=900)
+        SalesRollup.objects.create(day=today - timedelta(days=6), hour=20, movie=self.movie, theater=self.theater,
+                                   showings=10, capacity=1000, seats_sold=100)
+
+        mean_fill, movie_ids, movie_factors, weekday_factors = pricing._fill_factors(today - timedelta(days=30), today)
+        self.assertEqual(mean_fill, 0.5)
+        factors = dict(zip(movie_ids.tolist(), movie_factors.tolist()))
+        self.assertGreater(factors[hit.id], 1)
+        self.assertLess(factors[self.movie.id], 1)
+        self.assertGreater(weekday_factors[(today - timedelta(days=7)).weekday()], 1)
+        self.assertEqual(weekday_factors[(today - timedelta(days=1)).weekday()], 1)
+
+        model = pricing.DemandModel([1] * len(pricing.LEAD_HOURS), mean_fill, movie_ids, movie_factors,
+                                    weekday_factors)
+        np = pricing.np
+        self.assertEqual(model.movie_factor(np.array([hit.id, 0])).tolist(), [factors[hit.id], 1])
+
+    def test_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        reservations.reserve_seats(self.showing.id, 8)
+        out = StringIO()
+        call_command('reprice_showings', '--dry-run', stdout=out)
+        self.assertIn('Priced 1 showings, 1 would change', out.getvalue())
+        self.assertEqual(self.price(self.showing), Decimal('12.50'))
+        call_command('reprice_showings', stdout=out)
+        self.assertEqual(self.price(self.showing), Decimal('16.50'))
+
+
+class SeatCounterMaintenanceTests(CinemaTestCase):
+    def book(self, seats, showing=None):
+        showing = showing or self.showing
+        reservations.reserve_seats(showing.id, seats)
+        return Booking.objects.create(user=self.user, showing=showing, seats=seats)
+
+    def test_deleting_booking_releases_seats(self):
+        booking = self.book(4)
+        booking.delete()
+        self.showing.refresh_from_db()
+        self.assertEqual((self.showing.seats_sold, self.showing.seats_remaining), (0, 10))
+
+    def test_bulk_delete_releases_once_per_showing(self):
+        other = self.make_showing()
+        for _ in range(3):
+            self.book(2)
+        self.book(1, showing=other)
+        reservations.delete_bookings(Booking.objects.all())
+        for showing in (self.showing, other):
+            showing.refresh_from_db()
+            self.assertEqual((showing.seats_sold, showing.seats_remaining), (0, 10))
+
+    def test_capacity_change_resizes_showings(self):
+        self.book(4)
+        self.theater.capacity = 5
+        self.theater.save()
+        self.showing.refresh_from_db()
+        self.assertEqual(self.showing.seats_remaining, 1)
+
+    def test_rebuild_command_fixes_drift(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        self.book(3)
+        Showing.objects.filter(pk=self.showing.pk).update(seats_sold=0, seats_remaining=10)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_seat_counters', '--check', stdout=StringIO())
+        call_command('rebuild_seat_counters', stdout=StringIO())
+        self.showing.refresh_from_db()
+        self.assertEqual((self.showing.seats_sold, self.showing.seats_remaining), (3, 7))
+        call_command('rebuild_seat_counters', '--check', stdout=StringIO())
+
+    def test_serializer_exposes_availability(self):
+        from .serializers import ShowingSerializer
+
+        self.book(2)
+        showings = Showing.objects.select_related('movie', 'theater')
+        with self.assertNumQueries(1):
+            data = ShowingSerializer(showings, many=True).data
+        self.assertEqual((data[0]['seats_sold'], data[0]['seats_remaining']), (2, 8))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class TodayShowingsTests(CinemaTestCase):
+    def at_local(self, days, hour):
+        day = timezone.localdate() + timedelta(days=days)
+        return timezone.make_aware(timezone.datetime.combine(day, timezone.datetime.min.time()) + timedelta(hours=hour))
+
+    def setUp(self):
+        super().setUp()
+        Showing.objects.all().delete()
+        self.today = self.make_showing(self.at_local(0, 23))
+        self.tomorrow = self.make_showing(self.at_local(1, 10))
+        self.next_week = self.make_showing(self.at_local(7, 10))
+        self.yesterday = self.make_showing(self.at_local(-1, 10))
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data]
+
+    def test_only_today(self):
+        self.assertEqual(self.ids(self.client.get('/api/movies/today-showings/')), [self.today.id])
+
+    def test_falls_back_to_tomorrow(self):
+        self.today.delete()
+        self.assertEqual(self.ids(self.client.get('/api/movies/today-showings/')), [self.tomorrow.id])
+
+    def test_week_window(self):
+        day = timezone.localdate().isoformat()
+        response = self.client.get('/api/movies/today-showings/', {'date': day, 'days': 8})
+        self.assertEqual(self.ids(response), [self.today.id, self.tomorrow.id, self.next_week.id])
+
+    def test_explicit_empty_date_has_no_fallback(self):
+        day = (timezone.localdate() + timedelta(days=3)).isoformat()
+        self.assertEqual(self.ids(self.client.get('/api/movies/today-showings/', {'date': day})), [])
+
+    def test_bad_window(self):
+        for params in ({'date': 'tomorrow'}, {'days': 0}, {'days': 100}):
+            self.assertEqual(self.client.get('/api/movies/today-showings/', params).status_code, 400)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ScheduleCacheTests(CinemaTestCase):
+    url = '/api/movies/today-showings/'
+
+    def test_second_request_is_served_from_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data[0]['id'], self.showing.id)
+
+    def test_etag_gives_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_admin_edits_invalidate(self):
+        etag = self.client.get(self.url)['ETag']
+        self.movie.title = 'Midnight Mystery'
+        self.movie.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['movie_title'], 'Midnight Mystery')
+
+        self.make_showing()
+        self.assertEqual(len(self.client.get(self.url).data), 2)
+
+    def test_showing_list_is_cached(self):
+        url = '/api/movies/showings/'
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PaginationAndProjectionTests(CinemaTestCase):
+    def test_showings_are_cursor_paginated_by_start_time(self):
+        later = [self.make_showing(self.showing.start_time + timedelta(hours=h)) for h in (1, 2, 3)]
+        response = self.client.get('/api/movies/showings/', {'page_size': 2})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.showing.id, later[0].id])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['id'] for row in response.data['results']], [later[1].id, later[2].id])
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/movies/showings/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_fields_projection(self):
+        response = self.client.get('/api/movies/showings/', {'fields': 'id,movie_title'})
+        self.assertEqual(response.data['results'], [{'id': self.showing.id, 'movie_title': 'The Space Odyssey'}])
+
+    def test_projection_defers_heavy_columns(self):
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from .views import MovieViewSet
+
+        response = self.client.get('/api/movies/movies/', {'fields': 'id,title'})
+        self.assertEqual(response.data['results'], [{'id': self.movie.id, 'title': 'The Space Odyssey'}])
+
+        view = MovieViewSet(request=Request(APIRequestFactory().get('/', {'fields': 'id,title'})))
+        deferred, is_defer = view.get_queryset().query.deferred_loading
+        self.assertTrue(is_defer)
+        self.assertIn('description', deferred)
+
+
+class FlatSerializerTests(CinemaTestCase):
+    def setUp(self):
+        super().setUp()
+        reservations.reserve_seats(self.showing.id, 2)
+        Booking.objects.create(user=self.user, showing=self.showing, seats=2)
+        self.make_showing(self.showing.start_time + timedelta(hours=3))
+
+    def test_showings_match_model_serializer(self):
+        from .flat_serializers import showing_values, serialize_showings
+        from .serializers import ShowingSerializer
+
+        showings = Showing.objects.order_by('id')
+        expected = ShowingSerializer(showings.select_related('movie', 'theater'), many=True).data
+        with self.assertNumQueries(1):
+            rows = serialize_showings(showing_values(showings))
+        self.assertEqual(rows, [dict(row) for row in expected])
+
+    def test_bookings_match_model_serializer(self):
+        from .flat_serializers import booking_values, serialize_bookings
+
+        bookings = Booking.objects.all()
+        expected = BookingSerializer(bookings, many=True).data
+        with self.assertNumQueries(1):
+            rows = serialize_bookings(booking_values(bookings))
+        self.assertEqual(rows, [dict(row) for row in expected])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class RequestMetricsTests(CinemaTestCase):
+    def setUp(self):
+        super().setUp()
+        from cinema_backend.metrics import registry
+
+        registry.reset()
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/movies/today-showings/')
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", ser;dur=[\d.]+$')
+
+    def test_metrics_endpoint_is_admin_only(self):
+        self.client.get('/api/movies/today-showings/')
+        self.assertEqual(self.client.get('/api/movies/debug-metrics/').status_code, 403)
+
+        admin = User.objects.create_user(username='admin', password='password123', is_staff=True)
+        self.client.force_authenticate(admin)
+        routes = self.client.get('/api/movies/debug-metrics/').data['routes']
+        stats = routes['GET /api/movies/today-showings/']
+        self.assertEqual(stats['wall_ms']['count'], 1)
+        self.assertGreaterEqual(stats['queries']['p50'], 1)
+
+    @override_settings(REQUEST_METRICS_ENABLED=False)
+    def test_can_be_disabled(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertNotIn('Server-Timing', client.get('/api/movies/today-showings/'))
+
+
+class BenchmarkHelperTests(TestCase):
+    def test_percentile(self):
+        from .benchmarking import percentile
+
+        values = list(range(1, 101))
+        self.assertEqual((percentile(values, 50), percentile(values, 95), percentile(values, 100)), (50, 95, 100))
+        self.assertIsNone(percentile([], 50))
+
+    def test_find_regressions(self):
+        from .benchmarking import find_regressions
+
+        baseline = {'scenarios': {'today': {'p95_ms': 10.0, 'mean_queries': 1.0}}}
+        ok = {'scenarios': {'today': {'p95_ms': 12.0, 'mean_queries': 1.0}}}
+        slower = {'scenarios': {'today': {'p95_ms': 13.0, 'mean_queries': 2.0}}}
+        self.assertEqual(find_regressions(ok, baseline, 0.25), [])
+        self.assertEqual(len(find_regressions(slower, baseline, 0.25)), 2)
+
+
+class PopulateDataScaleTests(TestCase):
+    def populate(self, **options):
+        from io import StringIO
+        from django.core.management import call_command
+
+        call_command('populate_data', stdout=StringIO(), **options)
+
+    def test_scale_mode_is_reproducible_and_consistent(self):
+        self.populate(movies=3, theaters=2, days=2, users=5, bookings=50, seed=7, batch_size=50)
+        self.assertEqual(Movie.objects.count(), 3)
+        self.assertEqual(Theater.objects.count(), 2)
+        self.assertEqual(Booking.objects.count(), 50)
+        self.assertEqual(User.objects.filter(username__startswith='loadtest-').count(), 5)
+        first = list(Booking.objects.order_by('id').values_list('showing__start_time', 'seats'))
+
+        for showing in Showing.objects.select_related('theater'):
+            sold = sum(showing.booking_set.values_list('seats', flat=True))
+            self.assertEqual(showing.seats_sold, sold)
+            self.assertEqual(showing.seats_remaining, showing.theater.capacity - sold)
+
+        from .scheduling import scan_schedule
+        rows = Showing.objects.order_by('theater_id', 'start_time').values(
+            'id', 'theater', 'start_time', 'end_time', theater_name=F('theater__name'))
+        self.assertEqual(scan_schedule(rows)[0], [])
+
+        # A rerun replaces the generated data instead of adding to it
+        self.populate(movies=3, theaters=2, days=2, users=5, bookings=50, seed=7, batch_size=50)
+        self.assertEqual(User.objects.filter(username__startswith='loadtest-').count(), 5)
+        self.assertEqual(list(Booking.objects.order_by('id').values_list('showing__start_time', 'seats')), first)
+
+    def test_rerun_clears_rows_pointing_at_generated_users(self):
+        from django.db import connection
+
+        self.populate(movies=1, theaters=1, days=1, users=2, bookings=0, seed=1, batch_size=50)
+        generated = User.objects.filter(username__startswith='loadtest-').first()
+        IdempotencyKey.objects.create(user=generated, path='/api/movies/book/', key='k', fingerprint='x',
+                                      expires_at=timezone.now())
+        job = PurgeJob.objects.create(filters={}, requested_by=generated)
+
+        self.populate(movies=1, theaters=1, days=1, users=2, bookings=0, seed=1, batch_size=50)
+        connection.check_constraints()
+        self.assertFalse(IdempotencyKey.objects.exists())
+        job.refresh_from_db()
+        self.assertIsNone(job.requested_by)
+
+    def test_sample_mode_still_works(self):
+        self.populate()
+        self.assertEqual(Movie.objects.count(), 5)
+        self.assertFalse(Booking.objects.exists())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ScheduleImportExportTests(CinemaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='password123', is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def test_csv_import_with_row_errors(self):
+        body = (
+            'movie_title,theater,start_time,price\n'
+            f'the space odyssey,{self.theater.id},2030-01-01T19:30:00,12.50\n'
+            f'Unknown Film,{self.theater.id},2030-01-01T19:30:00,12.50\n'
+            f'{self.movie.id},VIP Screening Room,not-a-date,12.50\n'
+            f'{self.movie.id},VIP Screening Room,2030-01-02T10:00:00+00:00,9\n'
+        )
+        response = self.client.post('/api/movies/schedule/import/', body, content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['rejected']), (2, 2))
+        self.assertEqual([e['line'] for e in response.data['errors']], [3, 4])
+
+        imported = Showing.objects.exclude(pk=self.showing.pk).order_by('start_time')
+        self.assertEqual(imported.count(), 2)
+        first = imported[0]
+        self.assertEqual(first.end_time - first.start_time, timedelta(minutes=120))
+        self.assertEqual((first.seats_sold, first.seats_remaining), (0, 10))
+
+    def test_jsonl_upload_dry_run(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        body = (
+            f'{{"movie": {self.movie.id}, "theater": {self.theater.id}, "start_time": "2030-01-01T10:00:00", "price": "8.50"}}\n'
+            'not json\n'
+        ).encode()
+        upload = SimpleUploadedFile('week.jsonl', body, content_type='application/octet-stream')
+        response = self.client.post('/api/movies/schedule/import/?dry_run=1', {'file': upload}, format='multipart')
+        self.assertEqual((response.data['created'], response.data['rejected']), (1, 1))
+        self.assertEqual(Showing.objects.count(), 1)
+
+    def test_import_requires_admin(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/movies/schedule/import/', 'a,b\n', content_type='text/csv')
+        self.assertEqual(response.status_code, 403)
+
+    def test_export_round_trips(self):
+        import csv
+        import io
+
+        response = self.client.get('/api/movies/schedule/export/')
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([int(row['id']) for row in rows], [self.showing.id])
+        self.assertEqual(rows[0]['movie_title'], 'The Space Odyssey')
+
+        Showing.objects.all().delete()
+        response = self.client.post('/api/movies/schedule/import/', content, content_type='text/csv')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(Showing.objects.get().start_time, self.showing.start_time)
+
+    def test_chunk_lookups_stay_the_same_size(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .schedule_io import ScheduleImporter
+
+        base = timezone.now() + timedelta(days=30)
+        rows = [(line, {'movie': self.movie.id, 'theater': self.theater.id, 'price': '9',
+                        'start_time': (base + timedelta(hours=3 * line)).isoformat()})
+                for line in range(1, 9)]
+        # Clashes with line 1, which an earlier chunk stored
+        rows.append((9, {**rows[0][1], 'start_time': (base + timedelta(hours=3, minutes=30)).isoformat()}))
+
+        with CaptureQueriesContext(connection) as queries:
+            report = ScheduleImporter(chunk_size=2).run(rows)
+        self.assertEqual((report['created'], report['rejected']), (8, 1))
+        lookups = {len(query['sql']) for query in queries if query['sql'].startswith('SELECT "movies_showing"."id"')}
+        self.assertEqual(len(lookups), 1)
+
+    def test_export_jsonl_date_filter(self):
+        import json
+
+        day = self.showing.start_time.astimezone(timezone.get_current_timezone()).date()
+        later = (day + timedelta(days=1)).isoformat()
+        response = self.client.get('/api/movies/schedule/export/', {'type': 'jsonl', 'from': later})
+        self.assertEqual(b''.join(response.streaming_content), b'')
+        response = self.client.get('/api/movies/schedule/export/', {'type': 'jsonl', 'to': day.isoformat()})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(json.loads(lines[0])['id'], self.showing.id)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ScheduleConflictTests(CinemaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='password123', is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def test_interval_tree_matches_brute_force(self):
+        import random
+        from .scheduling import IntervalTree
+
+        rng = random.Random(3)
+        tree, stored = IntervalTree(), []
+        for i in range(300):
+            start = rng.randint(0, 5000)
+            end = start + rng.randint(1, 200)
+            tree.add(start, end, i)
+            stored.append((start, end, i))
+        for _ in range(200):
+            start = rng.randint(0, 5000)
+            end = start + rng.randint(1, 200)
+            expected = sorted(label for s, e, label in stored if s < end and e > start)
+            self.assertEqual(sorted(tree.overlapping(start, end)), expected)
+        self.assertEqual(len(tree), 300)
+
+    def post_showing(self, start_time, theater=None):
+        return self.client.post('/api/movies/showings/', {
+            'movie': self.movie.id,
+            'theater': (theater or self.theater).id,
+            'start_time': start_time.isoformat(),
+            'price': '10.00',
+        }, format='json')
+
+    def test_create_rejects_overlap_but_allows_back_to_back(self):
+        start = self.showing.start_time
+        response = self.post_showing(start + timedelta(minutes=60))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f'Overlaps showing {self.showing.id}', str(response.data))
+
+        self.assertEqual(self.post_showing(start + timedelta(minutes=120)).status_code, 201)
+        other = Theater.objects.create(name='Screen 2', capacity=50)
+        self.assertEqual(self.post_showing(start, theater=other).status_code, 201)
+
+    def test_update_does_not_conflict_with_itself(self):
+        response = self.client.patch(f'/api/movies/showings/{self.showing.id}/', {
+            'movie': self.movie.id,
+            'start_time': (self.showing.start_time + timedelta(minutes=30)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_partial_update_recomputes_end_time_and_checks_overlap(self):
+        start = self.showing.start_time
+        later = self.make_showing(start + timedelta(minutes=180))
+
+        # Moving the start alone moves the end with it, into the next showing
+        response = self.client.patch(f'/api/movies/showings/{self.showing.id}/', {
+            'start_time': (start + timedelta(minutes=90)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f'Overlaps showing {later.id}', str(response.data))
+
+        response = self.client.patch(f'/api/movies/showings/{self.showing.id}/', {
+            'start_time': (start + timedelta(minutes=30)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.showing.refresh_from_db()
+        self.assertEqual(self.showing.end_time, start + timedelta(minutes=30 + self.movie.duration))
+
+        # So does swapping in a longer movie
+        epic = Movie.objects.create(title='Epic', description='Long.', duration=200)
+        response = self.client.patch(f'/api/movies/showings/{self.showing.id}/', {'movie': epic.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f'Overlaps showing {later.id}', str(response.data))
+
+    def test_import_rejects_overlaps_with_stored_and_earlier_rows(self):
+        taken = self.showing.start_time.isoformat()
+        body = (
+            'movie,theater,start_time,price\n'
+            f'{self.movie.id},{self.theater.id},{taken},12.50\n'
+            f'{self.movie.id},{self.theater.id},2030-01-01T10:00:00+00:00,12.50\n'
+            f'{self.movie.id},{self.theater.id},2030-01-01T11:00:00+00:00,12.50\n'
+            f'{self.movie.id},{self.theater.id},2030-01-01T12:00:00+00:00,12.50\n'
+        )
+        response = self.client.post('/api/movies/schedule/import/', body, content_type='text/csv')
+        self.assertEqual((response.data['created'], response.data['rejected']), (2, 2))
+        self.assertEqual(response.data['errors'], [
+            {'line': 2, 'error': f'Overlaps showing {self.showing.id} in VIP Screening Room'},
+            {'line': 4, 'error': 'Overlaps line 3 in VIP Screening Room'},
+        ])
+
+    def test_conflicts_endpoint_reports_overlaps_and_gaps(self):
+        start = self.showing.start_time
+        clash = self.make_showing(start + timedelta(minutes=90))
+        later = self.make_showing(start + timedelta(hours=5))
+        day = start.astimezone(timezone.get_current_timezone()).date()
+
+        response = self.client.get('/api/movies/schedule/conflicts/', {'date': day.isoformat(), 'days': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['showings'] for c in response.data['conflicts']], [[self.showing.id, clash.id]])
+        self.assertEqual(response.data['conflicts'][0]['overlap_end'], self.showing.end_time)
+        gap, = response.data['gaps']
+        self.assertEqual((gap['after'], gap['before'], gap['minutes']), (clash.id, later.id, 90))
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/movies/schedule/conflicts/').status_code, 403)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AsyncReadEndpointTests(CinemaTestCase):
+    def setUp(self):
+        super().setUp()
+        from django.test import AsyncClient
+        from rest_framework.authtoken.models import Token
+        from users.authentication import token_cache
+
+        token_cache.clear()
+        self.token = Token.objects.create(user=self.user)
+        self.async_client = AsyncClient()
+        reservations.reserve_seats(self.showing.id, 2)
+        Booking.objects.create(user=self.user, showing=self.showing, seats=2)
+
+    def get(self, path, data=None, **kwargs):
+        headers = {'Authorization': f'Token {self.token.key}', **kwargs.pop('headers', {})}
+        return self.async_client.get(path, data, headers=headers, **kwargs)
+
+    async def test_today_showings_match_sync_view_and_share_its_etag(self):
+        sync = await self.get('/api/movies/today-showings/')
+        response = await self.get('/api/async/movies/today-showings/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), sync.json())
+        self.assertEqual(response['ETag'], sync['ETag'])
+
+        again = await self.get('/api/async/movies/today-showings/',
+                                             headers={'If-None-Match': response['ETag']})
+        self.assertEqual(again.status_code, 304)
+        bad = await self.get('/api/async/movies/today-showings/', {'days': 99})
+        self.assertEqual(bad.status_code, 400)
+
+    async def test_user_bookings_need_a_valid_token(self):
+        from django.test import AsyncClient
+
+        await Booking.objects.acreate(user=self.user, showing=self.showing, seats=1)
+        response = await self.get('/api/async/movies/user-bookings/', {'when': 'upcoming', 'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        sync = await self.get('/api/movies/user-bookings/', {'when': 'upcoming', 'page_size': 1})
+        self.assertEqual(response.json()['results'], sync.json()['results'])
+        self.assertEqual(response.json()['next'].split('?')[1], sync.json()['next'].split('?')[1])
+        archived = await self.get('/api/async/movies/user-bookings/', {'include_archived': 1})
+        self.assertEqual(archived.json(), (await self.get('/api/movies/user-bookings/', {'include_archived': 1})).json())
+
+        self.assertEqual((await AsyncClient().get('/api/async/movies/user-bookings/')).status_code, 401)
+        stranger = await AsyncClient().get('/api/async/movies/theaters/',
+                                           headers={'Authorization': 'Token ' + '0' * 40})
+        self.assertEqual(stranger.status_code, 401)
+
+    async def test_movie_list_pages_by_id(self):
+        await Movie.objects.acreate(title='Second', description='Two.', duration=90)
+        response = await self.get('/api/async/movies/movies/', {'page_size': 1, 'fields': 'id,title'})
+        page = response.json()
+        self.assertEqual(page['results'], [{'id': self.movie.id, 'title': 'The Space Odyssey'}])
+
+        response = await self.get(page['next'])
+        page = response.json()
+        self.assertEqual([movie['title'] for movie in page['results']], ['Second'])
+        self.assertIsNone(page['next'])
+
+    async def test_now_showing_combines_schedule_and_movies(self):
+        response = await self.get('/api/async/movies/now-showing/')
+        data = response.json()
+        self.assertEqual([s['id'] for s in data['showings']], [self.showing.id])
+        self.assertEqual([m['id'] for m in data['movies']['results']], [self.movie.id])
+        self.assertIn('queries', response['Server-Timing'])
+
+    async def test_post_is_not_allowed(self):
+        response = await self.async_client.post('/api/async/movies/movies/')
+        self.assertEqual(response.status_code, 405)
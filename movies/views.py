@@ -1,18 +1,42 @@
+import codecs
+import logging
+import os
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
-from datetime import datetime, timedelta
-from .models import Movie, Showing, Booking, Theater
-from .serializers import MovieSerializer, ShowingSerializer, BookingSerializer, TheaterSerializer
+from datetime import date, datetime, time, timedelta
+from cinema_backend.idempotency import idempotent
+from cinema_backend.metrics import registry, timed_serialize
+from cinema_backend.pagination import ProjectedQuerysetMixin, requested_fields
+from .models import Movie, Showing, Booking, SeatHold, PurgeJob, Theater
+from .serializers import MovieSerializer, ShowingSerializer, BookingSerializer, SeatHoldSerializer, PurgeJobSerializer, TheaterSerializer
+from .flat_serializers import showing_values, serialize_showings
+from .schedule_cache import cached_schedule_response, schedule_cache_key
+from .schedule_io import FORMATS, ScheduleImporter, guess_format, parse_rows, export_rows
+from .reservations import reserve_seats, SoldOut, NotEnoughSeats
+from .booking_history import BookingPage
+from .checkout import checkout
+from .holds import HoldExpired, confirm_hold, hold_seats, release_hold
+from .purge import parse_filters, start_purge
+from . import rollups
+from inventory.stock import OutOfStock, UnknownItem, parse_basket
+from .scheduling import longest_showing, scan_schedule
+
+logger = logging.getLogger(__name__)
 
 # Create your views here.
 
-class MovieViewSet(viewsets.ModelViewSet):
+class MovieViewSet(ProjectedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Movie.objects.all()
     serializer_class = MovieSerializer
+    cursor_ordering = 'id'
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -21,9 +45,13 @@ class MovieViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
 
-class ShowingViewSet(viewsets.ModelViewSet):
-    queryset = Showing.objects.all().select_related('movie', 'theater')
+class ShowingViewSet(ProjectedQuerysetMixin, viewsets.ModelViewSet):
+    # Only the titles and names of the related rows are serialized
+    queryset = Showing.objects.all().select_related('movie', 'theater').defer(
+        'movie__description', 'movie__poster_url'
+    )
     serializer_class = ShowingSerializer
+    cursor_ordering = ('start_time', 'id')
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -34,22 +62,33 @@ class ShowingViewSet(viewsets.ModelViewSet):
     
     def list(self, request, *args, **kwargs):
         try:
-            showings = self.get_queryset()
-            serializer = self.get_serializer(showings, many=True)
-            return Response(serializer.data)
+            key = schedule_cache_key('showings', request.query_params.urlencode())
+            return cached_schedule_response(request, key, lambda: self.build_page(request))
+        except APIException:
+            # e.g. an invalid cursor, let DRF render it
+            raise
         except Exception as e:
-            print(f"Error listing showings: {str(e)}")
+            logger.exception("Error listing showings")
             return Response(
                 {"detail": f"Failed to list showings: {str(e)}"},
                 status=500
             )
     
+    def build_page(self, request):
+        # Read-only flat path: no model instances, only the needed columns
+        fields = requested_fields(request)
+        rows = showing_values(self.get_queryset(), fields, extra=self.cursor_ordering)
+        page = self.paginate_queryset(rows)
+        with timed_serialize():
+            data = serialize_showings(page, fields)
+        return self.get_paginated_response(data).data
+    
     def create(self, request, *args, **kwargs):
         try:
-            print(f"Creating showing with data: {request.data}")
+            logger.debug("Creating showing with data: %s", request.data)
             return super().create(request, *args, **kwargs)
         except Exception as e:
-            print(f"Error creating showing: {str(e)}")
+            logger.exception("Error creating showing")
             return Response(
                 {"detail": f"Failed to create showing: {str(e)}"},
                 status=400
@@ -57,18 +96,19 @@ class ShowingViewSet(viewsets.ModelViewSet):
     
     def update(self, request, *args, **kwargs):
         try:
-            print(f"Updating showing with data: {request.data}")
+            logger.debug("Updating showing with data: %s", request.data)
             return super().update(request, *args, **kwargs)
         except Exception as e:
-            print(f"Error updating showing: {str(e)}")
+            logger.exception("Error updating showing")
             return Response(
                 {"detail": f"Failed to update showing: {str(e)}"},
                 status=400
             )
 
-class TheaterViewSet(viewsets.ModelViewSet):
+class TheaterViewSet(ProjectedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Theater.objects.all()
     serializer_class = TheaterSerializer
+    cursor_ordering = 'id'
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -77,121 +117,256 @@ class TheaterViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
 
+# Longest window a kiosk may prefetch with ?days=
+MAX_SCHEDULE_DAYS = 14
+
+def get_schedule_window(params):
+    """
+    Turn the optional ?date=YYYY-MM-DD and ?days=N query parameters into
+    an aware [start, end) datetime range covering whole local days.
+    Raises ValueError on bad input.
+    """
+    day = params.get('date')
+    day = datetime.strptime(day, '%Y-%m-%d').date() if day else timezone.localdate()
+    
+    days = int(params.get('days', 1))
+    if not 1 <= days <= MAX_SCHEDULE_DAYS:
+        raise ValueError(f'days must be between 1 and {MAX_SCHEDULE_DAYS}')
+    
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=days), time.min))
+    return start, end
+
+def showings_between(start, end):
+    """Showings starting in [start, end), served by the start_time index"""
+    return Showing.objects.filter(
+        start_time__gte=start,
+        start_time__lt=end
+    ).order_by('start_time', 'theater_id')
+
+def build_today_showings(start, end, explicit_date):
+    logger.debug("Fetching showings from %s to %s", start, end)
+    showings = list(showing_values(showings_between(start, end)))
+    
+    # If nothing is scheduled for today, be lenient and show tomorrow's
+    # showings instead (only when the caller didn't ask for a date)
+    if not showings and not explicit_date:
+        logger.debug("No showings found for today, including tomorrow's showings")
+        showings = list(showing_values(showings_between(end, end + timedelta(days=1))))
+    
+    logger.debug("Found %d showings", len(showings))
+    
+    with timed_serialize():
+        return serialize_showings(showings)
+
 @api_view(['GET'])
 def today_showings(request):
     try:
-        # Get current date in server's timezone
-        today = timezone.now().date()
-        
-        # Debug the date we're using
-        print(f"Fetching showings for date: {today}")
-        
-        # Instead of filtering by date range, let's just get all showings
-        # and then filter them in Python to debug the issue
-        all_showings = Showing.objects.all().select_related('movie', 'theater')
-        print(f"Total showings in database: {all_showings.count()}")
-        
-        # Now filter for today's date
-        showings = []
-        for showing in all_showings:
-            showing_date = showing.start_time.date()
-            print(f"Showing ID {showing.id}: date={showing_date}, today={today}")
-            if showing_date == today:
-                showings.append(showing)
-        
-        print(f"Found {len(showings)} showings for today after filtering")
-        
-        # If we still have no showings, let's be more lenient and include tomorrow's showings too
-        if not showings:
-            print("No showings found for today, including tomorrow's showings")
-            tomorrow = today + timedelta(days=1)
-            for showing in all_showings:
-                showing_date = showing.start_time.date()
-                if showing_date == tomorrow:
-                    showings.append(showing)
-        
-        # If we still have no showings, let's just return all showings for debugging
-        if not showings and all_showings.exists():
-            print("Returning all showings for debugging")
-            showings = list(all_showings)
-        
-        # Debug the first showing if any exist
-        if showings:
-            first_showing = showings[0]
-            print(f"First showing: ID={first_showing.id}, Movie: {first_showing.movie.title}, Theater: {first_showing.theater.name}, Time: {first_showing.start_time}")
+        try:
+            start, end = get_schedule_window(request.query_params)
+        except ValueError as e:
+            return Response({"error": f"Invalid schedule window: {str(e)}"}, status=400)
         
-        serializer = ShowingSerializer(showings, many=True)
-        return Response(serializer.data)
+        explicit_date = 'date' in request.query_params
+        key = schedule_cache_key('today', start.date(), end.date(), explicit_date)
+        return cached_schedule_response(request, key, lambda: build_today_showings(start, end, explicit_date))
     except Exception as e:
-        import traceback
-        print(f"Error in today_showings: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in today_showings")
         return Response(
             {"error": f"Failed to fetch today's showings: {str(e)}"},
             status=500
         )
 
+def parse_seats(value):
+    """A positive seat count from request data, or None"""
+    try:
+        seats = int(value)
+    except (TypeError, ValueError):
+        return None
+    return seats if seats >= 1 else None
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def book_showing(request):
     showing_id = request.data.get('showing_id')
-    seats = request.data.get('seats')
+    seats = parse_seats(request.data.get('seats'))
+    if seats is None:
+        return Response({'error': 'seats must be a positive integer'}, status=400)
     
     try:
-        showing = Showing.objects.get(id=showing_id)
-        
-        # Create the booking
-        booking = Booking.objects.create(
-            user=request.user,
-            showing=showing,
-            seats=seats
-        )
+        with transaction.atomic():
+            # Take the seats first; if the booking insert fails the
+            # counter update is rolled back with it
+            remaining = reserve_seats(showing_id, seats)
+            
+            # Create the booking
+            booking = Booking.objects.create(
+                user=request.user,
+                showing_id=showing_id,
+                seats=seats
+            )
         
-        # Debug print
-        print(f"Created booking: {booking}")
+        logger.debug("Created booking %s: user=%s showing=%s seats=%s",
+                     booking.id, request.user.id, showing_id, seats)
         
         # Return more complete data
         serializer = BookingSerializer(booking)
         return Response({
             'success': True, 
             'booking_id': booking.id,
+            'seats_remaining': remaining,
             'booking': serializer.data
         })
     except Showing.DoesNotExist:
         return Response({'error': 'Showing not found'}, status=404)
+    except SoldOut:
+        return Response({'error': 'This showing is sold out'}, status=409)
+    except NotEnoughSeats as e:
+        return Response({
+            'error': f'Only {e.remaining} seats left for this showing',
+            'seats_remaining': e.remaining
+        }, status=409)
     except Exception as e:
-        print(f"Error creating booking: {str(e)}")
+        logger.exception("Error creating booking")
         return Response({'error': f'Failed to create booking: {str(e)}'}, status=400)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def checkout_view(request):
+    """
+    Tickets and snacks in one go:
+    {"showing_id": 1, "seats": 2, "snacks": [{"item": 3, "quantity": 1}]}.
+    Either everything is bought or nothing is.
+    """
+    showing_id = request.data.get('showing_id')
+    seats = parse_seats(request.data.get('seats'))
+    if seats is None:
+        return Response({'error': 'seats must be a positive integer'}, status=400)
+    snacks = request.data.get('snacks') or []
+    try:
+        basket = parse_basket(snacks) if snacks else {}
+    except ValueError as e:
+        return Response({'error': f'snacks: {e}'}, status=400)
+    
+    try:
+        result = checkout(request.user, showing_id, seats, basket)
+    except Showing.DoesNotExist:
+        return Response({'error': 'Showing not found'}, status=404)
+    except SoldOut:
+        return Response({'error': 'This showing is sold out'}, status=409)
+    except NotEnoughSeats as e:
+        return Response({
+            'error': f'Only {e.remaining} seats left for this showing',
+            'seats_remaining': e.remaining
+        }, status=409)
+    except UnknownItem as e:
+        return Response({'error': str(e), 'item': e.item_id}, status=404)
+    except OutOfStock as e:
+        return Response({'error': str(e), 'item': e.item_id, 'available': e.available}, status=409)
+    except Exception as e:
+        logger.exception("Error during checkout")
+        return Response({'error': f'Checkout failed: {str(e)}'}, status=400)
+    
+    booking = result['booking']
+    logger.debug("Checkout %s: user=%s showing=%s seats=%s snacks=%s total=%s",
+                 booking.id, request.user.id, showing_id, seats, basket, result['total'])
+    
+    lines = [
+        {**line, 'unit_price': str(line['unit_price']), 'amount': str(line['amount'])}
+        for line in result['lines']
+    ]
+    return Response({
+        'success': True,
+        'booking_id': booking.id,
+        'seats_remaining': result['seats_remaining'],
+        'booking': BookingSerializer(booking).data,
+        'lines': lines,
+        'total': str(result['total']),
+    })
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def create_hold(request):
+    """
+    Set seats aside while the customer checks out. The hold expires after
+    SEAT_HOLD_SECONDS unless it is confirmed.
+    """
+    showing_id = request.data.get('showing_id')
+    seats = parse_seats(request.data.get('seats'))
+    if seats is None:
+        return Response({'error': 'seats must be a positive integer'}, status=400)
+    
+    try:
+        hold, remaining = hold_seats(request.user, showing_id, seats)
+    except Showing.DoesNotExist:
+        return Response({'error': 'Showing not found'}, status=404)
+    except SoldOut:
+        return Response({'error': 'This showing is sold out'}, status=409)
+    except NotEnoughSeats as e:
+        return Response({
+            'error': f'Only {e.remaining} seats left for this showing',
+            'seats_remaining': e.remaining
+        }, status=409)
+    except Exception as e:
+        logger.exception("Error creating seat hold")
+        return Response({'error': f'Failed to hold seats: {str(e)}'}, status=400)
+    
+    return Response({
+        'hold_id': hold.id,
+        'seats_remaining': remaining,
+        'hold': SeatHoldSerializer(hold).data,
+    }, status=201)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def confirm_seat_hold(request, hold_id):
+    """Turn a hold into a booking"""
+    try:
+        booking = confirm_hold(request.user, hold_id)
+    except SeatHold.DoesNotExist:
+        return Response({'error': 'Hold not found'}, status=404)
+    except HoldExpired:
+        return Response({'error': 'This hold has expired'}, status=410)
+    except Exception as e:
+        logger.exception("Error confirming seat hold")
+        return Response({'error': f'Failed to confirm hold: {str(e)}'}, status=400)
+    
+    return Response({
+        'success': True,
+        'booking_id': booking.id,
+        'booking': BookingSerializer(booking).data,
+    })
+
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def release_seat_hold(request, hold_id):
+    """Give held seats back before the hold expires"""
+    try:
+        release_hold(request.user, hold_id)
+    except SeatHold.DoesNotExist:
+        return Response({'error': 'Hold not found'}, status=404)
+    return Response(status=204)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_bookings(request):
+    """The customer's bookings, keyset paginated; see movies.booking_history"""
     try:
-        # Add debug print statements
-        print(f"Fetching bookings for user: {request.user.username}")
-        
-        # Make sure the Booking model has the right fields and use prefetch_related for optimization
-        bookings = Booking.objects.filter(user=request.user).select_related(
-            'showing', 
-            'showing__movie', 
-            'showing__theater'
-        ).order_by('-created_at')  # Show newest bookings first
-        
-        print(f"Found {bookings.count()} bookings")
-        
-        # Debug the first booking if any exist
-        if bookings.exists():
-            first_booking = bookings.first()
-            print(f"First booking: {first_booking.id}, Showing: {first_booking.showing}, Created: {first_booking.created_at}")
-            print(f"Showing details: Movie: {first_booking.showing.movie.title}, Theater: {first_booking.showing.theater.name}")
-        
-        serializer = BookingSerializer(bookings, many=True)
-        return Response(serializer.data)
+        page = BookingPage(request.user, request.query_params)
+    except ValueError as e:
+        return Response({"error": f"Invalid page parameters: {str(e)}"}, status=400)
+    
+    try:
+        rows = page.fetch()
+        with timed_serialize():
+            data = page.render(request, rows)
+        return Response(data)
     except Exception as e:
-        # Log the error
-        import traceback
-        print(f"Error in user_bookings: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in user_bookings")
         return Response(
             {"error": f"Failed to fetch bookings: {str(e)}"},
             status=500
@@ -200,6 +375,7 @@ def user_bookings(request):
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def remove_test_showings(request):
+    """Purge every showing (and its bookings) in the background; see movies.purge"""
     try:
         # Check if user is staff
         if not request.user.is_staff and not request.user.is_superuser:
@@ -207,30 +383,175 @@ def remove_test_showings(request):
                 {"error": "You don't have permission to perform this action."},
                 status=403
             )
-            
-        # Get counts before deletion
-        showing_count = Showing.objects.count()
-        booking_count = Booking.objects.count()
         
-        # Delete all bookings first (to maintain referential integrity)
-        Booking.objects.all().delete()
-        
-        # Then delete all showings
-        Showing.objects.all().delete()
-        
-        # Log the operation
-        print(f"Admin {request.user.username} removed {booking_count} bookings and {showing_count} showings")
+        job = start_purge({}, request.user)
+        logger.info("Admin %s started purge %s of all showings", request.user.username, job.id)
         
         return Response({
             'success': True,
-            'message': f'Successfully removed {showing_count} showings and {booking_count} bookings'
-        })
+            'message': f'Removing all showings and bookings in the background (purge job {job.id})',
+            'job': PurgeJobSerializer(job).data,
+        }, status=202)
     except Exception as e:
-        print(f"Error removing test data: {str(e)}")
+        logger.exception("Error removing test data")
         return Response({
             'error': f'Failed to remove test data: {str(e)}'
         }, status=500)
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def purge_showings(request):
+    """
+    Delete showings matching {"starts_after", "starts_before", "theaters"}
+    (all optional) with their bookings, as a background job. Poll the
+    returned job at /api/movies/purge/<id>/.
+    """
+    try:
+        filters = parse_filters(request.data)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+    
+    job = start_purge(filters, request.user)
+    logger.info("Admin %s started purge %s: %s", request.user.username, job.id, filters)
+    return Response(PurgeJobSerializer(job).data, status=202)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def purge_status(request, job_id):
+    try:
+        job = PurgeJob.objects.get(pk=job_id)
+    except PurgeJob.DoesNotExist:
+        return Response({'error': 'Purge job not found'}, status=404)
+    return Response(PurgeJobSerializer(job).data)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def sales_analytics(request):
+    """
+    Seats sold, revenue and occupancy from the sales rollups.
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD (local days, inclusive; default the
+    last 30 days) and ?group_by= any of day, hour, movie, theater
+    (comma-separated, default day).
+    """
+    try:
+        end = date.fromisoformat(request.query_params['end']) if request.query_params.get('end') else timezone.localdate()
+        start = (date.fromisoformat(request.query_params['start']) if request.query_params.get('start')
+                 else end - timedelta(days=29))
+    except ValueError:
+        return Response({'error': 'start and end must be YYYY-MM-DD dates'}, status=400)
+    if start > end:
+        return Response({'error': 'start must not be after end'}, status=400)
+    
+    group_by = [name.strip() for name in request.query_params.get('group_by', 'day').split(',') if name.strip()]
+    unknown = set(group_by) - set(rollups.DIMENSIONS)
+    if unknown:
+        return Response({'error': f'Unknown group_by: {", ".join(sorted(unknown))}; '
+                                  f'use any of {", ".join(rollups.DIMENSIONS)}'}, status=400)
+    
+    rows, totals = rollups.report(start, end, group_by)
+    for row in (*rows, totals):
+        row['revenue'] = f"{row['revenue']:.2f}"
+    return Response({
+        'start': start,
+        'end': end,
+        'group_by': group_by,
+        'rows': rows,
+        'totals': totals,
+    })
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def import_schedule(request):
+    """
+    Bulk-create showings from a CSV or JSON-lines upload (multipart field
+    `file`) or raw request body, streamed and inserted in chunks.
+    ?type=csv|jsonl overrides format detection, ?dry_run=1 only validates.
+    """
+    try:
+        upload = request.FILES.get('file') if request.content_type.startswith('multipart/') else None
+        if upload is not None:
+            fmt = request.query_params.get('type') or guess_format(upload.name, upload.content_type or '')
+            source = upload
+        else:
+            fmt = request.query_params.get('type') or guess_format(content_type=request.content_type)
+            source = request.stream or []
+        if fmt not in FORMATS:
+            return Response({'error': f'type must be one of {", ".join(FORMATS)}'}, status=400)
+        
+        dry_run = request.query_params.get('dry_run') in ('1', 'true')
+        lines = codecs.iterdecode(source, 'utf-8-sig')
+        report = ScheduleImporter(dry_run=dry_run).run(parse_rows(lines, fmt))
+        
+        logger.info("Admin %s imported %d showings (%d rejected, dry run: %s)",
+                    request.user.username, report['created'], report['rejected'], dry_run)
+        status = 400 if report['rejected'] and not report['created'] else 200
+        return Response(report, status=status)
+    except UnicodeDecodeError:
+        return Response({'error': 'Schedule files must be UTF-8'}, status=400)
+    except Exception as e:
+        logger.exception("Error importing schedule")
+        return Response({'error': f'Failed to import schedule: {str(e)}'}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_schedule(request):
+    """
+    Stream showings as CSV or JSON lines (?type=csv|jsonl), optionally
+    limited to ?from=YYYY-MM-DD and/or ?to=YYYY-MM-DD (inclusive)
+    """
+    fmt = request.query_params.get('type', 'csv')
+    if fmt not in FORMATS:
+        return Response({'error': f'type must be one of {", ".join(FORMATS)}'}, status=400)
+    
+    showings = Showing.objects.order_by('start_time', 'id')
+    try:
+        if request.query_params.get('from'):
+            start, _ = get_schedule_window({'date': request.query_params['from']})
+            showings = showings.filter(start_time__gte=start)
+        if request.query_params.get('to'):
+            _, end = get_schedule_window({'date': request.query_params['to']})
+            showings = showings.filter(start_time__lt=end)
+    except ValueError as e:
+        return Response({'error': f'Invalid date: {str(e)}'}, status=400)
+    
+    content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(export_rows(showings, fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="schedule.{fmt}"'
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def schedule_conflicts(request):
+    """
+    Overlapping showings and idle gaps per theater for ?date=YYYY-MM-DD
+    (default today) and ?days=N, optionally for one ?theater=<id>
+    """
+    try:
+        start, end = get_schedule_window(request.query_params)
+        theater = request.query_params.get('theater')
+        theater = int(theater) if theater else None
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    # Also pick up showings that started earlier and run into the window
+    showings = Showing.objects.filter(
+        start_time__gt=start - longest_showing(),
+        start_time__lt=end,
+    )
+    if theater is not None:
+        showings = showings.filter(theater_id=theater)
+    rows = showings.order_by('theater_id', 'start_time', 'id').values(
+        'id', 'theater', 'start_time', 'end_time', theater_name=F('theater__name'),
+    )
+
+    conflicts, gaps = scan_schedule(rows.iterator(chunk_size=2000))
+    return Response({
+        'from': start,
+        'to': end,
+        'conflicts': conflicts,
+        'gaps': gaps,
+    })
+
 @api_view(['GET'])
 def debug_showings(request):
     """
@@ -260,10 +581,23 @@ def debug_showings(request):
             'showings': debug_data
         })
     except Exception as e:
-        import traceback
-        print(f"Error in debug_showings: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in debug_showings")
         return Response(
             {"error": f"Failed to fetch debug showings: {str(e)}"},
             status=500
         )
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def request_metrics(request):
+    """
+    Per-route latency, query count and serializer time percentiles
+    recorded by RequestMetricsMiddleware in this process (DELETE resets)
+    """
+    if request.method == 'DELETE':
+        registry.reset()
+        return Response(status=204)
+    return Response({
+        'pid': os.getpid(),
+        'routes': registry.snapshot()
+    })
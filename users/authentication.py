@@ -0,0 +1,121 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """
+    A small thread-safe LRU of token key -> (user, token) with a TTL.
+
+    Entries are dropped on token deletion and user saves in this process;
+    the TTL bounds how long other worker processes can keep serving them.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # user id -> their keys in _entries, so delete_user() doesn't scan
+        self._by_user = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._by_user.setdefault(value[0].pk, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _drop(self, key):
+        # Callers hold the lock
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1][0].pk
+        keys = self._by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user_id]
+
+
+token_cache = TokenCache(
+    max_entries=getattr(settings, 'TOKEN_AUTH_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 60),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for TokenAuthentication that skips the token/user
+    join for keys seen recently.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+        user, token = cached
+        # Each request gets its own copies, so nothing a view sets on
+        # request.user leaks into other requests
+        return copy.copy(user), copy.copy(token)
+
+
+async def aauthenticate(request):
+    """
+    Token (then session) authentication for plain async views, which
+    can't use DRF's authentication classes. Returns the user or None;
+    tokens seen recently come from the same cache as
+    CachedTokenAuthentication, without a query.
+    """
+    header = request.headers.get('Authorization', '').split()
+    if len(header) == 2 and header[0].lower() == 'token':
+        key = header[1]
+        cached = token_cache.get(key)
+        if cached is None:
+            try:
+                token = await Token.objects.select_related('user').aget(key=key)
+            except Token.DoesNotExist:
+                return None
+            # Inactive users are never cached; the sync class trusts hits
+            if not token.user.is_active:
+                return None
+            cached = (token.user, token)
+            token_cache.set(key, cached)
+        return copy.copy(cached[0])
+
+    user = await request.auser()
+    return user if user.is_authenticated else None
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from cinema_backend.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Deletes Idempotency-Key records older than IDEMPOTENCY_KEY_TTL. Run it daily, e.g. from cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement')
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys'))
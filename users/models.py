@@ -5,3 +5,24 @@ from django.contrib.auth.models import AbstractUser
 
 class User(AbstractUser):
     is_staff_member = models.BooleanField(default=False)
+
+
+class IdempotencyKey(models.Model):
+    """
+    A client's Idempotency-Key for one endpoint, and the response it got
+    (see cinema_backend.idempotency). status_code is null while the first
+    request is still running.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    path = models.CharField(max_length=255)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=16)
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'path', 'key'], name='idempotency_key_unique'),
+        ]
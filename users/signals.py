@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .models import User
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_changed_user(sender, instance, update_fields=None, **kwargs):
+    # Covers deactivation as well as permission and password changes, but
+    # not the last_login stamp every login writes
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    token_cache.delete_user(instance.pk)
@@ -1,3 +1,110 @@
-from django.test import TestCase
+import logging
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from cinema_backend.log import RedactingFilter, SamplingFilter
+from .authentication import TokenCache, token_cache
+from .models import User
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CachedTokenAuthenticationTests(TestCase):
+    url = '/api/inventory/snacks/'
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username='customer', password='password123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeat_requests_skip_token_lookup(self):
+        with self.assertNumQueries(2):  # token join + snack page
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get(self.url)
+        self.token.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+class TokenCacheTests(TestCase):
+    def entry(self, user_id):
+        return SimpleNamespace(pk=user_id), None
+
+    def test_lru_eviction(self):
+        cache = TokenCache(max_entries=2, ttl=60)
+        a, b, c = self.entry(1), self.entry(2), self.entry(3)
+        cache.set('a', a)
+        cache.set('b', b)
+        cache.get('a')
+        cache.set('c', c)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (a, None, c))
+        self.assertEqual(set(cache._by_user), {1, 3})
+
+    def test_ttl_expiry(self):
+        cache = TokenCache(max_entries=2, ttl=-1)
+        cache.set('a', self.entry(1))
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache._by_user, {})
+
+    def test_delete_user_drops_only_their_keys(self):
+        cache = TokenCache(max_entries=10, ttl=60)
+        cache.set('a', self.entry(1))
+        cache.set('b', self.entry(1))
+        cache.set('c', self.entry(2))
+        cache.delete_user(1)
+        self.assertEqual((cache.get('a'), cache.get('b')), (None, None))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_login_stamp_keeps_cached_tokens(self):
+        user = User.objects.create_user(username='customer', password='password123')
+        token_cache.set('key', (user, None))
+        user.save(update_fields=['last_login'])
+        self.assertIsNotNone(token_cache.get('key'))
+        user.is_active = False
+        user.save()
+        self.assertIsNone(token_cache.get('key'))
+
+
+class LogRedactionTests(TestCase):
+    def render(self, msg, *args, level=logging.DEBUG):
+        record = logging.LogRecord('users.views', level, __file__, 0, msg, args, None)
+        RedactingFilter().filter(record)
+        return record.getMessage()
+
+    def test_stray_token_is_redacted(self):
+        key = Token.generate_key()
+        self.assertEqual(self.render('Generated token for %s: %s', 'customer', key),
+                         'Generated token for customer: [redacted-token]')
+
+    @override_settings(SECURE_SSL_REDIRECT=False)
+    def test_login_does_not_log_the_token(self):
+        User.objects.create_user(username='customer', password='password123')
+        with self.assertLogs('users.views', level=logging.DEBUG) as logs:
+            response = self.client.post('/api/users/login/', {'username': 'customer', 'password': 'password123'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(response.data['token'], '\n'.join(logs.output))
+
+    def test_password_in_request_data_is_redacted(self):
+        message = self.render('data: %s', {'username': 'customer', 'password': 'password123'})
+        self.assertNotIn('password123', message)
+        self.assertIn('customer', message)
+
+    def test_sampling_only_drops_debug(self):
+        sampler = SamplingFilter(rate=0)
+        debug = logging.LogRecord('movies', logging.DEBUG, __file__, 0, 'x', None, None)
+        error = logging.LogRecord('movies', logging.ERROR, __file__, 0, 'x', None, None)
+        self.assertFalse(sampler.filter(debug))
+        self.assertTrue(sampler.filter(error))
@@ -1,3 +1,4 @@
+import logging
 from django.shortcuts import render
 from rest_framework import status, viewsets
 from rest_framework.response import Response
@@ -8,6 +9,8 @@ from rest_framework.authtoken.models import Token
 from .serializers import UserSerializer
 from .models import User
 
+logger = logging.getLogger(__name__)
+
 # Create your views here.
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -22,8 +25,7 @@ def login_view(request):
         # Create or get token
         token, created = Token.objects.get_or_create(user=user)
         
-        # Debug print
-        print(f"Generated token for {username}: {token.key}")
+        logger.debug("Issued token for %s (new: %s)", username, created)
         
         return Response({
             'success': True,